@@ -41,6 +41,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'summarizer.metrics.TimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -123,3 +124,150 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Summary cache
+# Tiers are checked in order; a hit in a slower tier is copied into the faster ones.
+
+SUMMARY_CACHE_BACKENDS = [
+    {
+        'BACKEND': 'summarizer.cache.LRUCacheBackend',
+        'OPTIONS': {
+            'max_entries': 1024,
+            'max_bytes': 16 * 1024 * 1024,
+            'ttl': 60 * 60,
+        },
+    },
+    {
+        'BACKEND': 'summarizer.cache.DatabaseCacheBackend',
+        'OPTIONS': {
+            'max_entries': 10000,
+            'ttl': 7 * 24 * 60 * 60,
+        },
+    },
+]
+
+
+# Background summary jobs
+
+SUMMARY_JOB_WORKERS = 2
+SUMMARY_JOB_RUN_IN_PROCESS = True
+SUMMARY_JOB_UPLOAD_DIR = BASE_DIR / 'job_uploads'
+# Running jobs without a heartbeat for this many seconds are assumed lost with their worker and queued again.
+SUMMARY_JOB_STALE_SECONDS = 5 * 60
+
+
+# Speech recognition backend used to transcribe WAV uploads.
+# 'summarizer.transcription.SphinxTranscriptionBackend' works offline but needs pocketsphinx.
+
+SUMMARY_TRANSCRIPTION_BACKEND = 'summarizer.transcription.GoogleTranscriptionBackend'
+
+
+# Directory of the on-disk HTTP cache used when fetching URLs.
+
+SUMMARY_URL_CACHE_DIR = BASE_DIR / 'url_cache'
+
+
+# Largest extracted text, in model tokens, passed on for summarization.
+# Longer inputs are cut down to their most informative sentences first.
+
+SUMMARY_INPUT_TOKEN_BUDGET = 100000
+
+
+# Batch summarization
+# Model calls of one /api/batch/ request: at most SUMMARY_BATCH_MODEL_CONCURRENCY at a time, and
+# SUMMARY_BATCH_MODEL_RATE per second with bursts of SUMMARY_BATCH_MODEL_BURST (None lifts the rate limit).
+
+SUMMARY_BATCH_MODEL_CONCURRENCY = 4
+SUMMARY_BATCH_MODEL_RATE = 2.0
+SUMMARY_BATCH_MODEL_BURST = 4
+
+
+# Summarization backends
+# Inputs of at most SUMMARY_EXTRACTIVE_MAX_TOKENS tokens are summarized by the local extractive
+# engine (0 disables this); with SUMMARY_EXTRACTIVE_FALLBACK it also answers when Gemini fails.
+
+SUMMARY_BACKEND = 'summarizer.backends.RoutingBackend'
+SUMMARY_EXTRACTIVE_MAX_TOKENS = 0
+SUMMARY_EXTRACTIVE_FALLBACK = True
+
+
+# Model client
+# While the circuit of the primary model is open, calls fail over to SUMMARY_FAILOVER_MODEL
+# (None sheds them instead). SUMMARY_MODEL_RATE_LIMIT caps model calls per second across all
+# worker processes, sharing one token bucket in the database (None disables it).
+
+SUMMARY_FAILOVER_MODEL = 'gemini-1.5-flash-8b'
+SUMMARY_MODEL_RATE_LIMIT = 5
+SUMMARY_MODEL_RATE_BURST = 10
+SUMMARY_MODEL_HEDGING = True
+
+
+# Metrics
+# Request and per-stage latencies are exposed at /metrics. With SUMMARY_TIMING_HEADERS every
+# response also reports its stage timings in a Server-Timing header.
+
+SUMMARY_TIMING_HEADERS = False
+
+
+# Summary store
+# Summaries returned by /api/ are stored and can be fetched again from /api/summaries/<id>/.
+# Rows older than SUMMARY_STORE_RETENTION_DAYS, and the oldest rows above SUMMARY_STORE_MAX_ROWS,
+# are pruned periodically and by the prune_summaries command.
+
+SUMMARY_STORE_ENABLED = True
+SUMMARY_STORE_RETENTION_DAYS = 30
+SUMMARY_STORE_MAX_ROWS = 10000
+
+
+# Extraction cache
+# Text extracted from PDF, DOCX and WAV uploads is cached on disk by content hash, so the same
+# file summarized with other options is not extracted again. Large texts are stored compressed.
+
+SUMMARY_EXTRACTION_CACHE_ENABLED = True
+SUMMARY_EXTRACTION_CACHE_DIR = BASE_DIR / 'extraction_cache'
+SUMMARY_EXTRACTION_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+# Summary export
+# Path of a TrueType font embedded into PDF exports. The built-in Helvetica, used when this is None,
+# only covers Western European scripts; point it to a font such as DejaVuSans.ttf for other languages.
+
+SUMMARY_EXPORT_PDF_FONT = None
+
+
+# Admission control
+# Each client (the SUMMARY_CLIENT_ID_HEADER header set by a trusted gateway, else the user or the
+# address) has token-bucket quotas in requests and in estimated input tokens per second, shared by
+# all workers; a rate of None disables a quota. Model work runs in at most SUMMARY_ADMISSION_CONCURRENCY
+# slots per process; others wait in a bounded queue where interactive requests get four turns for
+# every batch one. Requests over quota, or whose wait would exceed SUMMARY_ADMISSION_MAX_WAIT_SECONDS,
+# get 429 with Retry-After.
+
+SUMMARY_ADMISSION_ENABLED = True
+SUMMARY_ADMISSION_CONCURRENCY = 16
+SUMMARY_ADMISSION_MAX_QUEUE = 64
+SUMMARY_ADMISSION_MAX_WAIT_SECONDS = 15
+SUMMARY_CLIENT_ID_HEADER = None
+SUMMARY_CLIENT_REQUEST_RATE = 1.0
+SUMMARY_CLIENT_REQUEST_BURST = 20
+SUMMARY_CLIENT_TOKEN_RATE = 2000
+SUMMARY_CLIENT_TOKEN_BURST = 200000
+
+
+# Near-duplicate reuse
+# Stored texts are indexed by MinHash signatures of their word shingles. A request whose text is at
+# least SUMMARY_NEAR_DUPLICATE_THRESHOLD similar to one already summarized with the same options gets
+# that stored summary instead of a model call. Texts under 50 words are never matched.
+
+SUMMARY_NEAR_DUPLICATE_ENABLED = True
+SUMMARY_NEAR_DUPLICATE_THRESHOLD = 0.9
+
+
+# Watched URLs
+# A refresh of a watched URL only calls the model when some of its text blocks changed, and then
+# sends just those blocks with the previous summary, unless more than this share of the blocks
+# changed or the summary has already been updated this many times in a row.
+
+SUMMARY_WATCH_MAX_INCREMENTAL_CHANGE = 0.5
+SUMMARY_WATCH_MAX_INCREMENTAL_UPDATES = 10
@@ -16,8 +16,12 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from summarizer.views import download_summary, prometheus_metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('summarizer.urls')),
+    path('metrics', prometheus_metrics, name='metrics'),
+    # Former location of the export endpoint, kept for existing clients; new ones use /api/download-summary/.
+    path('download-summary/', download_summary, name='legacy_download_summary'),
 ]
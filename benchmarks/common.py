@@ -0,0 +1,151 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+PROJECT_DIR = BENCHMARKS_DIR.parent
+RESULTS_DIR = BENCHMARKS_DIR / 'results'
+# Version of the result file layout; bump it when fields change meaning.
+RESULTS_SCHEMA = 1
+
+
+def setup_django():
+    """
+    Configures Django with the benchmark settings, so project code can be imported and run.
+    """
+    if str(PROJECT_DIR) not in sys.path:
+        sys.path.insert(0, str(PROJECT_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    import django
+    from django.core.management import call_command
+
+    django.setup()
+    call_command('migrate', verbosity=0)
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """
+    Returns the value at the given fraction of the sorted values, interpolating linearly.
+    """
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def describe(samples: list) -> dict:
+    """
+    Summarizes a list of durations in seconds.
+
+    Returns:
+        dict: count, mean, stdev, min, p50, p95, p99 and max.
+    """
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'mean': statistics.fmean(ordered) if ordered else 0.0,
+        'stdev': statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+        'min': ordered[0] if ordered else 0.0,
+        'p50': percentile(ordered, 0.50),
+        'p95': percentile(ordered, 0.95),
+        'p99': percentile(ordered, 0.99),
+        'max': ordered[-1] if ordered else 0.0,
+    }
+
+
+def measure(function, min_repeats: int = 5, min_seconds: float = 1.0, max_repeats: int = 1000) -> list:
+    """
+    Calls the function repeatedly, at least `min_repeats` times and until `min_seconds` have passed.
+
+    Returns:
+        list: The duration of every call in seconds.
+    """
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_repeats and (len(samples) < min_repeats or time.perf_counter() - started < min_seconds):
+        call_started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - call_started)
+    return samples
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=PROJECT_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+def environment() -> dict:
+    """
+    Describes the machine and code the benchmark ran on.
+    """
+    return {
+        'git_revision': _git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def write_results(suite: str, parameters: dict, results: list, output: str = None) -> Path:
+    """
+    Writes a result file. Every result is a dict with a unique `name`, which `compare.py`
+    uses to match results between runs.
+
+    Args:
+        suite (str): The benchmark suite, e.g. 'micro' or 'load'.
+        parameters (dict): The options the suite ran with.
+        results (list): The results.
+        output (str): The file to write, by default `results/<suite>-<timestamp>.json`.
+
+    Returns:
+        Path: The written file.
+    """
+    path = Path(output) if output else RESULTS_DIR / f"{suite}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    document = {
+        'schema': RESULTS_SCHEMA,
+        'suite': suite,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'environment': environment(),
+        'parameters': parameters,
+        'results': results,
+    }
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump(document, handle, indent=2)
+    return path
+
+
+def read_rss_bytes(pid: int) -> int:
+    """
+    Returns the resident memory of a process and its children in bytes, or 0 where /proc is unavailable.
+    """
+    total = 0
+    for process in [pid] + _children(pid):
+        try:
+            with open(f'/proc/{process}/status', 'r') as status:
+                for line in status:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            continue
+    return total
+
+
+def _children(pid: int) -> list:
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children', 'r') as handle:
+            children = [int(child) for child in handle.read().split()]
+    except OSError:
+        return []
+    return children + [grandchild for child in children for grandchild in _children(child)]
@@ -0,0 +1,82 @@
+"""
+Compares two benchmark result files and flags regressions.
+
+    python -m benchmarks.compare benchmarks/results/micro-before.json benchmarks/results/micro-after.json
+
+Results are matched by name. Durations regress when they grow and throughputs when they
+shrink by more than the threshold; the exit status is 1 if any result regressed.
+"""
+import argparse
+import json
+import sys
+
+# Metrics compared per suite: (label, path into the result, True if higher is better, display scale).
+METRICS = {
+    'micro': [('mean ms', ('mean',), False, 1000), ('p95 ms', ('p95',), False, 1000)],
+    'load': [
+        ('req/s', ('requests_per_second',), True, 1),
+        ('p50 ms', ('latency', 'p50'), False, 1000),
+        ('p95 ms', ('latency', 'p95'), False, 1000),
+        ('p99 ms', ('latency', 'p99'), False, 1000),
+        ('peak MB', ('memory', 'peak_mb'), False, 1),
+    ],
+}
+
+
+def _lookup(result: dict, path: tuple):
+    for key in path:
+        if not isinstance(result, dict) or key not in result:
+            return None
+        result = result[key]
+    return result
+
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> tuple:
+    """
+    Compares the results of two runs of the same suite.
+
+    Returns:
+        tuple: The report lines and the number of regressions.
+    """
+    metrics = METRICS.get(candidate['suite'], [])
+    previous = {result['name']: result for result in baseline['results']}
+    lines = [f"{'benchmark':32} {'metric':8} {'baseline':>12} {'candidate':>12} {'change':>9}"]
+    regressions = 0
+    for result in candidate['results']:
+        old = previous.get(result['name'])
+        if old is None:
+            lines.append(f"{result['name']:32} (new)")
+            continue
+        for label, path, higher_is_better, scale in metrics:
+            before, after = _lookup(old, path), _lookup(result, path)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            regressed = change < -threshold if higher_is_better else change > threshold
+            regressions += regressed
+            lines.append(f"{result['name']:32} {label:8} {before * scale:12.3f} {after * scale:12.3f} {change:+8.1%}"
+                         f"{'  REGRESSION' if regressed else ''}")
+    return lines, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Relative change tolerated (default 10%%).')
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding='utf-8') as handle:
+        baseline = json.load(handle)
+    with open(args.candidate, encoding='utf-8') as handle:
+        candidate = json.load(handle)
+    if baseline['suite'] != candidate['suite']:
+        parser.error(f"Cannot compare a {baseline['suite']} run with a {candidate['suite']} run.")
+
+    lines, regressions = compare(baseline, candidate, args.threshold)
+    print("\n".join(lines))
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
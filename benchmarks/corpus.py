@@ -0,0 +1,221 @@
+"""
+Generates the benchmark corpus: TXT, PDF, DOCX, WAV and HTML inputs at several sizes, built
+deterministically from a seed so every run measures the same documents.
+
+    python -m benchmarks.corpus --output benchmarks/corpus
+"""
+import argparse
+import io
+import math
+import random
+import struct
+import wave
+from pathlib import Path
+
+from .common import BENCHMARKS_DIR
+
+CORPUS_DIR = BENCHMARKS_DIR / 'corpus'
+KINDS = ['txt', 'pdf', 'docx', 'wav', 'html']
+# Approximate characters of text per document size, and seconds of audio for WAV files.
+TEXT_SIZES = {'small': 2000, 'medium': 50000, 'large': 1000000}
+AUDIO_SECONDS = {'small': 5, 'medium': 30, 'large': 120}
+SAMPLE_RATE = 16000
+
+VOCABULARY = (
+    "analysis approach article budget change climate company customer data decision design development "
+    "economy energy environment evidence experience factor growth health history impact industry information "
+    "investment knowledge language market method model network opportunity organization performance policy "
+    "population practice pressure process product program project quality research resource result risk "
+    "science security service society software strategy structure student study system technology theory "
+    "trade training value water welfare community council education increase improve measure reduce report "
+    "significant several important local global recent current public private major early final national"
+).split()
+FILLER = "the of and to in a for on with as by that from at is was are were has have".split()
+
+
+def generate_text(characters: int, seed: int = 0) -> str:
+    """
+    Generates paragraphs of sentence-like text of about the given length.
+    """
+    generator = random.Random(seed)
+    paragraphs = []
+    size = 0
+    while size < characters:
+        sentences = []
+        for _ in range(generator.randint(3, 7)):
+            words = [generator.choice(VOCABULARY if generator.random() < 0.6 else FILLER)
+                     for _ in range(generator.randint(8, 22))]
+            sentences.append(" ".join(words).capitalize() + ".")
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        size += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
+
+
+def _pdf_escape(line: str) -> str:
+    return line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def build_pdf(text: str, lines_per_page: int = 60, line_width: int = 95) -> bytes:
+    """
+    Writes a minimal PDF with the text set in Helvetica, wrapped and split into pages.
+    """
+    lines = []
+    for paragraph in text.split("\n\n"):
+        words = paragraph.split()
+        current = ""
+        for word in words:
+            if current and len(current) + len(word) + 1 > line_width:
+                lines.append(current)
+                current = word
+            else:
+                current = f"{current} {word}" if current else word
+        lines.extend([current, ""] if current else [""])
+    pages = [lines[start:start + lines_per_page] for start in range(0, len(lines), lines_per_page)] or [[]]
+
+    objects = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for page in pages:
+        stream = "BT /F1 10 Tf 12 TL 50 790 Td " + " ".join(f"({_pdf_escape(line)}) Tj T*" for line in page) + " ET"
+        stream = stream.encode('latin-1', errors='replace')
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        page_ids.append(len(objects))
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % page for page in page_ids) + \
+                 b"] /Count %d >>" % len(page_ids)
+
+    output = io.BytesIO()
+    output.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(output.tell())
+        output.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = output.tell()
+    output.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        output.write(b"%010d 00000 n \n" % offset)
+    output.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return output.getvalue()
+
+
+def build_docx(text: str) -> bytes:
+    """
+    Writes a DOCX with a header, headings, the text as paragraphs and a table every few paragraphs.
+    """
+    import docx
+
+    document = docx.Document()
+    document.sections[0].header.paragraphs[0].text = "Benchmark corpus"
+    for index, paragraph in enumerate(text.split("\n\n")):
+        if index % 10 == 0:
+            document.add_heading(f"Section {index // 10 + 1}", level=1)
+        document.add_paragraph(paragraph)
+        if index % 25 == 24:
+            words = paragraph.split()
+            table = document.add_table(rows=3, cols=3)
+            for cell_index, cell in enumerate(table._cells):
+                cell.text = words[cell_index % len(words)]
+    output = io.BytesIO()
+    document.save(output)
+    return output.getvalue()
+
+
+def build_wav(seconds: int, seed: int = 0) -> bytes:
+    """
+    Writes 16 kHz mono audio of tone bursts separated by short silences, so it splits into segments like speech.
+    """
+    generator = random.Random(seed)
+    frames = bytearray()
+    total = seconds * SAMPLE_RATE
+    while len(frames) // 2 < total:
+        burst = int(generator.uniform(0.8, 3.0) * SAMPLE_RATE)
+        frequency = generator.uniform(150, 400)
+        for sample in range(burst):
+            frames += struct.pack('<h', int(8000 * math.sin(2 * math.pi * frequency * sample / SAMPLE_RATE)))
+        frames += b"\x00\x00" * int(generator.uniform(0.2, 0.6) * SAMPLE_RATE)
+    output = io.BytesIO()
+    with wave.open(output, 'wb') as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(SAMPLE_RATE)
+        writer.writeframes(bytes(frames[:total * 2]))
+    return output.getvalue()
+
+
+def build_html(text: str) -> bytes:
+    """
+    Writes an article page surrounded by the navigation, sidebar, footer and scripts of a typical site.
+    """
+    paragraphs = "\n".join(f"<p>{paragraph}</p>" for paragraph in text.split("\n\n"))
+    links = "".join(f'<li><a href="/section/{index}">Section {index}</a></li>' for index in range(30))
+    page = f"""<!DOCTYPE html>
+<html><head><title>Benchmark article</title><script>var tracking = {{"id": 1}};</script>
+<style>body {{ font-family: sans-serif; }}</style></head>
+<body><header><nav><ul>{links}</ul></nav></header>
+<div class="layout"><aside class="sidebar"><ul>{links}</ul></aside>
+<main><article><h1>Benchmark article</h1>{paragraphs}</article></main></div>
+<div class="cookie-banner">We use cookies.</div><footer><ul>{links}</ul></footer></body></html>"""
+    return page.encode('utf-8')
+
+
+def build_document(kind: str, size: str, seed: int = 0) -> bytes:
+    """
+    Builds one corpus document.
+
+    Args:
+        kind (str): One of KINDS.
+        size (str): One of TEXT_SIZES.
+        seed (int): The seed of the generated text.
+
+    Returns:
+        bytes: The file content.
+    """
+    if kind == 'wav':
+        return build_wav(AUDIO_SECONDS[size], seed)
+    text = generate_text(TEXT_SIZES[size], seed)
+    if kind == 'txt':
+        return text.encode('utf-8')
+    builders = {'pdf': build_pdf, 'docx': build_docx, 'html': build_html}
+    return builders[kind](text)
+
+
+def corpus_path(kind: str, size: str, directory=CORPUS_DIR) -> Path:
+    return Path(directory) / f"{size}.{kind}"
+
+
+def ensure_corpus(kinds=KINDS, sizes=TEXT_SIZES, directory=CORPUS_DIR, seed: int = 0) -> dict:
+    """
+    Generates the corpus files that do not exist yet; existing files are kept, so delete the
+    directory to regenerate it with another seed.
+
+    Returns:
+        dict: The path of every document, by (kind, size).
+    """
+    paths = {}
+    for kind in kinds:
+        for size in sizes:
+            path = corpus_path(kind, size, directory)
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(build_document(kind, size, seed))
+            paths[(kind, size)] = path
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default=str(CORPUS_DIR), help='Directory to write the corpus to.')
+    parser.add_argument('--kinds', nargs='+', default=KINDS, choices=KINDS)
+    parser.add_argument('--sizes', nargs='+', default=list(TEXT_SIZES), choices=list(TEXT_SIZES))
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for (kind, size), path in ensure_corpus(args.kinds, args.sizes, args.output, args.seed).items():
+        print(f"{kind:5} {size:7} {path.stat().st_size:>12,} bytes  {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""
+Local stand-in for the Gemini REST API, answering generateContent, streamGenerateContent and
+countTokens with synthetic summaries after a configurable delay.
+
+Run it on its own with:
+
+    python -m benchmarks.fake_model --port 8765 --latency 0.8 --jitter 0.2
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BULLET_COUNT = re.compile(r'in form of (\d+) bullet points')
+SENTENCE_COUNT = re.compile(r'in form of a (\d+) sentence text')
+WORD = re.compile(r'[A-Za-z]{4,}')
+
+
+def fake_summary(prompt: str) -> str:
+    """
+    Builds a summary of the length asked for in the prompt, using words of the prompt.
+    """
+    words = WORD.findall(prompt[-2000:]) or ['summary']
+    bullets = BULLET_COUNT.search(prompt)
+    match = bullets or SENTENCE_COUNT.search(prompt)
+    count = int(match.group(1)) if match else 3
+    sentences = [
+        f"The text discusses {words[index % len(words)]} and {words[(index * 7 + 3) % len(words)]} in detail."
+        for index in range(count)
+    ]
+    if bullets:
+        return "\n".join(f"* {sentence}" for sentence in sentences)
+    return " ".join(sentences)
+
+
+def _response(text: str) -> dict:
+    return {
+        'candidates': [{'content': {'parts': [{'text': text}], 'role': 'model'}, 'finishReason': 'STOP', 'index': 0}],
+    }
+
+
+class FakeModelHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        prompt = "".join(part.get('text', '') for content in request.get('contents', [])
+                         for part in content.get('parts', []))
+        options = self.server.options
+        self.server.record_request()
+
+        if ':countTokens' in self.path:
+            self._send_json(200, {'totalTokens': len(prompt) // 4 + 1})
+            return
+
+        time.sleep(max(0.0, random.gauss(options['latency'], options['jitter'])))
+        if random.random() < options['error_rate']:
+            self._send_json(503, {'error': {'code': 503, 'message': 'The model is overloaded.', 'status': 'UNAVAILABLE'}})
+            return
+
+        summary = fake_summary(prompt)
+        if ':streamGenerateContent' not in self.path:
+            self._send_json(200, _response(summary))
+            return
+
+        # REST streaming sends a JSON array whose elements arrive one chunk at a time.
+        words = summary.split(' ')
+        size = options['chunk_words']
+        chunks = [" ".join(words[start:start + size]) + (" " if start + size < len(words) else "")
+                  for start in range(0, len(words), size)]
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        self.wfile.write(b'[')
+        for index, chunk in enumerate(chunks):
+            if index:
+                time.sleep(options['chunk_interval'])
+                self.wfile.write(b',')
+            self.wfile.write(json.dumps(_response(chunk)).encode('utf-8'))
+            self.wfile.flush()
+        self.wfile.write(b']')
+
+
+class FakeModelServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server imitating the Gemini API.
+
+    Args:
+        port (int): The port to listen on; 0 picks a free one.
+        latency (float): Mean seconds before a generation request is answered.
+        jitter (float): Standard deviation of the latency.
+        error_rate (float): Fraction of generation requests answered with 503.
+        chunk_words (int): Words per streamed chunk.
+        chunk_interval (float): Seconds between streamed chunks.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, latency: float = 0.5, jitter: float = 0.1, error_rate: float = 0.0,
+                 chunk_words: int = 4, chunk_interval: float = 0.02):
+        super().__init__(('127.0.0.1', port), FakeModelHandler)
+        self.options = {
+            'latency': latency, 'jitter': jitter, 'error_rate': error_rate,
+            'chunk_words': chunk_words, 'chunk_interval': chunk_interval,
+        }
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def start(self) -> 'FakeModelServer':
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-model', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class FakeTranscriptionBackend:
+    """
+    Transcription backend for benchmarks: waits like a speech service would and returns
+    a fixed number of words per second of audio.
+    """
+
+    # Seconds spent per transcribed segment, and words returned per second of audio.
+    LATENCY = 0.05
+    WORDS_PER_SECOND = 2.5
+
+    def transcribe(self, audio) -> str:
+        time.sleep(self.LATENCY)
+        seconds = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+        return " ".join(f"word{index}" for index in range(max(1, int(seconds * self.WORDS_PER_SECOND))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.5, help='Mean response latency in seconds.')
+    parser.add_argument('--jitter', type=float, default=0.1, help='Standard deviation of the latency.')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests failing with 503.')
+    parser.add_argument('--chunk-words', type=int, default=4, help='Words per streamed chunk.')
+    parser.add_argument('--chunk-interval', type=float, default=0.02, help='Seconds between streamed chunks.')
+    args = parser.parse_args()
+
+    server = FakeModelServer(args.port, args.latency, args.jitter, args.error_rate, args.chunk_words,
+                             args.chunk_interval)
+    print(f"Fake model listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
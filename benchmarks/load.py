@@ -0,0 +1,246 @@
+"""
+Load test of the `/api/` endpoint. By default it starts the model stand-in and the project
+under uvicorn with the benchmark settings, sends requests from concurrent clients for a fixed
+time and reports throughput, latency percentiles, status codes and server memory.
+
+    python -m benchmarks.load --concurrency 16 --duration 30 --model-latency 0.8
+    python -m benchmarks.load --target http://127.0.0.1:8000/api/ --server-pid 4242
+"""
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .common import PROJECT_DIR, describe, read_rss_bytes, write_results
+from .corpus import CORPUS_DIR, TEXT_SIZES, ensure_corpus, generate_text
+from .fake_model import FakeModelServer
+
+INPUTS = ['text', 'txt', 'pdf', 'docx', 'wav']
+# Characters of generated text sent with `--input text`; typed text is limited to 4096 characters.
+TEXT_INPUT_CHARACTERS = 3500
+MEMORY_SAMPLE_SECONDS = 0.25
+SERVER_START_TIMEOUT = 60
+
+
+class PayloadFactory:
+    """
+    Builds the form fields and files of the n-th request. Text inputs differ between requests
+    unless `repeat` is set, so the summary cache does not answer them.
+    """
+
+    def __init__(self, input_kind: str, size: str, form: str, length: int, stream: bool, repeat: bool, corpus: str):
+        self.input_kind = input_kind
+        self.repeat = repeat
+        self.fields = {'form': form, 'length': length, 'language': 'English', 'granularity': 'general'}
+        if stream:
+            self.fields['stream'] = 'true'
+        if input_kind == 'text':
+            self.text = generate_text(TEXT_INPUT_CHARACTERS)[:TEXT_INPUT_CHARACTERS - 20]
+        else:
+            self.content = ensure_corpus([input_kind], [size], corpus)[(input_kind, size)].read_bytes()
+            self.filename = f'{size}.{input_kind}'
+
+    def build(self, index: int):
+        suffix = "" if self.repeat else f" Request {index}."
+        if self.input_kind == 'text':
+            return dict(self.fields, input_type='text', text=self.text + suffix), None
+        content = self.content
+        if self.input_kind == 'txt':
+            content += suffix.encode('utf-8')
+        return dict(self.fields, input_type='file'), {'file': (self.filename, content)}
+
+
+class MemorySampler(threading.Thread):
+    """
+    Samples the resident memory of the server process and its children until stopped.
+    """
+
+    def __init__(self, pid: int):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.samples = []
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            rss = read_rss_bytes(self.pid)
+            if rss:
+                self.samples.append(rss)
+            self._stopped.wait(MEMORY_SAMPLE_SECONDS)
+
+    def stop(self) -> dict:
+        self._stopped.set()
+        self.join()
+        if not self.samples:
+            return {}
+        return {
+            'start_mb': self.samples[0] / 1e6,
+            'peak_mb': max(self.samples) / 1e6,
+            'end_mb': self.samples[-1] / 1e6,
+        }
+
+
+def start_server(server: str, port: int, workers: int, model_url: str, extraction_cache: bool = True) -> subprocess.Popen:
+    """
+    Migrates the benchmark database and starts the project with the benchmark settings.
+    """
+    environment = dict(os.environ, DJANGO_SETTINGS_MODULE='benchmarks.settings', BENCHMARK_MODEL_URL=model_url,
+                       BENCHMARK_EXTRACTION_CACHE='1' if extraction_cache else '0')
+    subprocess.run([sys.executable, 'manage.py', 'migrate', '--verbosity', '0'], cwd=PROJECT_DIR,
+                   env=environment, check=True)
+    if server == 'uvicorn':
+        command = [sys.executable, '-m', 'uvicorn', 'SummarizationProject.asgi:application', '--port', str(port),
+                   '--workers', str(workers), '--log-level', 'warning', '--no-access-log']
+    else:
+        command = [sys.executable, 'manage.py', 'runserver', f'127.0.0.1:{port}', '--noreload']
+    process = subprocess.Popen(command, cwd=PROJECT_DIR, env=environment,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"The server exited with status {process.returncode}.")
+        try:
+            requests.get(f'http://127.0.0.1:{port}/metrics', timeout=1)
+            return process
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("The server did not start in time.")
+
+
+def run_load(target: str, payloads: PayloadFactory, concurrency: int, duration: float, max_requests: int,
+             timeout: float) -> dict:
+    """
+    Sends requests from `concurrency` clients until `duration` seconds have passed or
+    `max_requests` have been sent.
+
+    Returns:
+        dict: Throughput, latency and time-to-first-byte statistics and status code counts.
+    """
+    latencies = []
+    first_bytes = []
+    statuses = Counter()
+    lock = threading.Lock()
+    counter = iter(range(max_requests or sys.maxsize))
+    deadline = time.monotonic() + duration
+
+    def client():
+        session = requests.Session()
+        while time.monotonic() < deadline:
+            with lock:
+                index = next(counter, None)
+            if index is None:
+                return
+            data, files = payloads.build(index)
+            started = time.perf_counter()
+            try:
+                with session.post(target, data=data, files=files, timeout=timeout, stream=True) as response:
+                    first_byte = None
+                    for _ in response.iter_content(64 * 1024):
+                        if first_byte is None:
+                            first_byte = time.perf_counter() - started
+                    status = response.status_code
+            except requests.RequestException as e:
+                status, first_byte = type(e).__name__, None
+            elapsed = time.perf_counter() - started
+            with lock:
+                statuses[str(status)] += 1
+                if status == 200:
+                    latencies.append(elapsed)
+                    if first_byte is not None:
+                        first_bytes.append(first_byte)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(client) for _ in range(concurrency)]:
+            future.result()
+    wall = time.perf_counter() - started
+
+    total = sum(statuses.values())
+    return {
+        'requests': total,
+        'wall_seconds': wall,
+        'requests_per_second': total / wall if wall else 0.0,
+        'successful_per_second': len(latencies) / wall if wall else 0.0,
+        'error_rate': (total - statuses.get('200', 0)) / total if total else 0.0,
+        'statuses': dict(statuses),
+        'latency': describe(latencies),
+        'time_to_first_byte': describe(first_bytes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', help='URL of a running /api/ endpoint; by default a server is started.')
+    parser.add_argument('--server-pid', type=int, help='Process to sample memory from when --target is given.')
+    parser.add_argument('--server', choices=['uvicorn', 'runserver'], default='uvicorn')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--workers', type=int, default=2, help='uvicorn worker processes.')
+    parser.add_argument('--input', choices=INPUTS, default='text')
+    parser.add_argument('--size', choices=list(TEXT_SIZES), default='small', help='Corpus size of file inputs.')
+    parser.add_argument('--form', choices=['text', 'bullet'], default='bullet')
+    parser.add_argument('--length', type=int, default=5)
+    parser.add_argument('--stream', action='store_true', help='Request Server-Sent Events.')
+    parser.add_argument('--repeat', action='store_true', help='Send identical inputs, so the cache answers.')
+    parser.add_argument('--no-extraction-cache', action='store_true',
+                        help='Extract every uploaded file again instead of reusing cached text.')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=20, help='Seconds to send requests for.')
+    parser.add_argument('--requests', type=int, default=0, help='Stop after this many requests (0: no limit).')
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--model-latency', type=float, default=0.5)
+    parser.add_argument('--model-jitter', type=float, default=0.1)
+    parser.add_argument('--model-error-rate', type=float, default=0.0)
+    parser.add_argument('--corpus', default=str(CORPUS_DIR))
+    parser.add_argument('--name', help='Result name; defaults to one derived from the options.')
+    parser.add_argument('--output', help='Result file; defaults to benchmarks/results/load-<timestamp>.json.')
+    args = parser.parse_args()
+
+    payloads = PayloadFactory(args.input, args.size, args.form, args.length, args.stream, args.repeat, args.corpus)
+    model_server = process = None
+    target, pid = args.target, args.server_pid
+    if target is None:
+        model_server = FakeModelServer(latency=args.model_latency, jitter=args.model_jitter,
+                                       error_rate=args.model_error_rate).start()
+        process = start_server(args.server, args.port, args.workers, model_server.url, not args.no_extraction_cache)
+        target, pid = f'http://127.0.0.1:{args.port}/api/', process.pid
+
+    sampler = MemorySampler(pid) if pid else None
+    if sampler:
+        sampler.start()
+    try:
+        result = run_load(target, payloads, args.concurrency, args.duration, args.requests, args.timeout)
+    finally:
+        memory = sampler.stop() if sampler else {}
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        if model_server is not None:
+            model_server.stop()
+
+    name = args.name or f"load_{args.input}{'' if args.input == 'text' else '_' + args.size}" \
+                        f"{'_stream' if args.stream else ''}_c{args.concurrency}"
+    result = {'name': name, **result, 'memory': memory}
+    if model_server is not None:
+        result['model_requests'] = model_server.requests
+
+    latency = result['latency']
+    print(f"{name}: {result['requests']} requests, {result['requests_per_second']:.1f} req/s, "
+          f"error rate {result['error_rate']:.1%}")
+    print(f"latency p50 {latency['p50'] * 1000:.0f} ms  p95 {latency['p95'] * 1000:.0f} ms  "
+          f"p99 {latency['p99'] * 1000:.0f} ms   statuses {result['statuses']}")
+    if memory:
+        print(f"server memory start {memory['start_mb']:.0f} MB  peak {memory['peak_mb']:.0f} MB")
+    path = write_results('load', vars(args), [result], args.output)
+    print(f"Results written to {path}")
+
+
+if __name__ == '__main__':
+    main()
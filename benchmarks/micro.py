@@ -0,0 +1,150 @@
+"""
+Microbenchmarks of upload ingestion, the extraction functions, the summary formatting helpers and a
+`generate_summary` round trip to the local model stand-in.
+
+    python -m benchmarks.micro --sizes small medium --filter extract_
+"""
+import argparse
+import functools
+import os
+import re
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from .common import describe, measure, setup_django, write_results
+from .corpus import CORPUS_DIR, TEXT_SIZES, ensure_corpus, generate_text
+from .fake_model import FakeModelServer, fake_summary
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def _serve_directory(directory) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(_QuietHandler, directory=str(directory)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def extraction_cases(paths: dict, sizes: list, page_server) -> list:
+    """
+    Returns `(name, group, input_bytes, function)` cases timing every extractor on every corpus document.
+    """
+    from django.core.files.uploadedfile import SimpleUploadedFile
+
+    from summarizer.html_extraction import extract_main_text
+    from summarizer.ingestion import ingest_upload
+    from summarizer.utils import FILE_EXTRACTORS, extract_text_from_url
+
+    cases = []
+    for size in sizes:
+        for kind in ['txt', 'pdf', 'docx', 'wav']:
+            content = paths[(kind, size)].read_bytes()
+            extractor = FILE_EXTRACTORS[kind]
+            cases.append((f'extract_{kind}_{size}', 'extraction', len(content),
+                          lambda extractor=extractor, content=content, name=f'{size}.{kind}':
+                          extractor(SimpleUploadedFile(name, content))))
+            cases.append((f'ingest_{kind}_{size}', 'ingestion', len(content),
+                          lambda content=content, name=f'{size}.{kind}':
+                          ingest_upload(SimpleUploadedFile(name, content)).close()))
+        html_path = paths[('html', size)]
+        html = html_path.read_text(encoding='utf-8')
+        cases.append((f'extract_html_{size}', 'extraction', len(html.encode('utf-8')),
+                      lambda html=html: extract_main_text(html)))
+        url = f'http://127.0.0.1:{page_server.server_address[1]}/{html_path.name}'
+        cases.append((f'extract_url_{size}', 'extraction', html_path.stat().st_size,
+                      lambda url=url: extract_text_from_url(url)))
+    return cases
+
+
+def formatting_cases() -> list:
+    """
+    Returns cases for prompt building, summary formatting and streamed formatting.
+    """
+    from summarizer.utils import SummaryStreamFormatter, build_summary_prompt, format_summary
+
+    text = generate_text(TEXT_SIZES['medium'])
+    bullets = fake_summary("in form of 30 bullet points " + text)
+    sentences = fake_summary("in form of a 30 sentence text " + text)
+    chunks = [bullets[start:start + 16] for start in range(0, len(bullets), 16)]
+
+    def stream_format():
+        formatter = SummaryStreamFormatter('bullet')
+        for chunk in chunks:
+            formatter.feed(chunk)
+        formatter.finish()
+
+    return [
+        ('build_summary_prompt', 'formatting', len(text),
+         lambda: build_summary_prompt('bullet', 10, 'English', text, 'detailed')),
+        ('format_summary_text', 'formatting', len(sentences), lambda: format_summary('text', sentences)),
+        ('format_summary_bullet', 'formatting', len(bullets), lambda: format_summary('bullet', bullets)),
+        ('stream_formatter_bullet', 'formatting', len(bullets), stream_format),
+    ]
+
+
+def export_cases() -> list:
+    """
+    Returns a case per export format, rendering a bullet summary.
+    """
+    from summarizer.export import EXPORTERS, export_summary
+    from summarizer.utils import format_summary
+
+    text = generate_text(TEXT_SIZES['small'])
+    summary = format_summary('bullet', fake_summary("in form of 10 bullet points " + text))
+    return [(f'export_{name}', 'export', len(summary), lambda name=name: export_summary(summary, name))
+            for name in EXPORTERS]
+
+
+def model_cases() -> list:
+    """
+    Returns a case timing `generate_summary` against the model stand-in, which answers without delay.
+    """
+    from summarizer.utils import generate_summary
+
+    text = generate_text(TEXT_SIZES['small'])
+    return [
+        ('generate_summary', 'model', len(text),
+         lambda: generate_summary('bullet', 5, 'English', text, 'general')),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', default=list(TEXT_SIZES), choices=list(TEXT_SIZES))
+    parser.add_argument('--filter', default='', help='Regular expression selecting benchmarks by name.')
+    parser.add_argument('--min-seconds', type=float, default=1.0, help='Minimum time spent per benchmark.')
+    parser.add_argument('--min-repeats', type=int, default=5, help='Minimum calls per benchmark.')
+    parser.add_argument('--corpus', default=str(CORPUS_DIR), help='Directory of the generated corpus.')
+    parser.add_argument('--output', help='Result file; defaults to benchmarks/results/micro-<timestamp>.json.')
+    args = parser.parse_args()
+
+    model_server = FakeModelServer(latency=0, jitter=0).start()
+    os.environ['BENCHMARK_MODEL_URL'] = model_server.url
+    setup_django()
+
+    paths = ensure_corpus(sizes=args.sizes, directory=args.corpus)
+    page_server = _serve_directory(args.corpus)
+    selected = re.compile(args.filter)
+    cases = extraction_cases(paths, args.sizes, page_server) + formatting_cases() + export_cases() + model_cases()
+
+    results = []
+    for name, group, input_bytes, function in cases:
+        if not selected.search(name):
+            continue
+        function()  # Warm up imports and caches.
+        stats = describe(measure(function, args.min_repeats, args.min_seconds))
+        stats['throughput_mb_s'] = input_bytes / stats['mean'] / 1e6 if stats['mean'] else 0.0
+        results.append({'name': name, 'group': group, 'input_bytes': input_bytes, **stats})
+        print(f"{name:28} mean {stats['mean'] * 1000:10.3f} ms  p95 {stats['p95'] * 1000:10.3f} ms  "
+              f"{stats['throughput_mb_s']:9.2f} MB/s")
+
+    page_server.shutdown()
+    model_server.stop()
+    path = write_results('micro', vars(args), results, args.output)
+    print(f"Results written to {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Django settings for benchmark runs: the project settings with the model pointed at the local
+stand-in server, offline transcription, and state kept out of the working tree.
+"""
+import os
+import tempfile
+from pathlib import Path
+
+from SummarizationProject.settings import *  # noqa: F401,F403
+
+BENCHMARK_WORK_DIR = Path(os.environ.get('BENCHMARK_WORK_DIR', Path(tempfile.gettempdir()) / 'summarizer-benchmarks'))
+BENCHMARK_WORK_DIR.mkdir(parents=True, exist_ok=True)
+
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BENCHMARK_WORK_DIR / 'db.sqlite3',
+    }
+}
+
+SUMMARY_MODEL_API_ENDPOINT = os.environ.get('BENCHMARK_MODEL_URL', 'http://127.0.0.1:8765')
+SUMMARY_GEMINI_KEY = 'benchmark'
+SUMMARY_FAILOVER_MODEL = None
+SUMMARY_MODEL_RATE_LIMIT = None
+# Every load-test client shares one address; per-client quotas would throttle the run itself.
+SUMMARY_CLIENT_REQUEST_RATE = None
+SUMMARY_CLIENT_TOKEN_RATE = None
+# Failures should show up in the results instead of being hidden by extractive summaries.
+SUMMARY_EXTRACTIVE_FALLBACK = False
+
+SUMMARY_TRANSCRIPTION_BACKEND = 'benchmarks.fake_model.FakeTranscriptionBackend'
+SUMMARY_URL_CACHE_DIR = BENCHMARK_WORK_DIR / 'url_cache'
+SUMMARY_JOB_UPLOAD_DIR = BENCHMARK_WORK_DIR / 'job_uploads'
+SUMMARY_EXTRACTION_CACHE_DIR = BENCHMARK_WORK_DIR / 'extraction_cache'
+# Repeated uploads of the same corpus file are answered from the extraction cache unless disabled.
+SUMMARY_EXTRACTION_CACHE_ENABLED = os.environ.get('BENCHMARK_EXTRACTION_CACHE', '1') == '1'
@@ -1,3 +1,24 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import StoredSummary, SummaryJob, WatchedUrl
+
+
+@admin.register(SummaryJob)
+class SummaryJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'input_type', 'created_at', 'extraction_seconds', 'summarization_seconds')
+    list_filter = ('status', 'input_type')
+
+
+@admin.register(StoredSummary)
+class StoredSummaryAdmin(admin.ModelAdmin):
+    list_display = ('id', 'input_type', 'form', 'model', 'input_tokens', 'summary_tokens', 'created_at')
+    list_filter = ('input_type', 'form', 'model')
+    search_fields = ('content_hash', 'client')
+
+
+@admin.register(WatchedUrl)
+class WatchedUrlAdmin(admin.ModelAdmin):
+    list_display = ('id', 'url', 'form', 'language', 'checked_at', 'changed_at', 'incremental_updates')
+    list_filter = ('form', 'language')
+    search_fields = ('url',)
+    exclude = ('blocks',)
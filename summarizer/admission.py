@@ -0,0 +1,467 @@
+import asyncio
+import functools
+import hashlib
+import math
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.http import JsonResponse
+
+from .metrics import Histogram, format_family, register_collector
+from .model_client import SharedTokenBucket
+from .prompt import INPUT_TOKEN_BUDGET
+
+# Whether requests go through per-client quotas and the model-work queue.
+ADMISSION_ENABLED = getattr(settings, 'SUMMARY_ADMISSION_ENABLED', True)
+# Requests doing model work at the same time in each process; further ones wait in the queue.
+ADMISSION_CONCURRENCY = getattr(settings, 'SUMMARY_ADMISSION_CONCURRENCY', 16)
+# Requests allowed to wait in each process; more are rejected at once.
+ADMISSION_MAX_QUEUE = getattr(settings, 'SUMMARY_ADMISSION_MAX_QUEUE', 64)
+# Requests whose expected wait exceeds this many seconds are rejected at once instead of queued,
+# and queued requests are rejected once they have waited this long.
+ADMISSION_MAX_WAIT_SECONDS = getattr(settings, 'SUMMARY_ADMISSION_MAX_WAIT_SECONDS', 15)
+# Share of the freed slots given to each priority class while both are waiting.
+PRIORITY_WEIGHTS = {'interactive': 4, 'batch': 1}
+INTERACTIVE, BATCH = 'interactive', 'batch'
+# Per-client quotas shared by all worker processes: sustained requests per second and burst, and sustained
+# estimated input tokens per second and burst. A rate of None disables that quota.
+CLIENT_REQUEST_RATE = getattr(settings, 'SUMMARY_CLIENT_REQUEST_RATE', 1.0)
+CLIENT_REQUEST_BURST = getattr(settings, 'SUMMARY_CLIENT_REQUEST_BURST', 20)
+CLIENT_TOKEN_RATE = getattr(settings, 'SUMMARY_CLIENT_TOKEN_RATE', 2000)
+CLIENT_TOKEN_BURST = getattr(settings, 'SUMMARY_CLIENT_TOKEN_BURST', 200000)
+# Request header identifying the client, set by a trusted gateway; without it clients are told apart
+# by their user account or address.
+CLIENT_ID_HEADER = getattr(settings, 'SUMMARY_CLIENT_ID_HEADER', None)
+# Time a slot is expected to be held before any has been released.
+INITIAL_SERVICE_SECONDS = 2.0
+# Weight of the latest slot hold time in the running average used to predict waits.
+SERVICE_TIME_SMOOTHING = 0.2
+# Client bucket rows idle for this long are full again and are deleted, every PRUNE_EVERY admissions.
+BUCKET_IDLE_SECONDS = 3600
+PRUNE_EVERY = 1000
+
+ADMISSION_WAIT_SECONDS = Histogram('summarizer_admission_wait_seconds',
+                                   'Time requests waited in the queue for a model slot.', ['priority'])
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request is turned away by a quota or the queue; answered with 429.
+
+    Args:
+        message (str): The error message.
+        reason (str): The rejection reason reported in metrics.
+        retry_after (float): Seconds after which the request may be accepted.
+    """
+
+    def __init__(self, message: str, reason: str, retry_after: float):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+def client_identity(request) -> str:
+    """
+    Returns the identity quotas are applied to: the CLIENT_ID_HEADER header when configured,
+    otherwise the authenticated user, otherwise the remote address.
+    """
+    if CLIENT_ID_HEADER:
+        value = request.headers.get(CLIENT_ID_HEADER)
+        if value:
+            return f'key:{value}'
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+class Slot:
+    """
+    Permission to do model work, held until released. Use it as a context manager.
+    """
+
+    def __init__(self, queue, priority: str):
+        self._queue = queue
+        self.priority = priority
+        self.started = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._queue.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class AdmissionQueue:
+    """
+    Bounded queue in front of model work with weighted-fair scheduling between priority classes.
+
+    Up to `concurrency` slots are held at once. Further requests wait in a FIFO per class; a freed
+    slot goes to the waiting class with the lowest virtual time, which advances by 1 / weight each
+    time the class is served, so classes share the slots in proportion to their weights and none
+    starves. A request is rejected at once when the queue is full or its predicted wait, from the
+    running average slot hold time, exceeds `max_wait`.
+
+    Args:
+        concurrency (int): The number of slots.
+        max_queue (int): The number of waiting requests allowed.
+        max_wait (float): The longest wait in seconds.
+        weights (dict): The weight of each priority class.
+    """
+
+    def __init__(self, concurrency: int = ADMISSION_CONCURRENCY, max_queue: int = ADMISSION_MAX_QUEUE,
+                 max_wait: float = ADMISSION_MAX_WAIT_SECONDS, weights: dict = None):
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.weights = dict(weights or PRIORITY_WEIGHTS)
+        self.active = 0
+        self.counters = Counter()
+        self._waiting = {priority: deque() for priority in self.weights}
+        self._virtual_time = {priority: 0.0 for priority in self.weights}
+        self._clock = 0.0
+        self._service_seconds = INITIAL_SERVICE_SECONDS
+        self._lock = threading.Lock()
+
+    def _queued(self) -> int:
+        return sum(len(waiting) for waiting in self._waiting.values())
+
+    def _ahead_of(self, priority: str) -> float:
+        # Waiters served before a new one of this class: its own class, and the other classes in
+        # proportion to their weights while it drains.
+        own = len(self._waiting[priority]) + 1
+        ahead = own - 1
+        for other, waiting in self._waiting.items():
+            if other != priority:
+                ahead += min(len(waiting), own * self.weights[other] / self.weights[priority])
+        return ahead
+
+    def estimated_wait(self, priority: str) -> float:
+        """
+        Predicts how long a new request of the class would wait for a slot.
+        """
+        with self._lock:
+            return self._estimated_wait(priority)
+
+    def _estimated_wait(self, priority: str) -> float:
+        if self.active < self.concurrency and not self._queued():
+            return 0.0
+        return (self._ahead_of(priority) + 1) * self._service_seconds / self.concurrency
+
+    def _enqueue(self, priority: str, bounded: bool):
+        # Returns None when a slot was taken at once, otherwise the future granting one.
+        with self._lock:
+            if self.active < self.concurrency and not self._queued():
+                self.active += 1
+                return None
+            if bounded:
+                if self._queued() >= self.max_queue:
+                    self.counters['queue_full'] += 1
+                    raise AdmissionRejected("The server is busy; the queue is full.", 'queue_full',
+                                            self._estimated_wait(priority))
+                wait = self._estimated_wait(priority)
+                if wait > self.max_wait:
+                    self.counters['wait_deadline'] += 1
+                    raise AdmissionRejected("The server is busy; the expected wait is too long.", 'wait_deadline',
+                                            wait)
+            if not self._waiting[priority]:
+                # A class coming back from idle does not get to catch up on the turns it skipped.
+                self._virtual_time[priority] = max(self._virtual_time[priority], self._clock)
+            future = Future()
+            self._waiting[priority].append(future)
+            return future
+
+    def _give_up(self, priority: str, future: Future):
+        # Called when a wait timed out; the slot may have been granted in the meantime.
+        with self._lock:
+            if future.cancel():
+                self._waiting[priority].remove(future)
+                self.counters['timeout'] += 1
+                raise AdmissionRejected("The server is busy; the request waited too long.", 'timeout',
+                                        self._estimated_wait(priority))
+
+    def _granted(self, priority: str, waited: float) -> Slot:
+        ADMISSION_WAIT_SECONDS.observe(waited, priority=priority)
+        self.counters['admitted'] += 1
+        return Slot(self, priority)
+
+    def acquire(self, priority: str = INTERACTIVE, bounded: bool = True) -> Slot:
+        """
+        Waits for a slot.
+
+        Args:
+            priority (str): The priority class, one of the weights.
+            bounded (bool): Whether the queue bound and the wait limit apply; background work passes
+                False to wait as long as it takes.
+
+        Returns:
+            Slot: The slot, to be released once the model work is done.
+
+        Raises:
+            AdmissionRejected: If the queue is full or the wait would be, or was, too long.
+        """
+        started = time.monotonic()
+        future = self._enqueue(priority, bounded)
+        if future is not None:
+            try:
+                future.result(timeout=self.max_wait if bounded else None)
+            except FutureTimeoutError:
+                self._give_up(priority, future)
+        return self._granted(priority, time.monotonic() - started)
+
+    async def acquire_async(self, priority: str = INTERACTIVE) -> Slot:
+        """
+        Asynchronous variant of `acquire` that waits without blocking the event loop.
+        """
+        started = time.monotonic()
+        future = self._enqueue(priority, True)
+        if future is not None:
+            try:
+                await asyncio.wait([asyncio.wrap_future(future)], timeout=self.max_wait)
+            except asyncio.CancelledError:
+                # The client went away; leave the queue, or pass on a slot granted meanwhile.
+                with self._lock:
+                    cancelled = future.cancel()
+                    if cancelled:
+                        self._waiting[priority].remove(future)
+                if not cancelled:
+                    self.release(Slot(self, priority))
+                raise
+            if not future.done():
+                self._give_up(priority, future)
+        return self._granted(priority, time.monotonic() - started)
+
+    def release(self, slot: Slot):
+        """
+        Frees a slot, handing it to the next waiter chosen by weighted-fair order.
+        """
+        held = time.monotonic() - slot.started
+        with self._lock:
+            self._service_seconds += SERVICE_TIME_SMOOTHING * (held - self._service_seconds)
+            while True:
+                waiting = [priority for priority, futures in self._waiting.items() if futures]
+                if not waiting:
+                    self.active -= 1
+                    return
+                priority = min(waiting, key=lambda name: self._virtual_time[name])
+                future = self._waiting[priority].popleft()
+                self._virtual_time[priority] += 1 / self.weights[priority]
+                self._clock = self._virtual_time[priority]
+                if future.set_running_or_notify_cancel():
+                    future.set_result(None)
+                    return
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'active': self.active,
+                'queued': {priority: len(futures) for priority, futures in self._waiting.items()},
+                'service_seconds': self._service_seconds,
+                'counters': dict(self.counters),
+            }
+
+
+class ClientQuotas:
+    """
+    Per-client token buckets, in requests and in estimated input tokens, shared by all worker
+    processes through the database like the model rate limiter. Bucket rows of idle clients
+    are deleted from time to time.
+    """
+
+    def __init__(self, request_rate=CLIENT_REQUEST_RATE, request_burst=CLIENT_REQUEST_BURST,
+                 token_rate=CLIENT_TOKEN_RATE, token_burst=CLIENT_TOKEN_BURST):
+        self.request_rate = request_rate
+        self.request_burst = request_burst
+        self.token_rate = token_rate
+        self.token_burst = token_burst
+        self.counters = Counter()
+        self._checks = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _bucket_name(kind: str, client: str) -> str:
+        return f"client-{kind}:{hashlib.sha256(client.encode('utf-8')).hexdigest()[:48]}"
+
+    def check_request(self, client: str, requests: int = 1):
+        """
+        Takes `requests` from the client's request quota. More requests than the burst are
+        admitted once the quota is full and leave it in debt, so a large batch costs the client
+        as much waiting as the same number of single requests.
+
+        Raises:
+            AdmissionRejected: If the quota is exhausted.
+        """
+        if self.request_rate:
+            bucket = SharedTokenBucket(self._bucket_name('requests', client), self.request_rate, self.request_burst)
+            delay = bucket.reserve(requests)
+            if delay:
+                self.counters['request_quota'] += 1
+                raise AdmissionRejected("Request quota exceeded.", 'request_quota', delay)
+        self._maybe_prune()
+
+    def charge_tokens(self, client: str, tokens: int):
+        """
+        Takes the estimated input tokens of a request from the client's token quota. Inputs are
+        cut to INPUT_TOKEN_BUDGET before summarization, so larger ones are charged that budget.
+
+        Raises:
+            AdmissionRejected: If the quota is exhausted.
+        """
+        if self.token_rate:
+            bucket = SharedTokenBucket(self._bucket_name('tokens', client), self.token_rate, self.token_burst)
+            delay = bucket.reserve(min(tokens, INPUT_TOKEN_BUDGET))
+            if delay:
+                self.counters['token_quota'] += 1
+                raise AdmissionRejected("Input token quota exceeded.", 'token_quota', delay)
+
+    def _maybe_prune(self):
+        with self._lock:
+            self._checks += 1
+            if self._checks % PRUNE_EVERY:
+                return
+        from .models import RateLimitBucket
+
+        try:
+            RateLimitBucket.objects.filter(name__startswith='client-',
+                                           updated_at__lt=time.time() - BUCKET_IDLE_SECONDS).delete()
+        except DatabaseError:
+            pass
+
+
+class AdmissionController:
+    """
+    Admission control in front of the model: per-client quotas checked when a request arrives and
+    once its input size is known, and the weighted-fair queue bounding concurrent model work.
+    When disabled every request is admitted and slots are not limited.
+    """
+
+    def __init__(self, enabled: bool = ADMISSION_ENABLED):
+        self.enabled = enabled
+        self.quotas = ClientQuotas()
+        self.queue = AdmissionQueue()
+
+    def check_request(self, client: str, requests: int = 1):
+        if self.enabled:
+            self.quotas.check_request(client, requests)
+
+    def charge_tokens(self, client: str, tokens: int):
+        if self.enabled:
+            self.quotas.charge_tokens(client, tokens)
+
+    def slot(self, priority: str = INTERACTIVE, bounded: bool = True):
+        if not self.enabled:
+            return _NullSlot()
+        return self.queue.acquire(priority, bounded)
+
+    async def slot_async(self, priority: str = INTERACTIVE):
+        if not self.enabled:
+            return _NullSlot()
+        return await self.queue.acquire_async(priority)
+
+
+class _NullSlot:
+    def release(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_admission_controller = None
+_admission_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """
+    Returns the process-wide admission controller.
+    """
+    global _admission_controller
+    if _admission_controller is None:
+        with _admission_controller_lock:
+            if _admission_controller is None:
+                _admission_controller = AdmissionController()
+    return _admission_controller
+
+
+@register_collector
+def admission_metrics() -> list:
+    """
+    Exposes the queue length per priority class, the slots in use and the rejection counters.
+    """
+    if _admission_controller is None:
+        return []
+    stats = _admission_controller.queue.stats()
+    rejections = Counter(_admission_controller.quotas.counters)
+    rejections.update({reason: count for reason, count in stats['counters'].items() if reason != 'admitted'})
+    lines = format_family('summarizer_admission_queue_length', 'Requests waiting for a model slot.', 'gauge',
+                          [({'priority': priority}, count) for priority, count in sorted(stats['queued'].items())])
+    lines.extend(format_family('summarizer_admission_active_slots', 'Model slots in use.', 'gauge',
+                               [({}, stats['active'])]))
+    lines.extend(format_family('summarizer_admission_rejections_total', 'Requests rejected by reason.', 'counter',
+                               [({'reason': reason}, count) for reason, count in sorted(rejections.items())]))
+    return lines
+
+
+def _rejected_response(error: AdmissionRejected) -> JsonResponse:
+    return JsonResponse({'error': str(error)}, status=429, headers={'Retry-After': str(error.retry_after)})
+
+
+def rejects_with_429(view):
+    """
+    Decorates a view, sync or async, so that AdmissionRejected raised while handling the request
+    is answered with 429 Too Many Requests and a Retry-After header.
+    """
+    if asyncio.iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            try:
+                return await view(request, *args, **kwargs)
+            except AdmissionRejected as e:
+                return _rejected_response(e)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except AdmissionRejected as e:
+            return _rejected_response(e)
+    return wrapper
+
+
+class SlotReleasingStream:
+    """
+    Wraps the iterator of a streaming response so that a slot is released when the response is
+    closed, whether or not it was iterated to the end.
+    """
+
+    def __init__(self, iterator, slot):
+        self._iterator = iter(iterator)
+        self._slot = slot
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._iterator)
+
+    def close(self):
+        try:
+            close = getattr(self._iterator, 'close', None)
+            if close is not None:
+                close()
+        finally:
+            self._slot.release()
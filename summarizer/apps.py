@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.core.signals import request_started
 
 
 class SummarizerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'summarizer'
+
+    def ready(self):
+        from .jobs import JOB_RUN_IN_PROCESS, start_worker_pool
+
+        # Management commands such as migrate never serve requests, so they do not start workers.
+        if JOB_RUN_IN_PROCESS:
+            request_started.connect(start_worker_pool)
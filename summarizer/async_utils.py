@@ -0,0 +1,111 @@
+import asyncio
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+
+from .fetch import DOWNLOAD_CHUNK_SIZE, CappedBody, ResponseTooLarge, conditional_headers, decode_body, \
+    get_disk_cache, revalidated, store_response
+from .html_extraction import extract_main_text
+from .ingestion import extract_text_from_upload
+from .metrics import stage
+from .registry import lazy_module
+
+httpx = lazy_module('httpx')
+
+# Connect and read timeouts, in seconds, for fetching URLs.
+URL_CONNECT_TIMEOUT = 5.0
+URL_READ_TIMEOUT = 10.0
+# Worker threads running CPU-bound extraction (PyPDF2, python-docx) and blocking speech recognition.
+EXTRACTION_WORKERS = 8
+
+extraction_executor = ThreadPoolExecutor(max_workers=EXTRACTION_WORKERS, thread_name_prefix='extraction')
+_http_clients = weakref.WeakKeyDictionary()
+
+
+def get_http_client() -> 'httpx.AsyncClient':
+    """
+    Returns the asynchronous HTTP client of the running event loop, so connections are pooled between requests.
+    """
+    loop = asyncio.get_running_loop()
+    client = _http_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(timeout=httpx.Timeout(URL_READ_TIMEOUT, connect=URL_CONNECT_TIMEOUT),
+                                   follow_redirects=True)
+        _http_clients[loop] = client
+    return client
+
+
+async def fetch_url_async(url: str) -> str:
+    """
+    Asynchronous counterpart of `fetch.fetch_url`: the page goes through the same on-disk HTTP
+    cache and its body is streamed under the same MAX_DOWNLOAD_BYTES cap. Cache files are read
+    and written in the extraction pool.
+
+    Args:
+        url (str): The URL to fetch.
+
+    Returns:
+        str: The decoded response body.
+
+    Raises:
+        httpx.HTTPError: If the request fails, times out, returns an error status or uses an
+            unsupported scheme.
+        httpx.InvalidURL: If the URL cannot be parsed.
+        httpx.StreamError: If the response body cannot be read.
+        ResponseTooLarge: If the body exceeds MAX_DOWNLOAD_BYTES.
+    """
+    loop = asyncio.get_running_loop()
+    cache = get_disk_cache()
+    cached = await loop.run_in_executor(extraction_executor, cache.get, url)
+    if cached and cached['expires_at'] > time.time():
+        return cached['body']
+
+    async with get_http_client().stream('GET', url, headers=conditional_headers(cached)) as response:
+        if cached and response.status_code == 304:
+            return await loop.run_in_executor(extraction_executor, revalidated, cache, url, cached,
+                                              response.headers)
+        response.raise_for_status()  # Ensure successful request
+        body = CappedBody(response.headers)
+        async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+            body.add(chunk)
+        text = decode_body(body.content(), response.encoding)
+    await loop.run_in_executor(extraction_executor, store_response, cache, url, text, response.headers)
+    return text
+
+
+@stage('extract_url')
+async def extract_text_from_url_async(url: str) -> str:
+    """
+    Asynchronously fetches a URL and extracts its text content. Parsing runs in the extraction pool.
+    Fetch failures give the same error message as the synchronous `extract_text_from_url`.
+
+    Args:
+        url (str): The URL from which to extract text.
+
+    Returns:
+        str: Extracted text from the webpage, or an error message if fetching fails.
+    """
+    try:
+        html = await fetch_url_async(url)
+    except (httpx.HTTPError, httpx.InvalidURL, httpx.StreamError, ResponseTooLarge) as e:
+        return f"Error fetching content from URL: {e}"
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(extraction_executor, extract_main_text, html)
+
+
+async def extract_text_from_upload_async(upload) -> str:
+    """
+    Runs the extractor matching the resolved type of an ingested upload in the extraction pool.
+
+    Args:
+        upload (IngestedUpload): The validated upload.
+
+    Raises:
+        ExtractionError: If the file cannot be read.
+
+    Returns:
+        str: The extracted text.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(extraction_executor, extract_text_from_upload, upload)
@@ -0,0 +1,229 @@
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .model_client import SummaryGenerationError, get_model_client, note_model
+from .prompt import estimate_tokens
+from .registry import lazy_module
+from .utils import generate_summary
+
+np = lazy_module('numpy')
+
+# Inputs of at most this many tokens are summarized locally; 0 sends every input to the model.
+EXTRACTIVE_MAX_TOKENS = getattr(settings, 'SUMMARY_EXTRACTIVE_MAX_TOKENS', 0)
+# Whether the extractive engine answers when the model fails.
+EXTRACTIVE_FALLBACK = getattr(settings, 'SUMMARY_EXTRACTIVE_FALLBACK', True)
+
+# Limits keeping the dense TF-IDF and similarity matrices small for very long inputs.
+MAX_SENTENCES = 2000
+MAX_VOCABULARY = 4096
+# Damping factor and iterations of the TextRank power iteration.
+DAMPING = 0.85
+MAX_ITERATIONS = 50
+CONVERGENCE_TOLERANCE = 1e-6
+
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+|\n{2,}')
+WORD = re.compile(r'\w+', re.UNICODE)
+
+
+class DegradedSummary(str):
+    """
+    A summary produced by the fallback engine while the model is failing. It is served, flagged
+    as degraded since it is extractive and stays in the language of the document, but not cached.
+    """
+
+    cacheable = False
+    degraded = True
+
+
+class SummarizerBackend:
+    """
+    Interface of a summarization engine.
+    """
+
+    name = None
+
+    def summarize(self, form: str, length: int, language: str, text: str, granularity: str) -> str:
+        """
+        Summarizes the text.
+
+        Args:
+            form (str): The desired form of the summary ('text' or 'bullet').
+            length (int): The desired length of the summary as number of sentences (1-30).
+            language (str): The language in which the summary should be written.
+            text (str): The input text to be summarized.
+            granularity (str): The granularity in which the summary should be written ('general', 'detailed').
+
+        Returns:
+            str: The summary.
+
+        Raises:
+            SummaryGenerationError: If no summary could be generated.
+        """
+        raise NotImplementedError
+
+
+class GeminiBackend(SummarizerBackend):
+    """
+    Abstractive summaries generated by the Gemini model.
+    """
+
+    name = 'gemini'
+
+    def summarize(self, form, length, language, text, granularity):
+        return generate_summary(form=form, length=length, language=language, text=text, granularity=granularity)
+
+
+def split_sentences(text: str) -> list:
+    """
+    Splits text into sentences on sentence-ending punctuation and paragraph breaks.
+
+    Args:
+        text (str): The text to split.
+
+    Returns:
+        list: The non-empty sentences with normalized whitespace.
+    """
+    sentences = (" ".join(sentence.split()) for sentence in SENTENCE_SPLIT.split(text))
+    return [sentence for sentence in sentences if sentence]
+
+
+def tfidf_matrix(sentences: list) -> 'np.ndarray':
+    """
+    Builds the L2-normalized TF-IDF matrix of the sentences, limited to the MAX_VOCABULARY most frequent words.
+
+    Args:
+        sentences (list): The sentences, each treated as a document.
+
+    Returns:
+        np.ndarray: A (sentences x words) float32 matrix.
+    """
+    tokenized = [[word.lower() for word in WORD.findall(sentence)] for sentence in sentences]
+    frequencies = Counter(word for words in tokenized for word in words)
+    vocabulary = {word: index for index, (word, _) in enumerate(frequencies.most_common(MAX_VOCABULARY))}
+
+    counts = np.zeros((len(sentences), len(vocabulary)), dtype=np.float32)
+    for row, words in enumerate(tokenized):
+        for word in words:
+            column = vocabulary.get(word)
+            if column is not None:
+                counts[row, column] += 1
+
+    document_frequency = np.count_nonzero(counts, axis=0)
+    idf = np.log((1 + len(sentences)) / (1 + document_frequency)) + 1
+    weights = counts * idf
+    norms = np.linalg.norm(weights, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return weights / norms
+
+
+def textrank_scores(vectors: 'np.ndarray') -> 'np.ndarray':
+    """
+    Ranks sentences with TextRank over the cosine similarity graph of their TF-IDF vectors.
+
+    Args:
+        vectors (np.ndarray): The L2-normalized sentence vectors.
+
+    Returns:
+        np.ndarray: One score per sentence; higher is more central.
+    """
+    count = vectors.shape[0]
+    similarity = vectors @ vectors.T
+    np.fill_diagonal(similarity, 0)
+    row_sums = similarity.sum(axis=1, keepdims=True)
+    # Sentences without any similar sentence link uniformly to all others.
+    transition = np.where(row_sums > 0, similarity / np.where(row_sums > 0, row_sums, 1), 1 / count)
+
+    scores = np.full(count, 1 / count, dtype=np.float32)
+    for _ in range(MAX_ITERATIONS):
+        updated = (1 - DAMPING) / count + DAMPING * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < CONVERGENCE_TOLERANCE:
+            return updated
+        scores = updated
+    return scores
+
+
+class ExtractiveBackend(SummarizerBackend):
+    """
+    Local extractive summaries: the `length` most central sentences by TextRank over TF-IDF
+    vectors, in document order. Runs in milliseconds without network access, but keeps the
+    language of the source text and ignores `language` and `granularity`.
+    """
+
+    name = 'extractive'
+
+    def summarize(self, form, length, language, text, granularity):
+        sentences = split_sentences(text)[:MAX_SENTENCES]
+        if not sentences:
+            raise SummaryGenerationError("Error generating summary: no sentences found in the text.")
+        note_model(self.name)
+
+        if len(sentences) <= length:
+            selected = sentences
+        else:
+            scores = textrank_scores(tfidf_matrix(sentences))
+            top = np.argsort(-scores, kind='stable')[:length]
+            selected = [sentences[index] for index in sorted(top)]
+
+        if form == "bullet":
+            return " ".join(f"\n* {sentence}" for sentence in selected)
+        return " ".join(selected)
+
+
+class RoutingBackend(SummarizerBackend):
+    """
+    Chooses a backend per request: short inputs (up to EXTRACTIVE_MAX_TOKENS) and requests
+    made while every model circuit is open go to the extractive engine, everything else to the
+    model. A failed model call falls back to the extractive engine when EXTRACTIVE_FALLBACK is set.
+    """
+
+    name = 'routing'
+
+    def __init__(self, primary: SummarizerBackend = None, fallback: SummarizerBackend = None):
+        self.primary = primary or GeminiBackend()
+        self.fallback = fallback or ExtractiveBackend()
+
+    def summarize(self, form, length, language, text, granularity):
+        if estimate_tokens(text) <= EXTRACTIVE_MAX_TOKENS:
+            return self.fallback.summarize(form, length, language, text, granularity)
+        if EXTRACTIVE_FALLBACK and not get_model_client().is_available():
+            return DegradedSummary(self.fallback.summarize(form, length, language, text, granularity))
+
+        try:
+            summary = self.primary.summarize(form, length, language, text, granularity)
+        except SummaryGenerationError:
+            if not EXTRACTIVE_FALLBACK:
+                raise
+            return DegradedSummary(self.fallback.summarize(form, length, language, text, granularity))
+        if not summary and EXTRACTIVE_FALLBACK:
+            return DegradedSummary(self.fallback.summarize(form, length, language, text, granularity))
+        return summary
+
+
+_summarizer_backend = None
+
+
+def get_summarizer_backend() -> SummarizerBackend:
+    """
+    Returns the process-wide instance of the backend named by the SUMMARY_BACKEND setting.
+    """
+    global _summarizer_backend
+    if _summarizer_backend is None:
+        path = getattr(settings, 'SUMMARY_BACKEND', 'summarizer.backends.RoutingBackend')
+        _summarizer_backend = import_string(path)()
+    return _summarizer_backend
+
+
+def fallback_summary(form: str, length: int, text: str):
+    """
+    Returns an extractive summary to serve when the model fails, or None if fallback is disabled
+    or the text has no sentences.
+    """
+    if not EXTRACTIVE_FALLBACK:
+        return None
+    try:
+        return DegradedSummary(ExtractiveBackend().summarize(form, length, None, text, None))
+    except SummaryGenerationError:
+        return None
@@ -0,0 +1,263 @@
+import hashlib
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connections
+
+from .admission import BATCH, AdmissionRejected, get_admission_controller
+from .cache import get_summary_cache, make_cache_key
+from .chunking import summarize_document
+from .model_client import SummaryGenerationError
+from .serializers import BatchItemSerializer
+from .ingestion import extract_text_from_upload, ingest_upload
+from .prompt import estimate_tokens
+from .utils import MAX_TEXT_LENGTH, ExtractionError, extract_text_from_url, extract_and_validate_url, sanitize_input
+
+# Items of a batch processed at the same time (extraction included).
+BATCH_ITEM_WORKERS = 16
+# Model calls of a batch in flight at the same time.
+BATCH_MODEL_CONCURRENCY = getattr(settings, 'SUMMARY_BATCH_MODEL_CONCURRENCY', 4)
+# Sustained model calls per second allowed for one batch (None for no limit), and the burst allowed above it.
+BATCH_MODEL_RATE = getattr(settings, 'SUMMARY_BATCH_MODEL_RATE', 2.0)
+BATCH_MODEL_BURST = getattr(settings, 'SUMMARY_BATCH_MODEL_BURST', 4)
+
+
+class BatchItemError(Exception):
+    """
+    Raised when a single batch item cannot be processed; reported for that item only.
+    """
+
+
+class RateLimiter:
+    """
+    Token bucket limiting how often an action may run. `acquire` blocks until a token is available.
+
+    Args:
+        rate (float): Tokens added per second.
+        burst (int): The bucket capacity.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class _SharedResults:
+    """
+    Computes each keyed value once; concurrent callers asking for the same key wait for the first one.
+    """
+
+    def __init__(self):
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        with self._lock:
+            future = self._futures.get(key)
+            owner = future is None
+            if owner:
+                future = self._futures[key] = Future()
+        if owner:
+            try:
+                future.set_result(compute())
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+
+def _input_key(data: dict, upload=None) -> str:
+    digest = hashlib.sha256(data['input_type'].encode('utf-8'))
+    if data['input_type'] == 'text':
+        digest.update(data['text'].encode('utf-8'))
+    elif data['input_type'] == 'url':
+        digest.update(data['url'].encode('utf-8'))
+    else:
+        digest.update(upload.buffer)
+    return digest.hexdigest()
+
+
+def extract_item_text(data: dict, upload=None) -> str:
+    """
+    Extracts the text of one validated batch item.
+
+    Args:
+        data (dict): The validated item.
+        upload (IngestedUpload): The ingested file of a file item.
+
+    Returns:
+        str: The extracted text.
+
+    Raises:
+        BatchItemError: If the input is invalid or no text could be extracted.
+    """
+    if data['input_type'] == 'text':
+        raw_text = data['text']
+        url = extract_and_validate_url(raw_text)
+        if url and raw_text.startswith(url):
+            text = extract_text_from_url(url)
+        else:
+            text = sanitize_input(raw_text)
+            if len(text) > MAX_TEXT_LENGTH:
+                raise BatchItemError(f'Text is too long! Max size is {MAX_TEXT_LENGTH} characters.')
+    elif data['input_type'] == 'url':
+        text = extract_text_from_url(data['url'])
+    else:
+        try:
+            text = extract_text_from_upload(upload)
+        except ExtractionError as e:
+            raise BatchItemError(str(e)) from e
+
+    if not text:
+        raise BatchItemError('No valid text found')
+    return text
+
+
+def _close_uploads(uploads: dict):
+    for upload in uploads.values():
+        if not isinstance(upload, BatchItemError):
+            upload.close()
+
+
+class BatchSummarizer:
+    """
+    Summarizes the items of one batch. Identical inputs are extracted once and identical
+    summaries are generated once; model calls are bounded in concurrency and rate, and wait
+    for model slots at batch priority.
+
+    Args:
+        client (str): The identity the input tokens of the items are charged to, or None.
+    """
+
+    def __init__(self, client: str = None):
+        self.client = client
+        self._extractions = _SharedResults()
+        self._summaries = _SharedResults()
+        self._model_slots = threading.BoundedSemaphore(BATCH_MODEL_CONCURRENCY)
+        self._rate_limiter = RateLimiter(BATCH_MODEL_RATE, BATCH_MODEL_BURST) if BATCH_MODEL_RATE else None
+        self._futures = {}
+
+    def _generate(self, data: dict, text: str) -> str:
+        with self._model_slots, get_admission_controller().slot(BATCH, bounded=False):
+            if self._rate_limiter is not None:
+                self._rate_limiter.acquire()
+            return summarize_document(form=data['form'], length=data['length'], language=data['language'],
+                                      text=text, granularity=data['granularity'])
+
+    def summarize_item(self, data: dict, input_key: str, upload=None) -> str:
+        """
+        Extracts and summarizes one validated item.
+
+        Args:
+            data (dict): The validated item.
+            input_key (str): The hash identifying the item input.
+            upload (IngestedUpload): The ingested file of a file item.
+
+        Raises:
+            BatchItemError: If the item cannot be summarized.
+        """
+        try:
+            text = self._extractions.get(input_key, lambda: extract_item_text(data, upload))
+            if self.client is not None:
+                try:
+                    get_admission_controller().charge_tokens(self.client, estimate_tokens(text))
+                except AdmissionRejected as e:
+                    raise BatchItemError(str(e))
+
+            cache_key = make_cache_key(text, data['form'], data['length'], data['language'], data['granularity'])
+            return self._summaries.get(
+                cache_key, lambda: get_summary_cache().get_or_generate(cache_key, lambda: self._generate(data, text))
+            )
+        except SummaryGenerationError as e:
+            raise BatchItemError(str(e))
+        finally:
+            # Worker threads open their own database connections for the cache; do not leak them.
+            connections.close_all()
+
+    def run(self, items: list, files: dict):
+        """
+        Processes the items concurrently and yields one result per item as soon as it is ready.
+
+        Args:
+            items (list): The raw item dictionaries; a `file` entry names a field of `files`.
+            files (dict): The uploaded files of the request, by field name.
+
+        Yields:
+            dict: `{'index', 'summary'}` for a summarized item, or `{'index', 'error'}` for a failed one.
+        """
+        uploads = {}
+        try:
+            yield from self._run(items, files, uploads)
+        finally:
+            running = [future for future in self._futures if not future.done()]
+            if running:
+                # The client went away while items were running; close their uploads once they finish.
+                threading.Thread(target=lambda: (wait(running), _close_uploads(uploads)), daemon=True).start()
+            else:
+                _close_uploads(uploads)
+
+    def _run(self, items: list, files: dict, uploads: dict):
+        executor = ThreadPoolExecutor(max_workers=BATCH_ITEM_WORKERS)
+        futures = self._futures
+        abandoned = False
+        try:
+            for index, item in enumerate(items):
+                item = dict(item)
+                if isinstance(item.get('file'), str):
+                    item['file'] = files.get(item['file'])
+                serializer = BatchItemSerializer(data=item)
+                if not serializer.is_valid():
+                    yield {'index': index, 'error': serializer.errors}
+                    continue
+                data = serializer.validated_data
+                upload = None
+                if data['input_type'] == 'file':
+                    # Items naming the same upload share one file object; ingest it once, before any worker reads it.
+                    field = items[index]['file']
+                    if field not in uploads:
+                        try:
+                            uploads[field] = ingest_upload(data['file'])
+                        except ValidationError as e:
+                            uploads[field] = BatchItemError(str(e))
+                    upload = uploads[field]
+                    if isinstance(upload, BatchItemError):
+                        yield {'index': index, 'error': str(upload)}
+                        continue
+                input_key = _input_key(data, upload)
+                futures[executor.submit(self.summarize_item, data, input_key, upload)] = index
+
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    summary = future.result()
+                    result = {'index': index, 'summary': summary}
+                    if getattr(summary, 'degraded', False):
+                        result['degraded'] = True
+                    yield result
+                except BatchItemError as e:
+                    yield {'index': index, 'error': str(e)}
+                except Exception as e:
+                    yield {'index': index, 'error': f"Error processing item: {e}"}
+        except GeneratorExit:
+            # The client disconnected: items not started yet are dropped instead of spending model calls.
+            abandoned = True
+            raise
+        finally:
+            executor.shutdown(wait=not abandoned, cancel_futures=abandoned)
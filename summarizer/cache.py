@@ -0,0 +1,328 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .metrics import format_family, register_collector, stage
+from .models import CachedSummary
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalizes text so that inputs differing only in whitespace share a cache entry.
+
+    Args:
+        text (str): The extracted text.
+
+    Returns:
+        str: The text with collapsed whitespace.
+    """
+    return " ".join(text.split())
+
+
+def make_cache_key(text: str, form: str, length, language: str, granularity: str) -> str:
+    """
+    Builds a content-addressed cache key from the normalized text and all summary parameters.
+
+    Args:
+        text (str): The extracted text to be summarized.
+        form (str): The summary form ('text' or 'bullet').
+        length: The summary length in sentences or bullet points.
+        language (str): The summary language.
+        granularity (str): The summary granularity ('general' or 'detailed').
+
+    Returns:
+        str: A hex SHA-256 digest identifying the summary.
+    """
+    digest = hashlib.sha256()
+    for part in (form, str(length), language, granularity):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\x00')
+    digest.update(normalize_text(text).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class CacheStats:
+    """
+    Thread-safe hit, miss, eviction and error counters of a single cache backend.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def record(self, hits=0, misses=0, evictions=0, errors=0):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+            self.evictions += evictions
+            self.errors += errors
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'errors': self.errors}
+
+
+class BaseCacheBackend:
+    """
+    Interface of a summary cache backend. Subclasses implement `get` and `set`.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self.stats = CacheStats()
+
+    def get(self, key: str):
+        raise NotImplementedError
+
+    def set(self, key: str, value: str):
+        raise NotImplementedError
+
+    def info(self) -> dict:
+        info = self.stats.as_dict()
+        info['backend'] = type(self).__name__
+        return info
+
+
+class LRUCacheBackend(BaseCacheBackend):
+    """
+    In-process LRU cache with a time-to-live and eviction by entry count and total size.
+
+    Args:
+        max_entries (int): Maximum number of cached summaries.
+        max_bytes (int): Maximum total size of the cached summaries in bytes.
+        ttl (int): Time in seconds after which an entry expires, or None for no expiry.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=16 * 1024 * 1024, ttl=None):
+        super().__init__(ttl=ttl)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.record(misses=1)
+                return None
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.stats.record(misses=1, evictions=1)
+                return None
+            self._entries.move_to_end(key)
+            self.stats.record(hits=1)
+            return value
+
+    def set(self, key: str, value: str):
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at)
+            self._size += size
+            evicted = 0
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                evicted += 1
+            if evicted:
+                self.stats.record(evictions=evicted)
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self._size -= size
+
+    def info(self) -> dict:
+        info = super().info()
+        with self._lock:
+            info['entries'] = len(self._entries)
+            info['bytes'] = self._size
+        return info
+
+
+class DatabaseCacheBackend(BaseCacheBackend):
+    """
+    Cache tier stored in the project database (db.sqlite3), shared by all worker processes.
+    The tier is best effort: a failing query, such as a write that finds SQLite locked by
+    another process, counts as a miss or a skipped write instead of failing the request.
+
+    Args:
+        max_entries (int): Maximum number of rows kept; the least recently used rows are evicted beyond it.
+        ttl (int): Time in seconds after which an entry expires, or None for no expiry.
+        cull_every (int): Number of writes between two eviction passes.
+    """
+
+    def __init__(self, max_entries=10000, ttl=None, cull_every=100):
+        super().__init__(ttl=ttl)
+        self.max_entries = max_entries
+        self.cull_every = cull_every
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        try:
+            return self._get(key)
+        except DatabaseError:
+            logger.warning("Summary cache read failed", exc_info=True)
+            self.stats.record(misses=1, errors=1)
+            return None
+
+    def set(self, key: str, value: str):
+        try:
+            self._set(key, value)
+        except DatabaseError:
+            logger.warning("Summary cache write failed", exc_info=True)
+            self.stats.record(errors=1)
+
+    def _get(self, key: str):
+        entry = CachedSummary.objects.filter(key=key).first()
+        if entry is None:
+            self.stats.record(misses=1)
+            return None
+        if self.ttl and entry.created_at <= timezone.now() - timedelta(seconds=self.ttl):
+            entry.delete()
+            self.stats.record(misses=1, evictions=1)
+            return None
+        CachedSummary.objects.filter(key=key).update(accessed_at=timezone.now())
+        self.stats.record(hits=1)
+        return entry.summary
+
+    def _set(self, key: str, value: str):
+        now = timezone.now()
+        CachedSummary.objects.update_or_create(
+            key=key, defaults={'summary': value, 'created_at': now, 'accessed_at': now}
+        )
+        with self._lock:
+            self._writes += 1
+            cull = self._writes % self.cull_every == 0
+        if cull:
+            self.cull()
+
+    def cull(self):
+        """
+        Removes expired rows and the least recently used rows above `max_entries`.
+        """
+        evicted = 0
+        if self.ttl:
+            evicted += CachedSummary.objects.filter(
+                created_at__lte=timezone.now() - timedelta(seconds=self.ttl)
+            ).delete()[0]
+        stale_keys = CachedSummary.objects.order_by('-accessed_at').values_list('key', flat=True)[self.max_entries:]
+        stale_keys = list(stale_keys)
+        if stale_keys:
+            evicted += CachedSummary.objects.filter(key__in=stale_keys).delete()[0]
+        if evicted:
+            self.stats.record(evictions=evicted)
+
+
+class SummaryCache:
+    """
+    Tiered summary cache. Backends are checked in order and a hit in a slower tier
+    is copied into all faster tiers.
+
+    Args:
+        backends (list): Cache backend instances, fastest first.
+    """
+
+    def __init__(self, backends):
+        self.backends = backends
+
+    @stage('cache_lookup')
+    def get(self, key: str):
+        for index, backend in enumerate(self.backends):
+            value = backend.get(key)
+            if value is not None:
+                for faster in self.backends[:index]:
+                    faster.set(key, value)
+                return value
+        return None
+
+    def set(self, key: str, value: str):
+        for backend in self.backends:
+            backend.set(key, value)
+
+    def get_or_generate(self, key: str, generate):
+        """
+        Returns the cached summary for the key, or generates and caches it on a miss.
+        Summaries marked as not cacheable are not stored; errors raised by `generate` propagate.
+
+        Args:
+            key (str): The cache key built by `make_cache_key`.
+            generate: A callable without arguments producing the summary.
+
+        Returns:
+            str: The cached or freshly generated summary.
+        """
+        value = self.get(key)
+        if value is None:
+            value = generate()
+            if value and getattr(value, 'cacheable', True):
+                self.set(key, value)
+        return value
+
+    def info(self) -> list:
+        return [backend.info() for backend in self.backends]
+
+
+def build_cache_from_settings() -> SummaryCache:
+    """
+    Builds the summary cache from the SUMMARY_CACHE_BACKENDS setting, the single definition of the tiers.
+
+    Returns:
+        SummaryCache: The cache with one tier per configured backend.
+    """
+    configs = settings.SUMMARY_CACHE_BACKENDS
+    backends = [import_string(config['BACKEND'])(**config.get('OPTIONS', {})) for config in configs]
+    return SummaryCache(backends)
+
+
+_summary_cache = None
+_summary_cache_lock = threading.Lock()
+
+
+def get_summary_cache() -> SummaryCache:
+    """
+    Returns the process-wide summary cache, building it on first use.
+    """
+    global _summary_cache
+    if _summary_cache is None:
+        with _summary_cache_lock:
+            if _summary_cache is None:
+                _summary_cache = build_cache_from_settings()
+    return _summary_cache
+
+
+@register_collector
+def cache_metrics() -> list:
+    """
+    Exposes the counters of every cache tier, once the cache has been used in this process.
+    """
+    if _summary_cache is None:
+        return []
+    infos = _summary_cache.info()
+    lines = []
+    for counter in ('hits', 'misses', 'evictions', 'errors'):
+        lines.extend(format_family(
+            f'summarizer_cache_{counter}_total', f'Summary cache {counter} per tier.', 'counter',
+            [({'backend': info['backend']}, info[counter]) for info in infos],
+        ))
+    return lines
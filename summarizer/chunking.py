@@ -0,0 +1,151 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from .prompt import CHARS_PER_TOKEN, estimate_tokens, prepare_text
+from .backends import fallback_summary, get_summarizer_backend
+from .metrics import stage
+from .model_client import SummaryGenerationError, get_model_client
+from .near_duplicates import find_reusable_summary
+
+# Largest input, in tokens, sent to the model in a single prompt.
+CHUNK_TOKEN_BUDGET = 8000
+# Maximum number of chunk summaries requested from the model at the same time.
+MAX_CHUNK_WORKERS = 4
+
+PARAGRAPH_SPLIT = re.compile(r'\n\s*\n')
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+
+
+def _split_oversized(piece: str, max_chars: int) -> list:
+    """
+    Splits a paragraph that does not fit into one chunk on sentence boundaries,
+    falling back to hard cuts for sentences that are still too long.
+    """
+    parts = []
+    for sentence in SENTENCE_SPLIT.split(piece):
+        while len(sentence) > max_chars:
+            parts.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if sentence:
+            parts.append(sentence)
+    return parts
+
+
+def split_into_chunks(text: str, max_tokens: int = CHUNK_TOKEN_BUDGET) -> list:
+    """
+    Splits text into chunks that fit the token budget, cutting on paragraph
+    and sentence boundaries.
+
+    Args:
+        text (str): The text to split.
+        max_tokens (int): The maximum estimated number of tokens per chunk.
+
+    Returns:
+        list: The chunks, in document order.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks = []
+    current = []
+    current_size = 0
+
+    for paragraph in PARAGRAPH_SPLIT.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        pieces = [paragraph] if len(paragraph) <= max_chars else _split_oversized(paragraph, max_chars)
+        for piece in pieces:
+            if current and current_size + len(piece) + 2 > max_chars:
+                chunks.append("\n\n".join(current))
+                current = []
+                current_size = 0
+            current.append(piece)
+            current_size += len(piece) + 2
+
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def summarize_chunk(chunk: str, language: str, granularity: str) -> str:
+    """
+    Condenses one chunk of a longer document into an intermediate summary.
+
+    Args:
+        chunk (str): The part of the document to condense.
+        language (str): The language of the final summary.
+        granularity (str): The granularity of the final summary ('general', 'detailed').
+
+    Returns:
+        str: The intermediate summary of the chunk.
+    """
+    prompt = (f"This is one part of a longer document. Summarize it in {language}, keeping every fact "
+              f"needed for a {granularity} summary of the whole document: {chunk}.")
+    return " ".join(get_model_client().generate(prompt).split())
+
+
+@stage('reduce')
+def reduce_to_budget(text: str, language: str, granularity: str, max_tokens: int = CHUNK_TOKEN_BUDGET,
+                     max_workers: int = MAX_CHUNK_WORKERS) -> str:
+    """
+    Condenses text level by level until it fits into a single prompt. Every level
+    splits the text into chunks and summarizes them concurrently, so the number of
+    sequential model calls grows with the depth of the tree, not the document size.
+
+    Args:
+        text (str): The text to condense.
+        language (str): The language of the final summary.
+        granularity (str): The granularity of the final summary ('general', 'detailed').
+        max_tokens (int): The token budget of a single prompt.
+        max_workers (int): The maximum number of concurrent model calls.
+
+    Returns:
+        str: The condensed text, within the token budget.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while estimate_tokens(text) > max_tokens:
+            chunks = split_into_chunks(text, max_tokens)
+            partials = list(executor.map(lambda chunk: summarize_chunk(chunk, language, granularity), chunks))
+            condensed = "\n\n".join(partials)
+            if len(condensed) >= len(text):
+                # The model did not shrink the text; stop instead of looping forever.
+                return condensed[:max_tokens * CHARS_PER_TOKEN]
+            text = condensed
+    return text
+
+
+def summarize_document(form: str, length: str, language: str, text: str, granularity: str,
+                       reuse: bool = True) -> str:
+    """
+    Generates a summary of a document of any size. Unless `reuse` is False, the stored summary of a
+    near-identical text with the same options is reused when there is one. Otherwise the text is first cleaned and fitted to
+    the input token budget by `prepare_text`. Texts that then fit into a single prompt go
+    straight to the configured summarizer backend; longer ones are condensed with a map-reduce
+    pass over token-budgeted chunks first.
+
+    Args:
+        form (str): The desired form of the summary ('text' or 'bullet').
+        length (str): The desired length of the summary as number of sentences (1-30).
+        language (str): The language in which the summary should be written.
+        text (str): The input text to be summarized.
+        granularity (str): The granularity in which the summary should be written ('general', 'detailed').
+        reuse (bool): Whether the summary of a near-identical text may be returned.
+
+    Returns:
+        str: The generated summary.
+
+    Raises:
+        SummaryGenerationError: If the summary could not be generated and no fallback answered.
+    """
+    reused = find_reusable_summary(text, form, length, language, granularity) if reuse else None
+    if reused is not None:
+        return reused
+    text = prepare_text(text)
+    if estimate_tokens(text) > CHUNK_TOKEN_BUDGET:
+        try:
+            text = reduce_to_budget(text, language, granularity)
+        except Exception as e:
+            summary = fallback_summary(form, length, text)
+            if summary is None:
+                raise SummaryGenerationError(f"Error generating summary: {e}") from e
+            return summary
+    return get_summarizer_backend().summarize(form, length, language, text, granularity)
@@ -0,0 +1,130 @@
+import posixpath
+import re
+import zipfile
+
+from .registry import lazy_module
+
+etree = lazy_module('lxml.etree')
+
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+MC_FALLBACK = '{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback'
+PACKAGE_RELATIONSHIPS = '{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'
+OFFICE_DOCUMENT = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+DEFAULT_MAIN_PART = 'word/document.xml'
+HEADER_PART = re.compile(r'word/header\d*\.xml$')
+
+# Elements whose start and end matter while walking a part.
+PARAGRAPH, ROW, CELL, TEXT = W + 'p', W + 'tr', W + 'tc', W + 't'
+# Run elements standing for a character of their own.
+RUN_CHARACTERS = {W + 'tab': '\t', W + 'br': '\n', W + 'cr': '\n', W + 'noBreakHyphen': '-'}
+TRACKED_TAGS = [PARAGRAPH, ROW, CELL, TEXT, MC_FALLBACK, *RUN_CHARACTERS]
+# Separator between the cells of a table row.
+CELL_SEPARATOR = ' | '
+
+
+def _main_part(archive: zipfile.ZipFile) -> str:
+    try:
+        with archive.open('_rels/.rels') as rels:
+            for relationship in etree.parse(rels).getroot().iter(PACKAGE_RELATIONSHIPS):
+                if relationship.get('Type') == OFFICE_DOCUMENT:
+                    return posixpath.normpath(relationship.get('Target').lstrip('/'))
+    except KeyError:
+        pass
+    return DEFAULT_MAIN_PART
+
+
+def _discard(element):
+    # Drop the finished block and everything before it, so the tree never grows past one block.
+    element.clear(keep_tail=True)
+    parent = element.getparent()
+    if parent is not None:
+        while element.getprevious() is not None:
+            del parent[0]
+
+
+def iter_part_blocks(part):
+    """
+    Yields the paragraphs and table rows of one WordprocessingML part (the document body, a header...)
+    while parsing it incrementally. Paragraphs inside table cells are joined into their cell and the
+    cells of a row are joined with CELL_SEPARATOR; text boxes are yielded as paragraphs of their own.
+    Finished blocks are removed from the tree, so memory stays flat however long the part is.
+
+    Args:
+        part: A binary file object over the part XML.
+
+    Yields:
+        str: The text of each non-empty paragraph or table row, in document order.
+    """
+    # Open paragraphs, cells and rows as (tag, collected texts), innermost last.
+    stack = []
+    fallback_depth = 0
+    for event, element in etree.iterparse(part, events=('start', 'end'), tag=TRACKED_TAGS):
+        tag = element.tag
+        if tag == MC_FALLBACK:
+            # Alternate content repeats its text (text boxes mostly) in a fallback form; read it once.
+            fallback_depth += 1 if event == 'start' else -1
+            continue
+        if fallback_depth:
+            continue
+
+        if event == 'start':
+            if tag in (PARAGRAPH, ROW, CELL):
+                stack.append((tag, []))
+            continue
+
+        if tag == TEXT:
+            if stack and element.text:
+                stack[-1][1].append(element.text)
+        elif tag in RUN_CHARACTERS:
+            if stack:
+                stack[-1][1].append(RUN_CHARACTERS[tag])
+        elif tag == CELL:
+            _, texts = stack.pop()
+            if stack:
+                stack[-1][1].append(" ".join(text for text in texts if text))
+        else:
+            _, texts = stack.pop()
+            if tag == PARAGRAPH:
+                block = "".join(texts).strip()
+            else:
+                block = CELL_SEPARATOR.join(text for text in texts if text)
+            if stack and stack[-1][0] == CELL:
+                stack[-1][1].append(block)
+            else:
+                if block:
+                    yield block
+                if not stack:
+                    _discard(element)
+
+
+def iter_docx_blocks(file, max_chars: int = None):
+    """
+    Yields the text of a DOCX file block by block: the distinct paragraphs of its headers first,
+    then the paragraphs and table rows of the body. The parts are streamed out of the archive,
+    and extraction stops as soon as `max_chars` characters have been produced.
+
+    Args:
+        file: A file-like object representing the DOCX file.
+        max_chars (int): The character budget, or None to extract the whole document.
+
+    Yields:
+        str: The text of consecutive blocks, the last one truncated to the budget.
+    """
+    with zipfile.ZipFile(file) as archive:
+        headers = sorted(name for name in archive.namelist() if HEADER_PART.match(name))
+        produced = 0
+        seen_header_blocks = set()
+        for name in headers + [_main_part(archive)]:
+            is_header = name in headers
+            with archive.open(name) as part:
+                for block in iter_part_blocks(part):
+                    if is_header:
+                        # Sections usually repeat the same header; keep each line once.
+                        if block in seen_header_blocks:
+                            continue
+                        seen_header_blocks.add(block)
+                    if max_chars is not None and produced + len(block) >= max_chars:
+                        yield block[:max_chars - produced]
+                        return
+                    produced += len(block)
+                    yield block
@@ -0,0 +1,344 @@
+import io
+import re
+import struct
+import threading
+import time
+import zipfile
+import zlib
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+
+from .metrics import stage
+from .registry import lazy_module
+
+docx = lazy_module('docx')
+platypus = lazy_module('reportlab.platypus')
+pagesizes = lazy_module('reportlab.lib.pagesizes')
+styles = lazy_module('reportlab.lib.styles')
+pdfmetrics = lazy_module('reportlab.pdfbase.pdfmetrics')
+ttfonts = lazy_module('reportlab.pdfbase.ttfonts')
+
+# Heading of every exported document.
+EXPORT_TITLE = 'Summary Document'
+# TrueType font embedded into PDF exports; the built-in Helvetica only covers Western European scripts.
+PDF_FONT_PATH = getattr(settings, 'SUMMARY_EXPORT_PDF_FONT', None)
+PDF_FONT_NAME = 'SummaryFont'
+
+BULLET_LINE = re.compile(r'^\s*(?:[*\-•]\s+|\*(?=\S))')
+# Characters XML 1.0 does not allow, which Word refuses to open.
+INVALID_XML_CHARACTERS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+ZIP_STORED, ZIP_DEFLATED = 0, 8
+# General purpose flags: sizes in a data descriptor after the entry, UTF-8 entry names.
+ZIP_DATA_DESCRIPTOR, ZIP_UTF8 = 0x08, 0x800
+ZIP_VERSION = 20
+
+
+def summary_blocks(summary: str) -> list:
+    """
+    Splits a summary into the blocks of an exported document. Lines produced by `format_summary`
+    for bullet summaries become list items; any other line is a paragraph.
+
+    Args:
+        summary (str): The summary.
+
+    Returns:
+        list: `(kind, text)` pairs, where kind is 'bullet' or 'paragraph'.
+    """
+    blocks = []
+    for line in summary.splitlines():
+        match = BULLET_LINE.match(line)
+        text = " ".join((line[match.end():] if match else line).split())
+        if text:
+            blocks.append(('bullet' if match else 'paragraph', text))
+    return blocks
+
+
+class ZipPart:
+    """
+    A ZIP entry compressed ahead of time, written to any number of archives without compressing it again.
+    """
+
+    def __init__(self, name: str, data: bytes, compress: bool = True):
+        self.name = name.encode('utf-8')
+        self.crc = zlib.crc32(data)
+        self.size = len(data)
+        if compress:
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+            self.payload = compressor.compress(data) + compressor.flush()
+            self.method = ZIP_DEFLATED
+        else:
+            self.payload = data
+            self.method = ZIP_STORED
+
+
+def _dos_date_time(timestamp: float) -> tuple:
+    year, month, day, hour, minute, second = time.localtime(timestamp)[:6]
+    year = max(year, 1980)
+    return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+
+class ZipStream:
+    """
+    Writes a ZIP archive front to back, yielding its bytes as they are produced, so an archive
+    can be sent while it is being built and is never held in memory as a whole. Entries are
+    either parts compressed ahead of time or streams of chunks, whose sizes and checksum follow
+    them in a data descriptor.
+    """
+
+    def __init__(self):
+        self._offset = 0
+        self._directory = []
+        self._time, self._date = _dos_date_time(time.time())
+
+    def _emit(self, data: bytes) -> bytes:
+        self._offset += len(data)
+        return data
+
+    def _header(self, name: bytes, flags: int, method: int, crc: int, compressed_size: int, size: int) -> bytes:
+        self._directory.append((name, flags, method, crc, compressed_size, size, self._offset))
+        return self._emit(struct.pack('<IHHHHHIIIHH', 0x04034b50, ZIP_VERSION, flags, method, self._time,
+                                      self._date, crc, compressed_size, size, len(name), 0) + name)
+
+    def write_part(self, part: ZipPart):
+        """
+        Yields the bytes of an entry compressed ahead of time.
+        """
+        yield self._header(part.name, ZIP_UTF8, part.method, part.crc, len(part.payload), part.size)
+        yield self._emit(part.payload)
+
+    def write_stream(self, name: str, chunks, compress: bool = True):
+        """
+        Yields the bytes of an entry whose content arrives as an iterable of byte chunks.
+
+        Args:
+            name (str): The entry name.
+            chunks: The content, chunk by chunk.
+            compress (bool): Whether to deflate the content; already compressed formats are stored.
+        """
+        name = name.encode('utf-8')
+        method = ZIP_DEFLATED if compress else ZIP_STORED
+        yield self._header(name, ZIP_UTF8 | ZIP_DATA_DESCRIPTOR, method, 0, 0, 0)
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15) if compress else None
+        crc = size = compressed_size = 0
+        for chunk in chunks:
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                compressed_size += len(chunk)
+                yield self._emit(chunk)
+        if compressor is not None:
+            tail = compressor.flush()
+            compressed_size += len(tail)
+            yield self._emit(tail)
+        entry = self._directory[-1]
+        self._directory[-1] = entry[:3] + (crc, compressed_size, size) + entry[6:]
+        yield self._emit(struct.pack('<IIII', 0x08074b50, crc, compressed_size, size))
+
+    def close(self):
+        """
+        Yields the central directory ending the archive.
+        """
+        start = self._offset
+        for name, flags, method, crc, compressed_size, size, offset in self._directory:
+            yield self._emit(struct.pack('<IHHHHHHIIIHHHHHII', 0x02014b50, ZIP_VERSION, ZIP_VERSION, flags, method,
+                                         self._time, self._date, crc, compressed_size, size, len(name), 0, 0, 0,
+                                         0, 0, offset) + name)
+        count = len(self._directory)
+        yield self._emit(struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, count, count, self._offset - start, start, 0))
+
+
+class Exporter:
+    """
+    Interface of an export format. `render` yields the exported document in byte chunks.
+    """
+
+    name = None
+    extension = None
+    content_type = None
+    # Whether the output is worth deflating inside a ZIP archive.
+    compressible = True
+
+    def render(self, summary: str):
+        raise NotImplementedError
+
+
+class TextExporter(Exporter):
+    name = extension = 'txt'
+    content_type = 'text/plain; charset=utf-8'
+    heading = EXPORT_TITLE
+
+    def render(self, summary):
+        lines = [self.heading]
+        previous = None
+        for kind, text in summary_blocks(summary):
+            if kind == 'paragraph' or previous != 'bullet':
+                # Paragraphs are separated by blank lines, list items are kept together.
+                lines.append('')
+            lines.append(f"- {text}" if kind == 'bullet' else text)
+            previous = kind
+        yield ("\n".join(lines) + "\n").encode('utf-8')
+
+
+class MarkdownExporter(TextExporter):
+    name = extension = 'md'
+    content_type = 'text/markdown; charset=utf-8'
+    heading = f"# {EXPORT_TITLE}"
+
+
+class DocxExporter(Exporter):
+    """
+    Writes DOCX files from a template parsed once per process. Every part of the python-docx default
+    template except the document body is compressed ahead of time; an export only builds and deflates
+    the body, whose bullet items use the template's List Bullet style.
+    """
+
+    name = extension = 'docx'
+    content_type = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+    compressible = False
+
+    BODY_PART = 'word/document.xml'
+
+    def __init__(self):
+        document = docx.Document()
+        document.add_heading(EXPORT_TITLE, 0)
+        buffer = io.BytesIO()
+        document.save(buffer)
+
+        self.parts = []
+        with zipfile.ZipFile(buffer) as archive:
+            for name in archive.namelist():
+                data = archive.read(name)
+                if name == self.BODY_PART:
+                    # Keep the body around the generated paragraphs: everything up to the title, and the section properties.
+                    body = data.decode('utf-8')
+                    head_end = body.index('</w:p>', body.index('<w:body>')) + len('</w:p>')
+                    tail_start = body.rindex('<w:sectPr')
+                    self.head, self.tail = body[:head_end], body[tail_start:]
+                    self.parts.append(None)
+                else:
+                    self.parts.append(ZipPart(name, data))
+
+    @staticmethod
+    def _paragraph(text: str, style: str = None) -> str:
+        properties = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ''
+        text = escape(INVALID_XML_CHARACTERS.sub('', text))
+        return f'<w:p>{properties}<w:r><w:t xml:space="preserve">{text}</w:t></w:r></w:p>'
+
+    def render(self, summary):
+        paragraphs = [self._paragraph(text, 'ListBullet' if kind == 'bullet' else None)
+                      for kind, text in summary_blocks(summary)]
+        body = ZipPart(self.BODY_PART, (self.head + "".join(paragraphs) + self.tail).encode('utf-8'))
+        archive = ZipStream()
+        for part in self.parts:
+            yield from archive.write_part(part or body)
+        yield from archive.close()
+
+
+class PdfExporter(Exporter):
+    """
+    Writes PDF files with reportlab. The stylesheet, and the TrueType font named by
+    SUMMARY_EXPORT_PDF_FONT, are loaded once per process.
+    """
+
+    name = extension = 'pdf'
+    content_type = 'application/pdf'
+    compressible = False
+
+    def __init__(self):
+        stylesheet = styles.getSampleStyleSheet()
+        self.title_style = stylesheet['Title']
+        self.body_style = stylesheet['BodyText']
+        if PDF_FONT_PATH:
+            pdfmetrics.registerFont(ttfonts.TTFont(PDF_FONT_NAME, PDF_FONT_PATH))
+            for style in (self.title_style, self.body_style):
+                style.fontName = PDF_FONT_NAME
+
+    def _list(self, items: list):
+        return platypus.ListFlowable(items, bulletType='bullet', start='•', bulletFontName=self.body_style.fontName)
+
+    def _flowables(self, summary: str) -> list:
+        flowables = [platypus.Paragraph(escape(EXPORT_TITLE), self.title_style)]
+        items = []
+        for kind, text in summary_blocks(summary):
+            paragraph = platypus.Paragraph(escape(INVALID_XML_CHARACTERS.sub('', text)), self.body_style)
+            if kind == 'bullet':
+                items.append(platypus.ListItem(paragraph))
+                continue
+            if items:
+                flowables.append(self._list(items))
+                items = []
+            flowables.append(paragraph)
+        if items:
+            flowables.append(self._list(items))
+        return flowables
+
+    def render(self, summary):
+        buffer = io.BytesIO()
+        document = platypus.SimpleDocTemplate(buffer, pagesize=pagesizes.A4, title=EXPORT_TITLE)
+        document.build(self._flowables(summary))
+        yield buffer.getvalue()
+
+
+EXPORTERS = {exporter.name: exporter for exporter in (DocxExporter, PdfExporter, MarkdownExporter, TextExporter)}
+
+_exporters = {}
+_exporters_lock = threading.Lock()
+
+
+def get_exporter(name: str) -> Exporter:
+    """
+    Returns the process-wide exporter of a format, loading its template on first use.
+
+    Args:
+        name (str): The format, one of EXPORTERS.
+
+    Returns:
+        Exporter: The exporter.
+    """
+    exporter = _exporters.get(name)
+    if exporter is None:
+        with _exporters_lock:
+            exporter = _exporters.get(name)
+            if exporter is None:
+                exporter = _exporters[name] = EXPORTERS[name]()
+    return exporter
+
+
+def export_summary(summary: str, name: str) -> list:
+    """
+    Exports one summary, timing the rendering under the `export_<format>` stage.
+
+    Args:
+        summary (str): The summary.
+        name (str): The format, one of EXPORTERS.
+
+    Returns:
+        list: The exported document in byte chunks.
+    """
+    exporter = get_exporter(name)
+    with stage(f'export_{name}'):
+        return list(exporter.render(summary))
+
+
+def export_archive(entries, name: str):
+    """
+    Exports many summaries into a ZIP archive, yielding the archive while it is built. Each summary
+    is rendered only when its turn comes, so memory stays flat however many there are.
+
+    Args:
+        entries: An iterable of `(file stem, summary)` pairs.
+        name (str): The format of every file, one of EXPORTERS.
+
+    Yields:
+        bytes: Consecutive pieces of the archive.
+    """
+    exporter = get_exporter(name)
+    archive = ZipStream()
+    for stem, summary in entries:
+        chunks = export_summary(summary, name)
+        yield from archive.write_stream(f"{stem}.{exporter.extension}", chunks, exporter.compressible)
+    yield from archive.close()
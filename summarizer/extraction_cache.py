@@ -0,0 +1,225 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import zlib
+
+from django.conf import settings
+
+from .cache import CacheStats
+from .metrics import format_family, register_collector, stage
+
+logger = logging.getLogger(__name__)
+
+# Whether text extracted from uploads is cached.
+EXTRACTION_CACHE_ENABLED = getattr(settings, 'SUMMARY_EXTRACTION_CACHE_ENABLED', True)
+# Version of the text each extractor produces. Bump one when its output changes, so text
+# extracted by the previous version is no longer served from the cache.
+EXTRACTOR_VERSIONS = {'pdf': 3, 'docx': 2, 'wav': 1}
+# Total size of the cache files; the least recently used files are removed beyond it.
+MAX_CACHE_BYTES = getattr(settings, 'SUMMARY_EXTRACTION_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+# Texts larger than this many bytes are stored zlib-compressed.
+COMPRESS_THRESHOLD = 16 * 1024
+COMPRESSION_LEVEL = 6
+# Eviction removes files until the cache is back under this fraction of MAX_CACHE_BYTES.
+CULL_TARGET = 0.9
+
+PLAIN_SUFFIX = '.txt'
+COMPRESSED_SUFFIX = '.txt.z'
+
+
+def extraction_key(extension: str, content_digest: str) -> str:
+    """
+    Builds the cache key of the text extracted from a file: its content hash, its type and the
+    version of the extractor. WAV keys also include the transcription backend.
+
+    Args:
+        extension (str): The file type, one of EXTRACTOR_VERSIONS.
+        content_digest (str): The hex SHA-256 of the file content.
+
+    Returns:
+        str: A hex SHA-256 digest.
+    """
+    parts = [extension, str(EXTRACTOR_VERSIONS[extension]), content_digest]
+    if extension == 'wav':
+        parts.append(getattr(settings, 'SUMMARY_TRANSCRIPTION_BACKEND', ''))
+    return hashlib.sha256("\x00".join(parts).encode('utf-8')).hexdigest()
+
+
+class ExtractionDiskCache:
+    """
+    On-disk cache of extracted text, shared by the worker processes of one host. Files are spread
+    over 256 subdirectories and written atomically; reading a file refreshes its modification time,
+    which eviction uses as the last access time. The cache is best effort: I/O errors count as
+    misses or skipped writes.
+
+    Args:
+        directory (str): The directory holding the cache files.
+        max_bytes (int): The total size of the cache files; the least recently used ones are removed beyond it.
+    """
+
+    def __init__(self, directory, max_bytes: int = MAX_CACHE_BYTES):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        # Bytes believed to be on disk; None until the first write scans the directory.
+        self._size = None
+        self._lock = threading.Lock()
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, key[:2], key + suffix)
+
+    def get(self, key: str):
+        """
+        Returns the cached text for the key, or None if there is none.
+        """
+        for suffix in (PLAIN_SUFFIX, COMPRESSED_SUFFIX):
+            path = self._path(key, suffix)
+            try:
+                with open(path, 'rb') as handle:
+                    data = handle.read()
+                os.utime(path)
+            except FileNotFoundError:
+                continue
+            except OSError:
+                logger.warning("Extraction cache read failed", exc_info=True)
+                self.stats.record(misses=1, errors=1)
+                return None
+            try:
+                text = (zlib.decompress(data) if suffix == COMPRESSED_SUFFIX else data).decode('utf-8')
+            except (zlib.error, UnicodeDecodeError):
+                logger.warning("Extraction cache entry %s is corrupt", path)
+                self.stats.record(misses=1, errors=1)
+                return None
+            self.stats.record(hits=1)
+            return text
+        self.stats.record(misses=1)
+        return None
+
+    def set(self, key: str, text: str):
+        """
+        Stores the text for the key, compressing it if it is large.
+        """
+        data = text.encode('utf-8')
+        suffix = PLAIN_SUFFIX
+        if len(data) > COMPRESS_THRESHOLD:
+            data = zlib.compress(data, COMPRESSION_LEVEL)
+            suffix = COMPRESSED_SUFFIX
+        path = self._path(key, suffix)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(descriptor, 'wb') as handle:
+                handle.write(data)
+            os.replace(temporary_path, path)
+        except OSError:
+            logger.warning("Extraction cache write failed", exc_info=True)
+            self.stats.record(errors=1)
+            return
+
+        with self._lock:
+            if self._size is not None:
+                self._size += len(data)
+            cull = self._size is None or self._size > self.max_bytes
+        if cull:
+            self.cull()
+
+    def _entries(self) -> list:
+        entries = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(PLAIN_SUFFIX) or name.endswith(COMPRESSED_SUFFIX):
+                    try:
+                        status = os.stat(os.path.join(root, name))
+                    except OSError:
+                        continue
+                    entries.append((status.st_mtime, status.st_size, os.path.join(root, name)))
+        return entries
+
+    def cull(self):
+        """
+        Recounts the cache size and removes the least recently used files while it exceeds `max_bytes`.
+        """
+        entries = self._entries()
+        size = sum(entry[1] for entry in entries)
+        evicted = 0
+        if size > self.max_bytes:
+            entries.sort()
+            for _, file_size, path in entries:
+                if size <= self.max_bytes * CULL_TARGET:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                size -= file_size
+                evicted += 1
+        with self._lock:
+            self._size = size
+        if evicted:
+            self.stats.record(evictions=evicted)
+
+    def info(self) -> dict:
+        info = self.stats.as_dict()
+        info['bytes'] = self._size
+        return info
+
+
+_extraction_cache = None
+_extraction_cache_lock = threading.Lock()
+
+
+def get_extraction_cache() -> ExtractionDiskCache:
+    """
+    Returns the extraction cache stored in the SUMMARY_EXTRACTION_CACHE_DIR directory.
+    """
+    global _extraction_cache
+    if _extraction_cache is None:
+        with _extraction_cache_lock:
+            if _extraction_cache is None:
+                _extraction_cache = ExtractionDiskCache(settings.SUMMARY_EXTRACTION_CACHE_DIR)
+    return _extraction_cache
+
+
+def extract_cached(extension: str, content_digest: str, extract) -> str:
+    """
+    Returns the text extracted from a file, from the cache when the same content has been
+    extracted before by the same extractor version. Types without an entry in EXTRACTOR_VERSIONS,
+    such as TXT, are cheaper to extract than to cache and always run `extract`. Only text returned
+    by `extract` is cached; an ExtractionError it raises reaches the caller and leaves the cache alone.
+
+    Args:
+        extension (str): The file type.
+        content_digest (str): The hex SHA-256 of the file content.
+        extract: A callable without arguments running the extractor.
+
+    Raises:
+        ExtractionError: If `extract` raises it.
+
+    Returns:
+        str: The extracted text.
+    """
+    if not EXTRACTION_CACHE_ENABLED or extension not in EXTRACTOR_VERSIONS:
+        return extract()
+    cache = get_extraction_cache()
+    key = extraction_key(extension, content_digest)
+    with stage('extract_cache'):
+        text = cache.get(key)
+    if text is None:
+        text = extract()
+        if text:
+            cache.set(key, text)
+    return text
+
+
+@register_collector
+def extraction_cache_metrics() -> list:
+    """
+    Exposes the counters of the extraction cache, once it has been used in this process.
+    """
+    if _extraction_cache is None:
+        return []
+    info = _extraction_cache.info()
+    return format_family('summarizer_extraction_cache_events_total', 'Extraction cache events by kind.', 'counter',
+                         [({'event': event}, info[event]) for event in ('hits', 'misses', 'evictions', 'errors')])
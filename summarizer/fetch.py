@@ -0,0 +1,249 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Seconds allowed for opening a connection and between two received bytes.
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 15
+# Largest response body downloaded, in bytes.
+MAX_DOWNLOAD_BYTES = 10 * 1024 * 1024
+# Number of responses kept in the on-disk cache.
+MAX_CACHED_RESPONSES = 1000
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+MAX_AGE_PATTERN = re.compile(r'max-age=(\d+)')
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseTooLarge(requests.RequestException):
+    """
+    Raised when a response body exceeds MAX_DOWNLOAD_BYTES.
+    """
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Returns the process-wide HTTP session, so TLS connections are reused between fetches.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=16,
+                    pool_maxsize=32,
+                    max_retries=Retry(total=2, connect=2, read=0, backoff_factor=0.3,
+                                      status_forcelist=[502, 503, 504], allowed_methods=['GET']),
+                )
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers['User-Agent'] = 'SummarizationProject/1.0'
+                _session = session
+    return _session
+
+
+class HTTPDiskCache:
+    """
+    On-disk cache of fetched pages. Each entry stores the body together with the validators
+    (ETag, Last-Modified) and the freshness lifetime sent by the server.
+
+    Args:
+        directory (str): The directory holding the cache files.
+        max_entries (int): The number of entries kept; the least recently written ones are removed beyond it.
+    """
+
+    def __init__(self, directory, max_entries: int = MAX_CACHED_RESPONSES):
+        self.directory = str(directory)
+        self.max_entries = max_entries
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(url.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, url: str):
+        """
+        Returns the cached entry for the URL, or None if there is none.
+        """
+        try:
+            with open(self._path(url), 'r', encoding='utf-8') as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, url: str, entry: dict):
+        """
+        Stores the entry for the URL, replacing the previous one atomically. Storing is best
+        effort: a failing write is logged and the page is simply not cached.
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(descriptor, 'w', encoding='utf-8') as handle:
+                    json.dump(entry, handle)
+                os.replace(temporary_path, self._path(url))
+            except BaseException:
+                os.remove(temporary_path)
+                raise
+            self._cull()
+        except OSError:
+            logger.warning("HTTP cache write failed", exc_info=True)
+
+    def _cull(self):
+        entries = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.json')]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=os.path.getmtime)
+        for path in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _max_age(headers) -> int:
+    cache_control = headers.get('Cache-Control', '')
+    if 'no-cache' in cache_control:
+        return 0
+    match = MAX_AGE_PATTERN.search(cache_control)
+    return int(match.group(1)) if match else 0
+
+
+class CappedBody:
+    """
+    Collects a response body chunk by chunk, raising ResponseTooLarge as soon as it exceeds
+    MAX_DOWNLOAD_BYTES, or before any chunk if the declared Content-Length already does.
+    Shared by the synchronous and asynchronous fetches.
+    """
+
+    def __init__(self, headers):
+        declared = headers.get('Content-Length')
+        if declared and declared.isdigit() and int(declared) > MAX_DOWNLOAD_BYTES:
+            raise ResponseTooLarge(f"Response is larger than {MAX_DOWNLOAD_BYTES} bytes.")
+        self.chunks = []
+        self.received = 0
+
+    def add(self, chunk: bytes):
+        self.received += len(chunk)
+        if self.received > MAX_DOWNLOAD_BYTES:
+            raise ResponseTooLarge(f"Response is larger than {MAX_DOWNLOAD_BYTES} bytes.")
+        self.chunks.append(chunk)
+
+    def content(self) -> bytes:
+        return b"".join(self.chunks)
+
+
+def _read_capped(response: requests.Response) -> bytes:
+    body = CappedBody(response.headers)
+    for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+        body.add(chunk)
+    return body.content()
+
+
+def decode_body(content: bytes, encoding: str) -> str:
+    """
+    Decodes a response body with its declared encoding, falling back to UTF-8 for encodings
+    Python does not know.
+    """
+    try:
+        return content.decode(encoding or 'utf-8', errors='replace')
+    except LookupError:
+        return content.decode('utf-8', errors='replace')
+
+
+def conditional_headers(cached) -> dict:
+    """
+    Returns the validators of a cached page to send with a new request for it.
+    """
+    headers = {}
+    if cached:
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+    return headers
+
+
+def revalidated(cache: 'HTTPDiskCache', url: str, cached: dict, headers) -> str:
+    """
+    Records that a cached page was confirmed unchanged by a 304 response, and returns its body.
+    """
+    cached['expires_at'] = time.time() + _max_age(headers)
+    cache.set(url, cached)
+    return cached['body']
+
+
+def store_response(cache: 'HTTPDiskCache', url: str, body: str, headers):
+    """
+    Caches a fetched page if the server allows it and sent validators or a freshness lifetime.
+    """
+    etag = headers.get('ETag')
+    last_modified = headers.get('Last-Modified')
+    max_age = _max_age(headers)
+    storable = 'no-store' not in headers.get('Cache-Control', '')
+    if storable and (etag or last_modified or max_age):
+        cache.set(url, {
+            'body': body,
+            'etag': etag,
+            'last_modified': last_modified,
+            'expires_at': time.time() + max_age,
+        })
+
+
+_disk_cache = None
+
+
+def get_disk_cache() -> HTTPDiskCache:
+    """
+    Returns the HTTP cache stored in the SUMMARY_URL_CACHE_DIR directory.
+    """
+    global _disk_cache
+    if _disk_cache is None:
+        _disk_cache = HTTPDiskCache(settings.SUMMARY_URL_CACHE_DIR)
+    return _disk_cache
+
+
+def fetch_url(url: str) -> str:
+    """
+    Fetches a page through the pooled session and the on-disk HTTP cache. A cached page that
+    is still fresh is returned without a request; otherwise the cached validators are sent so
+    an unchanged page costs a single 304 response.
+
+    Args:
+        url (str): The URL to fetch.
+
+    Returns:
+        str: The decoded response body.
+
+    Raises:
+        requests.RequestException: If the request fails, times out, returns an error status
+            or the body exceeds MAX_DOWNLOAD_BYTES.
+    """
+    cache = get_disk_cache()
+    cached = cache.get(url)
+    if cached and cached['expires_at'] > time.time():
+        return cached['body']
+
+    with get_session().get(url, headers=conditional_headers(cached), stream=True,
+                           timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as response:
+        if cached and response.status_code == 304:
+            return revalidated(cache, url, cached, response.headers)
+        response.raise_for_status()  # Ensure successful request
+        body = decode_body(_read_capped(response), response.encoding)
+        store_response(cache, url, body, response.headers)
+    return body
@@ -0,0 +1,141 @@
+import re
+
+import importlib.util
+
+from .registry import lazy_module
+
+bs4 = lazy_module('bs4')
+
+HTML_PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+
+# Elements that never hold article content.
+NON_CONTENT_TAGS = [
+    'script', 'style', 'noscript', 'template', 'iframe', 'svg', 'canvas', 'form', 'button',
+    'input', 'select', 'nav', 'header', 'footer', 'aside', 'menu',
+]
+# Class names or ids marking boilerplate blocks such as sidebars, cookie banners or share bars. Matched
+# against whole class tokens and whole ids, so wrappers such as `has-sidebar` are not mistaken for them.
+BOILERPLATE_PATTERN = re.compile(
+    r'(?:comments?|sidebar|footer|navbar|menu|cookies?|consent|banner|share|social|adverts?|promo|related|'
+    r'newsletter|breadcrumbs?)',
+    re.IGNORECASE,
+)
+# Elements whose text counts towards the score of the block containing them.
+PARAGRAPH_TAGS = ['p', 'pre', 'blockquote', 'li', 'h1', 'h2', 'h3', 'h4', 'td']
+# Elements rendered on their own line.
+BLOCK_TAGS = [
+    'p', 'div', 'section', 'article', 'main', 'li', 'tr', 'pre', 'blockquote',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'br',
+]
+# A main block with less text than this is not trusted and the whole page is used instead.
+MIN_CONTENT_CHARS = 250
+
+BLANK_LINES = re.compile(r'\n\s*\n+')
+INLINE_SPACES = re.compile(r'[ \t\r\f\v\xa0]+')
+
+
+def normalize_whitespace(text: str) -> str:
+    """
+    Collapses runs of spaces within lines and runs of blank lines into single paragraph breaks.
+
+    Args:
+        text (str): The text to normalize.
+
+    Returns:
+        str: The normalized text.
+    """
+    text = INLINE_SPACES.sub(" ", text)
+    text = "\n".join(line.strip() for line in text.split("\n"))
+    return BLANK_LINES.sub("\n\n", text).strip()
+
+
+def _link_density(node) -> float:
+    text_length = len(node.get_text(strip=True))
+    if not text_length:
+        return 1.0
+    link_length = sum(len(link.get_text(strip=True)) for link in node.find_all('a'))
+    return link_length / text_length
+
+
+def _is_boilerplate_name(value) -> bool:
+    # Called with each class token of an element and with its id.
+    return bool(value) and BOILERPLATE_PATTERN.fullmatch(value) is not None
+
+
+def _find_boilerplate(soup) -> list:
+    nodes = soup.find_all(attrs={'class': _is_boilerplate_name}) + soup.find_all(attrs={'id': _is_boilerplate_name})
+    return [node for node in nodes if node.name not in ('html', 'body', 'article', 'main')]
+
+
+def _prune(soup, boilerplate: list, keep):
+    """
+    Removes the boilerplate blocks, except those containing the `keep` block, so a misnamed
+    wrapper never takes the article with it.
+    """
+    kept = set()
+    if keep is not None:
+        kept = {id(keep)} | {id(parent) for parent in keep.parents}
+    for node in boilerplate:
+        if not node.decomposed and id(node) not in kept:
+            node.decompose()
+
+
+def _best_block(soup, skipped: list = ()):
+    """
+    Scores every block by the text of the paragraphs it contains, giving the parent the full
+    paragraph length and the grandparent half of it, and penalizes link-heavy blocks. Paragraphs
+    inside the `skipped` blocks are not counted.
+    """
+    # Keyed by id(): hashing a Tag serializes its whole subtree, and equal-looking blocks compare equal.
+    skipped = {id(node) for node in skipped}
+    scores = {}
+    nodes = {}
+    for paragraph in soup.find_all(PARAGRAPH_TAGS):
+        length = len(paragraph.get_text(strip=True))
+        if length < 25:
+            continue
+        if skipped and any(id(node) in skipped for node in paragraph.parents):
+            continue
+        parent = paragraph.parent
+        if parent is None:
+            continue
+        for node, weight in ((parent, 1), (parent.parent, 0.5)):
+            if node is not None:
+                nodes[id(node)] = node
+                scores[id(node)] = scores.get(id(node), 0) + length * weight
+
+    best, best_score = None, 0
+    for key, score in scores.items():
+        node = nodes[key]
+        score *= 1 - _link_density(node)
+        if score > best_score:
+            best, best_score = node, score
+    return best
+
+
+def extract_main_text(html: str) -> str:
+    """
+    Extracts the main article text of a web page. Scripts, navigation, footers and other
+    boilerplate are removed and the block with the densest paragraph text is kept. Blocks whose
+    class or id names them as boilerplate do not count towards the scores, and are removed unless
+    they contain the kept block.
+
+    Args:
+        html (str): The HTML of the page.
+
+    Returns:
+        str: The main text with normalized whitespace.
+    """
+    soup = bs4.BeautifulSoup(html, HTML_PARSER)
+    for node in soup.find_all(NON_CONTENT_TAGS):
+        node.decompose()
+
+    root = soup.body or soup
+    boilerplate = _find_boilerplate(root)
+    block = _best_block(root, boilerplate) or _best_block(root)
+    _prune(root, boilerplate, block)
+    if block is None or len(block.get_text(strip=True)) < MIN_CONTENT_CHARS:
+        block = root
+    for node in block.find_all(BLOCK_TAGS):
+        node.append("\n")
+    return normalize_whitespace(block.get_text())
@@ -0,0 +1,185 @@
+import functools
+import hashlib
+import mmap
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+from .extraction_cache import extract_cached
+from .metrics import stage
+from .registry import lazy_module
+from .utils import ALLOWED_MIME_TYPES, FILE_EXTRACTORS, MAX_UPLOAD_SIZE
+
+magic = lazy_module("magic")
+
+# Bytes of the upload libmagic looks at to detect its type.
+MIME_SNIFF_BYTES = 2048
+# File-like objects larger than this are spooled to a temporary file instead of being read into memory.
+# Django applies the same limit when it receives uploads, so request files above it arrive on disk already.
+SPOOL_THRESHOLD = settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+# Extractors that take the upload content as a bytes-like buffer instead of a file object.
+BUFFER_EXTRACTORS = {'txt'}
+
+
+@functools.lru_cache(maxsize=None)
+def get_mime_detector():
+    """
+    Returns the libmagic handle shared by all uploads. Opening one loads the magic database,
+    which costs far more than detecting a type; python-magic serializes calls with a lock.
+    """
+    return magic.Magic(mime=True)
+
+
+class IngestedUpload:
+    """
+    An upload that passed validation, with its type resolved and its content mapped once.
+
+    `buffer` is a memoryview over in-memory uploads and a read-only mmap over uploads on disk,
+    so extractors, hashing and type detection share the same bytes without copying them.
+    Close the upload (or use it as a context manager) once extraction is done.
+
+    Attributes:
+        file: The original file object.
+        name (str): The file name.
+        extension (str): The lowercase extension, one of FILE_EXTRACTORS.
+        mime_type (str): The detected MIME type.
+        size (int): The content length in bytes.
+        buffer: The content as a memoryview or mmap.
+        path (str): The file on disk holding the content, or None for in-memory uploads.
+    """
+
+    def __init__(self, file, name: str, extension: str, mime_type: str, buffer, path: str = None, spool=None):
+        self.file = file
+        self.name = name
+        self.extension = extension
+        self.mime_type = mime_type
+        self.size = len(buffer)
+        self.buffer = buffer
+        self.path = path
+        self._spool = spool
+
+    def open(self):
+        """
+        Returns a file object positioned at the start of the content, for extractors that need one.
+        """
+        source = self._spool or self.file
+        source.seek(0)
+        return source
+
+    def digest(self) -> str:
+        """
+        Returns the SHA-256 of the content, computed from the buffer without reading the file again.
+        """
+        return hashlib.sha256(self.buffer).hexdigest()
+
+    def close(self):
+        if isinstance(self.buffer, memoryview):
+            self.buffer.release()
+        else:
+            self.buffer.close()
+        if self._spool is not None:
+            self._spool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _map_file(handle):
+    if os.fstat(handle.fileno()).st_size == 0:
+        return memoryview(b'')
+    return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _map_content(file):
+    """
+    Returns `(buffer, path, spool)` for the content of a file object, reading it at most once.
+    """
+    if hasattr(file, 'temporary_file_path'):
+        # Django spooled the upload to disk while receiving it; map that file in place.
+        return _map_file(file.file), file.temporary_file_path(), None
+
+    handle = getattr(file, 'file', file)
+    if hasattr(handle, 'getbuffer'):
+        # In-memory uploads are BytesIO objects; share their buffer.
+        return handle.getbuffer(), None, None
+
+    handle.seek(0)
+    head = handle.read(SPOOL_THRESHOLD + 1)
+    if len(head) <= SPOOL_THRESHOLD:
+        return memoryview(head), None, None
+
+    spool = tempfile.TemporaryFile()
+    try:
+        spool.write(head)
+        shutil.copyfileobj(handle, spool)
+        spool.flush()
+        return _map_file(spool), None, spool
+    except BaseException:
+        spool.close()
+        raise
+
+
+@stage('ingest')
+def ingest_upload(file) -> IngestedUpload:
+    """
+    Validates an uploaded file in a single pass and maps its content for extraction.
+    The size and extension are checked before the content is touched; the MIME type is
+    detected from the first bytes of the mapped content with the shared libmagic handle.
+
+    Args:
+        file: The uploaded file object.
+
+    Raises:
+        ValidationError: If the file exceeds the maximum allowed size,
+                         has an unsupported extension, or its MIME type does not match expectations.
+
+    Returns:
+        IngestedUpload: The validated upload.
+    """
+    max_size = int(MAX_UPLOAD_SIZE)
+    if file.size > max_size:
+        raise ValidationError(f"File is too large! Max size is {max_size/(1024*1024)}MB.")
+
+    extension = file.name.split('.')[-1].lower()
+    if extension not in ALLOWED_MIME_TYPES:
+        raise ValidationError(f"File extension {extension} is not supported.")
+
+    buffer, path, spool = _map_content(file)
+    upload = IngestedUpload(file, file.name, extension, None, buffer, path, spool)
+    try:
+        if upload.size > max_size:
+            raise ValidationError(f"File is too large! Max size is {max_size/(1024*1024)}MB.")
+        upload.mime_type = get_mime_detector().from_buffer(bytes(buffer[:MIME_SNIFF_BYTES]))
+        expected_mime = ALLOWED_MIME_TYPES[extension]
+        if upload.mime_type != expected_mime:
+            raise ValidationError(f"Invalid file format. Expected {expected_mime}, but got {upload.mime_type}.")
+    except BaseException:
+        upload.close()
+        raise
+    return upload
+
+
+def extract_text_from_upload(upload: IngestedUpload) -> str:
+    """
+    Runs the extractor matching the resolved type of an ingested upload, or returns the text
+    cached from an earlier upload of the same content.
+
+    Args:
+        upload (IngestedUpload): The validated upload.
+
+    Raises:
+        ExtractionError: If the file cannot be read.
+
+    Returns:
+        str: The extracted text.
+    """
+    extractor = FILE_EXTRACTORS[upload.extension]
+    if upload.extension in BUFFER_EXTRACTORS:
+        return extractor(upload.buffer)
+    return extract_cached(upload.extension, upload.digest(), lambda: extractor(upload.open()))
@@ -0,0 +1,372 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.core.signals import request_started
+from django.db import DatabaseError, close_old_connections, connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .admission import BATCH, get_admission_controller
+from .cache import get_summary_cache, make_cache_key
+from .chunking import summarize_document
+from .extraction_cache import extract_cached
+from .model_client import SummaryGenerationError
+from .models import SummaryJob
+from .utils import FILE_EXTRACTORS, ExtractionError, extract_text_from_url, extract_and_validate_url, is_public_url, \
+    sanitize_input
+
+logger = logging.getLogger(__name__)
+
+# Number of worker threads processing jobs in each process that runs a pool.
+JOB_WORKERS = getattr(settings, 'SUMMARY_JOB_WORKERS', 2)
+# Whether web processes run a worker pool themselves; disable when using the run_summary_worker command.
+JOB_RUN_IN_PROCESS = getattr(settings, 'SUMMARY_JOB_RUN_IN_PROCESS', True)
+# Seconds an idle worker waits before checking the database for jobs submitted by other processes.
+JOB_POLL_INTERVAL = 2.0
+# Timeout, in seconds, of the POST sent to a job's callback URL.
+CALLBACK_TIMEOUT = 10
+# Seconds between two heartbeats of a running job.
+JOB_HEARTBEAT_INTERVAL = 30
+# Seconds without a heartbeat after which a running job is assumed to belong to a worker that died,
+# and is queued again.
+JOB_STALE_SECONDS = getattr(settings, 'SUMMARY_JOB_STALE_SECONDS', 5 * 60)
+# Claims after which a job whose worker keeps dying is failed instead of being queued again.
+JOB_MAX_ATTEMPTS = 3
+# Seconds between two checks for stale jobs by the workers of one pool.
+JOB_RECLAIM_INTERVAL = 60
+# Bytes read at a time when hashing a stored upload.
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def store_job_upload(upload) -> str:
+    """
+    Stores an ingested upload in the job upload directory so it outlives the request.
+    Uploads Django spooled to disk are moved there; in-memory ones are written from their buffer.
+
+    Args:
+        upload (IngestedUpload): The validated upload.
+
+    Returns:
+        str: The path of the stored copy.
+    """
+    upload_dir = settings.SUMMARY_JOB_UPLOAD_DIR
+    os.makedirs(upload_dir, exist_ok=True)
+    path = os.path.join(upload_dir, uuid.uuid4().hex)
+    if upload.path is not None:
+        file_move_safe(upload.path, path)
+    else:
+        with open(path, 'wb') as destination:
+            destination.write(upload.buffer)
+    return path
+
+
+def remove_job_upload(path: str):
+    """
+    Deletes the stored upload of a job, if it has one left.
+    """
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def queue_depth() -> int:
+    """
+    Returns the number of jobs waiting to be picked up by a worker.
+    """
+    return SummaryJob.objects.filter(status=SummaryJob.STATUS_QUEUED).count()
+
+
+def serialize_job(job: SummaryJob) -> dict:
+    """
+    Builds the status representation of a job returned by the API and sent to callbacks.
+
+    Args:
+        job (SummaryJob): The job to describe.
+
+    Returns:
+        dict: The job status, result and per-stage timings.
+    """
+    data = {
+        'job_id': str(job.id),
+        'status': job.status,
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'timings': {
+            'queue_seconds': job.queue_seconds,
+            'extraction_seconds': job.extraction_seconds,
+            'summarization_seconds': job.summarization_seconds,
+        },
+    }
+    if job.status == SummaryJob.STATUS_QUEUED:
+        data['queue_position'] = SummaryJob.objects.filter(
+            status=SummaryJob.STATUS_QUEUED, created_at__lte=job.created_at
+        ).count()
+    if job.status == SummaryJob.STATUS_SUCCEEDED:
+        data['summary'] = job.summary
+    if job.status == SummaryJob.STATUS_FAILED:
+        data['error'] = job.error
+    return data
+
+
+def claim_next_job():
+    """
+    Atomically moves the oldest queued job to the running state. The conditional update makes
+    it safe for several processes sharing the database to claim jobs at the same time.
+
+    Returns:
+        SummaryJob: The claimed job, or None if the queue is empty.
+    """
+    candidates = SummaryJob.objects.filter(status=SummaryJob.STATUS_QUEUED).values_list('id', flat=True)[:10]
+    for job_id in candidates:
+        now = timezone.now()
+        claimed = SummaryJob.objects.filter(pk=job_id, status=SummaryJob.STATUS_QUEUED).update(
+            status=SummaryJob.STATUS_RUNNING, started_at=now, heartbeat_at=now, attempts=F('attempts') + 1
+        )
+        if claimed:
+            return SummaryJob.objects.get(pk=job_id)
+    return None
+
+
+def reclaim_stale_jobs() -> int:
+    """
+    Queues again the running jobs without a heartbeat in the last JOB_STALE_SECONDS, whose worker
+    presumably died with its process. Jobs already claimed JOB_MAX_ATTEMPTS times are failed
+    instead, so an input that crashes workers is not retried forever, and their stored uploads
+    are deleted.
+
+    Returns:
+        int: The number of jobs queued again.
+    """
+    cutoff = timezone.now() - timedelta(seconds=JOB_STALE_SECONDS)
+    stale = SummaryJob.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff),
+        status=SummaryJob.STATUS_RUNNING,
+    )
+    exhausted = stale.filter(attempts__gte=JOB_MAX_ATTEMPTS)
+    uploads = list(exhausted.exclude(file_path='').values_list('file_path', flat=True))
+    exhausted.update(status=SummaryJob.STATUS_FAILED, error='Error processing job: the worker stopped responding',
+                     finished_at=timezone.now())
+    for path in uploads:
+        remove_job_upload(path)
+    return stale.update(status=SummaryJob.STATUS_QUEUED, started_at=None, heartbeat_at=None)
+
+
+def extract_job_text(job: SummaryJob) -> str:
+    """
+    Extracts the text to summarize from the job input.
+
+    Args:
+        job (SummaryJob): The job being processed.
+
+    Raises:
+        ExtractionError: If the uploaded file cannot be read.
+
+    Returns:
+        str: The extracted text.
+    """
+    if job.input_type == 'text':
+        url = extract_and_validate_url(job.text)
+        if url and job.text.startswith(url):
+            return extract_text_from_url(url)
+        return sanitize_input(job.text)
+    if job.input_type == 'url':
+        return extract_text_from_url(job.url)
+    with open(job.file_path, 'rb') as file:
+        digest = hashlib.sha256()
+        for block in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(block)
+        file.seek(0)
+        return extract_cached(job.file_extension, digest.hexdigest(),
+                              lambda: FILE_EXTRACTORS[job.file_extension](file))
+
+
+def send_callback(job: SummaryJob):
+    """
+    Posts the final job status to the job's callback URL. Delivery is best effort. The URL is
+    checked again before sending, as its host may resolve differently than at submission, and
+    redirects are not followed, so the callback cannot be pointed at internal services.
+    """
+    if not is_public_url(job.callback_url):
+        logger.warning("Callback for job %s to %s refused: not a public URL", job.id, job.callback_url)
+        return
+    try:
+        requests.post(job.callback_url, json=serialize_job(job), timeout=CALLBACK_TIMEOUT, allow_redirects=False)
+    except requests.RequestException as e:
+        logger.warning("Callback for job %s to %s failed: %s", job.id, job.callback_url, e)
+
+
+class JobHeartbeat:
+    """
+    Context manager refreshing the heartbeat of a running job from a background thread every
+    `interval` seconds, so a job that is merely slow, for example while it waits for a batch model
+    slot, is not mistaken for one whose worker died.
+
+    Args:
+        job (SummaryJob): A job in the running state.
+        interval (float): The seconds between two heartbeats.
+    """
+
+    def __init__(self, job: SummaryJob, interval: float = JOB_HEARTBEAT_INTERVAL):
+        self.job = job
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'summary-job-heartbeat-{job.pk}', daemon=True)
+
+    def _run(self):
+        try:
+            while not self._stopped.wait(self.interval):
+                try:
+                    SummaryJob.objects.filter(pk=self.job.pk, status=SummaryJob.STATUS_RUNNING).update(
+                        heartbeat_at=timezone.now())
+                except DatabaseError:
+                    logger.warning("Heartbeat of summary job %s failed", self.job.pk, exc_info=True)
+        finally:
+            connections.close_all()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+
+
+def process_job(job: SummaryJob):
+    """
+    Runs extraction and summarization for a claimed job and records the result and timings.
+
+    Args:
+        job (SummaryJob): A job in the running state.
+    """
+    try:
+        with JobHeartbeat(job):
+            _run_job(job)
+    finally:
+        # The stored upload is removed whatever happens, including a failing save or callback.
+        remove_job_upload(job.file_path)
+
+
+def _run_job(job: SummaryJob):
+    try:
+        started = time.perf_counter()
+        try:
+            text, error = extract_job_text(job), 'No valid text found'
+        except ExtractionError as e:
+            text, error = None, str(e)
+        job.extraction_seconds = time.perf_counter() - started
+
+        if not text:
+            job.status = SummaryJob.STATUS_FAILED
+            job.error = error
+        else:
+            started = time.perf_counter()
+            def generate():
+                # Background work waits for a model slot at batch priority, however long it takes.
+                with get_admission_controller().slot(BATCH, bounded=False):
+                    return summarize_document(form=job.form, length=job.length, language=job.language, text=text,
+                                              granularity=job.granularity)
+
+            try:
+                job.summary = get_summary_cache().get_or_generate(
+                    make_cache_key(text, job.form, job.length, job.language, job.granularity), generate)
+                job.status = SummaryJob.STATUS_SUCCEEDED
+            except SummaryGenerationError as e:
+                job.status = SummaryJob.STATUS_FAILED
+                job.error = str(e)
+            job.summarization_seconds = time.perf_counter() - started
+    except Exception as e:
+        job.status = SummaryJob.STATUS_FAILED
+        job.error = f"Error processing job: {e}"
+
+    job.finished_at = timezone.now()
+    job.save()
+    if job.callback_url:
+        send_callback(job)
+
+
+class JobWorkerPool:
+    """
+    Pool of daemon threads that claim queued jobs from the database and process them.
+    Idle workers wake up when a job is submitted in this process and poll periodically
+    for jobs submitted elsewhere.
+
+    Args:
+        workers (int): The number of worker threads.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS):
+        self.workers = workers
+        self._wakeup = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._reclaimed_at = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self.run, name=f'summary-job-worker-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def notify(self):
+        self._wakeup.set()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def run(self):
+        while True:
+            try:
+                self._run_once()
+            except Exception:
+                # A worker never dies; a job it failed to finish is reclaimed once it is stale.
+                logger.exception("Summary job worker iteration failed")
+                time.sleep(JOB_POLL_INTERVAL)
+
+    def _run_once(self):
+        close_old_connections()
+        if time.monotonic() - self._reclaimed_at > JOB_RECLAIM_INTERVAL:
+            self._reclaimed_at = time.monotonic()
+            reclaimed = reclaim_stale_jobs()
+            if reclaimed:
+                logger.warning("Queued %d stale summary jobs again", reclaimed)
+        job = claim_next_job()
+        if job is None:
+            self._wakeup.wait(JOB_POLL_INTERVAL)
+            self._wakeup.clear()
+            return
+        process_job(job)
+
+
+worker_pool = JobWorkerPool()
+
+
+def start_worker_pool(**kwargs):
+    """
+    Starts the local worker pool when the process serves its first request, so jobs queued before
+    it started, or left by a previous process, are processed without waiting for a new submission.
+    Connected to `request_started` by the app config when SUMMARY_JOB_RUN_IN_PROCESS is set.
+    """
+    request_started.disconnect(start_worker_pool)
+    worker_pool.start()
+
+
+def enqueue_job(job: SummaryJob):
+    """
+    Makes sure the local worker pool is running and wakes it up for a newly created job.
+    """
+    if JOB_RUN_IN_PROCESS:
+        worker_pool.start()
+        worker_pool.notify()
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from summarizer.store import prune_summaries
+
+
+class Command(BaseCommand):
+    help = "Deletes stored summaries past the retention period or above the row limit."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Deleted {prune_summaries()} stored summaries.")
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from summarizer.watch import refresh_due_watches
+
+
+class Command(BaseCommand):
+    help = "Refreshes the summaries of watched URLs, calling the model only for pages that changed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=float, default=0,
+                            help="Only refresh URLs not checked in this many seconds.")
+
+    def handle(self, *args, **options):
+        counts = refresh_due_watches(options['older_than'])
+        summary = ", ".join(f"{count} {result}" for result, count in sorted(counts.items())) or "none"
+        self.stdout.write(f"Refreshed watched URLs: {summary}.")
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from summarizer.jobs import JobWorkerPool, JOB_WORKERS
+
+
+class Command(BaseCommand):
+    help = "Runs a pool of workers processing queued summary jobs from the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=JOB_WORKERS, help="Number of worker threads.")
+
+    def handle(self, *args, **options):
+        pool = JobWorkerPool(workers=options['workers'])
+        self.stdout.write(f"Processing summary jobs with {pool.workers} workers.")
+        pool.start()
+        try:
+            pool.join()
+        except KeyboardInterrupt:
+            pass
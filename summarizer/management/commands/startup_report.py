@@ -0,0 +1,67 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from summarizer.registry import LAZY_MODULES, LOAD_TIMES
+
+# Boots Django in a fresh interpreter the way a web worker does and reports the time and memory it took.
+BOOT_SCRIPT = """
+import json, os, resource, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+from django.conf import settings
+__import__(settings.ROOT_URLCONF)
+print(json.dumps({
+    'boot_seconds': time.perf_counter() - started,
+    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'heavy_modules_loaded': sorted(name for name in json.loads(sys.argv[1]) if name in sys.modules),
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = "Measures worker startup time and memory, and the cost of loading each lazily imported library."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--with-model', action='store_true', help="Also time configuring the Gemini model.")
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON.")
+
+    def handle(self, *args, **options):
+        environment = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'SummarizationProject.settings'))
+        boot = subprocess.run(
+            [sys.executable, '-c', BOOT_SCRIPT, json.dumps(sorted(LAZY_MODULES))],
+            cwd=settings.BASE_DIR, env=environment, capture_output=True, text=True, check=True,
+        )
+        report = {'worker': json.loads(boot.stdout), 'lazy_modules': {}}
+
+        for name, module in sorted(LAZY_MODULES.items()):
+            if not module.is_loaded:
+                module._load()
+            report['lazy_modules'][name] = LOAD_TIMES.get(name)
+
+        if options['with_model']:
+            from summarizer.utils import get_model
+
+            started = time.perf_counter()
+            get_model()
+            report['model_init_seconds'] = time.perf_counter() - started
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        worker = report['worker']
+        self.stdout.write(f"Worker boot: {worker['boot_seconds'] * 1000:.1f} ms, max RSS {worker['max_rss_kb'] / 1024:.1f} MB")
+        self.stdout.write(f"Heavy modules imported at boot: {', '.join(worker['heavy_modules_loaded']) or 'none'}")
+        self.stdout.write("First-use import cost:")
+        for name, seconds in report['lazy_modules'].items():
+            cost = 'already imported' if seconds is None else f"{seconds * 1000:.1f} ms"
+            self.stdout.write(f"  {name:<24} {cost}")
+        if 'model_init_seconds' in report:
+            self.stdout.write(f"Model initialization: {report['model_init_seconds'] * 1000:.1f} ms")
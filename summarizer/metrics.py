@@ -0,0 +1,300 @@
+import contextvars
+import functools
+import threading
+import time
+from bisect import bisect_left
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+# Whether responses carry a Server-Timing header with the time spent in each stage of the request.
+TIMING_HEADERS = getattr(settings, 'SUMMARY_TIMING_HEADERS', False)
+
+# Histogram bucket bounds for durations in seconds and for sizes in bytes, characters or tokens.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = tuple(4 ** exponent for exponent in range(3, 14))
+
+_request_timings = contextvars.ContextVar('summarizer_request_timings', default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """
+    Base of the in-process metrics. Every sample is kept per combination of label values.
+
+    Args:
+        name (str): The metric name.
+        documentation (str): The help text.
+        labelnames (tuple): The names of the labels.
+    """
+
+    type = None
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, '') for name in self.labelnames)
+
+    def samples(self) -> list:
+        raise NotImplementedError
+
+    def render(self) -> list:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        lines.extend(self.samples())
+        return lines
+
+
+class Counter(Metric):
+    """
+    A monotonically increasing count.
+    """
+
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> list:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in values]
+
+
+class Histogram(Metric):
+    """
+    Counts observations in cumulative buckets and tracks their sum, as Prometheus histograms do.
+
+    Args:
+        buckets (tuple): The ascending upper bounds of the buckets; +Inf is added implicitly.
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def samples(self) -> list:
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(float(bound))}"')
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+REGISTRY = []
+# Callables returning extra exposition lines, for values such as cache statistics that are kept elsewhere.
+COLLECTORS = []
+
+STAGE_SECONDS = Histogram('summarizer_stage_seconds', 'Time spent in each processing stage.', ['stage'])
+STAGE_ERRORS = Counter('summarizer_stage_errors_total', 'Stages that raised an exception.', ['stage'])
+REQUEST_SECONDS = Histogram('summarizer_request_seconds', 'Time spent handling each request.', ['view', 'status'])
+INPUT_BYTES = Histogram('summarizer_input_bytes', 'Size of the submitted input.', ['input_type'], SIZE_BUCKETS)
+INPUT_CHARACTERS = Histogram('summarizer_input_characters', 'Characters of extracted text.', ['input_type'],
+                             SIZE_BUCKETS)
+INPUT_TOKENS = Histogram('summarizer_input_tokens', 'Estimated model tokens of extracted text.', ['input_type'],
+                         SIZE_BUCKETS)
+OUTPUT_CHARACTERS = Histogram('summarizer_output_characters', 'Characters of the returned summary.', [],
+                              SIZE_BUCKETS)
+
+
+def register_collector(collector):
+    """
+    Registers a callable returning a list of exposition lines to append to the metrics output.
+    """
+    COLLECTORS.append(collector)
+    return collector
+
+
+def format_family(name: str, documentation: str, metric_type: str, samples: list) -> list:
+    """
+    Formats one metric family kept outside the registry, for use by collectors.
+
+    Args:
+        name (str): The metric name.
+        documentation (str): The help text.
+        metric_type (str): 'counter' or 'gauge'.
+        samples (list): `(labels, value)` pairs, where labels is a dict.
+
+    Returns:
+        list: The exposition lines.
+    """
+    lines = [f'# HELP {name} {documentation}', f'# TYPE {name} {metric_type}']
+    for labels, value in samples:
+        lines.append(f'{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}')
+    return lines
+
+
+def render_metrics() -> str:
+    """
+    Renders every metric in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for collector in COLLECTORS:
+        lines.extend(collector())
+    return '\n'.join(lines) + '\n'
+
+
+def _record(name: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage=name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+def current_timings() -> dict:
+    """
+    Returns the stage timings recorded so far in the current request, or an empty dict outside one.
+    """
+    return dict(_request_timings.get() or {})
+
+
+class stage:
+    """
+    Times a block of code as the named stage, as a context manager or as a decorator of
+    sync and async functions. The duration is added to the stage histogram and, during a
+    request, to the timings reported in its Server-Timing header; exceptions are counted.
+
+    Args:
+        name (str): The stage name, e.g. 'extract_pdf' or 'model'.
+    """
+
+    __slots__ = ('name', '_started')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        _record(self.name, time.perf_counter() - self._started)
+        if exc_type is not None:
+            STAGE_ERRORS.inc(stage=self.name)
+        return False
+
+    def __call__(self, function):
+        name = self.name
+
+        if iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with stage(name):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+
+
+def record_sizes(input_type: str, input_bytes: int, text: str, tokens: int):
+    """
+    Records the size of a request's input and of the text extracted from it.
+    """
+    INPUT_BYTES.observe(input_bytes, input_type=input_type)
+    INPUT_CHARACTERS.observe(len(text), input_type=input_type)
+    INPUT_TOKENS.observe(tokens, input_type=input_type)
+
+
+def _server_timing(timings: dict, total: float) -> str:
+    parts = [f'{name};dur={seconds * 1000:.1f}' for name, seconds in timings.items()]
+    parts.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(parts)
+
+
+def _finish_request(request, response, timings: dict, started: float):
+    total = time.perf_counter() - started
+    match = getattr(request, 'resolver_match', None)
+    view = match.url_name if match is not None and match.url_name else 'unmatched'
+    REQUEST_SECONDS.observe(total, view=view, status=response.status_code)
+    if TIMING_HEADERS and not response.streaming:
+        response['Server-Timing'] = _server_timing(timings, total)
+
+
+class TimingMiddleware:
+    """
+    Measures every request, per view and status code, and collects the stages timed while
+    handling it. With SUMMARY_TIMING_HEADERS enabled the stage timings are returned in a
+    Server-Timing header (streamed responses are sent before the stages finish and get none).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        timings = {}
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_timings.reset(token)
+        _finish_request(request, response, timings, started)
+        return response
+
+    async def __acall__(self, request):
+        timings = {}
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_timings.reset(token)
+        _finish_request(request, response, timings, started)
+        return response
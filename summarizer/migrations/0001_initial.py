@@ -0,0 +1,23 @@
+# Generated by Django 4.2.17 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CachedSummary',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('summary', models.TextField()),
+                ('created_at', models.DateTimeField()),
+                ('accessed_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
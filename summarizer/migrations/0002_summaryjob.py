@@ -0,0 +1,41 @@
+# Generated by Django 4.2.17 on 2026-10-18 11:24
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('summarizer', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SummaryJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], db_index=True, default='queued', max_length=16)),
+                ('input_type', models.CharField(max_length=8)),
+                ('form', models.CharField(max_length=16)),
+                ('length', models.PositiveSmallIntegerField()),
+                ('language', models.CharField(max_length=64)),
+                ('granularity', models.CharField(max_length=16)),
+                ('text', models.TextField(blank=True)),
+                ('url', models.URLField(blank=True, max_length=2048)),
+                ('file_path', models.CharField(blank=True, max_length=512)),
+                ('file_extension', models.CharField(blank=True, max_length=8)),
+                ('callback_url', models.URLField(blank=True, max_length=2048)),
+                ('summary', models.TextField(blank=True)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('extraction_seconds', models.FloatField(blank=True, null=True)),
+                ('summarization_seconds', models.FloatField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.17 on 2026-10-18 11:51
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('summarizer', '0003_ratelimitbucket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredSummary',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('content_hash', models.CharField(db_index=True, max_length=64)),
+                ('cache_key', models.CharField(db_index=True, max_length=64)),
+                ('input_type', models.CharField(max_length=8)),
+                ('form', models.CharField(max_length=16)),
+                ('length', models.PositiveSmallIntegerField()),
+                ('language', models.CharField(max_length=64)),
+                ('granularity', models.CharField(max_length=16)),
+                ('summary', models.TextField()),
+                ('model', models.CharField(blank=True, max_length=128)),
+                ('input_characters', models.PositiveIntegerField()),
+                ('input_tokens', models.PositiveIntegerField()),
+                ('summary_tokens', models.PositiveIntegerField()),
+                ('extraction_seconds', models.FloatField(blank=True, null=True)),
+                ('summarization_seconds', models.FloatField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.17 on 2026-10-18 12:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('summarizer', '0004_storedsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSignature',
+            fields=[
+                ('content_hash', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('signature', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SignatureBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band_key', models.CharField(db_index=True, max_length=32)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bands', to='summarizer.documentsignature')),
+            ],
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.17 on 2026-10-18 12:14
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('summarizer', '0005_documentsignature'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WatchedUrl',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('url', models.URLField(max_length=2048)),
+                ('form', models.CharField(max_length=16)),
+                ('length', models.PositiveSmallIntegerField()),
+                ('language', models.CharField(max_length=64)),
+                ('granularity', models.CharField(max_length=16)),
+                ('blocks', models.JSONField(default=list)),
+                ('summary', models.TextField(blank=True)),
+                ('summary_id', models.UUIDField(blank=True, null=True)),
+                ('incremental_updates', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('checked_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('changed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.17 on 2026-10-18 12:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('summarizer', '0007_summaryjob_attempts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storedsummary',
+            name='degraded',
+            field=models.BooleanField(default=False),
+        ),
+    ]
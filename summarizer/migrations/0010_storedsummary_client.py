@@ -0,0 +1,18 @@
+# Generated by Django 4.2.17 on 2026-10-18 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('summarizer', '0009_summaryjob_heartbeat_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storedsummary',
+            name='client',
+            field=models.CharField(blank=True, db_index=True, max_length=255),
+        ),
+    ]
@@ -0,0 +1,646 @@
+import asyncio
+import contextvars
+import json
+import logging
+import math
+import random
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError
+
+from .metrics import format_family, register_collector, stage
+from .registry import lazy_module
+
+genai = lazy_module("google.generativeai")
+api_exceptions = lazy_module("google.api_core.exceptions")
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "gemini-1.5-flash"
+# Base URL of an alternative Gemini API endpoint, such as the benchmark stand-in; reached over REST.
+MODEL_API_ENDPOINT = getattr(settings, 'SUMMARY_MODEL_API_ENDPOINT', None)
+# Model used while the circuit of MODEL_NAME is open; None sheds the load instead.
+FAILOVER_MODEL_NAME = getattr(settings, 'SUMMARY_FAILOVER_MODEL', None)
+# Sustained model calls per second allowed across all worker processes, and the burst allowed above it.
+# None disables the shared rate limiter.
+MODEL_RATE_LIMIT = getattr(settings, 'SUMMARY_MODEL_RATE_LIMIT', None)
+MODEL_RATE_BURST = getattr(settings, 'SUMMARY_MODEL_RATE_BURST', 10)
+# Whether a second, hedged request is sent when a call runs longer than the observed p95 latency.
+MODEL_HEDGING = getattr(settings, 'SUMMARY_MODEL_HEDGING', True)
+
+# Attempts per model call, including the first one; only transient errors are retried.
+MAX_ATTEMPTS = 4
+# Exponential backoff between attempts, with full jitter: a random delay up to min(max, base * 2 ** attempt).
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 8
+# Time allowed for a single request, and for a whole call including retries and backoff.
+CALL_TIMEOUT_SECONDS = 30
+CALL_DEADLINE_SECONDS = 60
+# Consecutive transient failures that open a model's circuit, and how long it stays open before a probe.
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_SECONDS = 30
+# Latencies kept per model for the p95 estimate, and the number needed before requests are hedged.
+LATENCY_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+# Threads running model requests that may be hedged.
+MODEL_CALL_WORKERS = 32
+
+_call_executor = ThreadPoolExecutor(max_workers=MODEL_CALL_WORKERS, thread_name_prefix='model-call')
+
+
+# Names of the engines that answered inside the current `track_models` block.
+_models_used = contextvars.ContextVar('summarizer_models_used', default=None)
+
+
+@contextmanager
+def track_models():
+    """
+    Collects the names of the models (or local engines) that answered the calls made inside the block,
+    in this thread or task and in the threads started from it by `sync_to_async`.
+
+    Yields:
+        list: The names, in the order they first answered.
+    """
+    used = []
+    token = _models_used.set(used)
+    try:
+        yield used
+    finally:
+        _models_used.reset(token)
+
+
+def note_model(name: str):
+    """
+    Records that the named model or engine answered, if a `track_models` block is active.
+    """
+    used = _models_used.get()
+    if used is not None and name not in used:
+        used.append(name)
+
+
+class ModelUnavailableError(Exception):
+    """
+    Raised without calling the model when every model's circuit is open or the rate limit
+    cannot be met before the call deadline.
+
+    Args:
+        message (str): The error message.
+        retry_after (int): Seconds after which a new call may succeed.
+    """
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class SummaryGenerationError(Exception):
+    """
+    Raised when no summary could be generated: the model failed after every retry and no
+    fallback answered. The message is the error reported to the client.
+    """
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Tells whether a failed model call may succeed when retried: rate limiting, overload,
+    server errors and timeouts are transient, invalid requests and blocked prompts are not.
+    """
+    transient = (
+        api_exceptions.TooManyRequests, api_exceptions.ResourceExhausted, api_exceptions.ServiceUnavailable,
+        api_exceptions.InternalServerError, api_exceptions.BadGateway, api_exceptions.GatewayTimeout,
+        api_exceptions.DeadlineExceeded, TimeoutError, ConnectionError,
+    )
+    return isinstance(error, transient)
+
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_generative_model(name: str = MODEL_NAME):
+    """
+    Returns the generative AI model of the given name, configuring the client on first use with
+    the SUMMARY_GEMINI_KEY setting or, if it is not set, the API key from config.json.
+
+    Raises:
+        Exception: If the API key is missing from config.json.
+
+    Returns:
+        genai.GenerativeModel: The model shared by the whole process.
+    """
+    model = _models.get(name)
+    if model is None:
+        with _models_lock:
+            model = _models.get(name)
+            if model is None:
+                if not _models:
+                    key = getattr(settings, 'SUMMARY_GEMINI_KEY', None)
+                    if not key:
+                        with open("config.json", "r") as config_file:
+                            config = json.load(config_file)
+                        key = config["GEMINI_KEY"]
+                    if not key:
+                        raise Exception("API key not found in config.json")
+                    options = {}
+                    if MODEL_API_ENDPOINT:
+                        options = {'transport': 'rest', 'client_options': {'api_endpoint': MODEL_API_ENDPOINT}}
+                    genai.configure(api_key=key, **options)
+                model = _models[name] = genai.GenerativeModel(model_name=name)
+    return model
+
+
+class CircuitBreaker:
+    """
+    Stops calls to a failing model. The circuit opens after `failure_threshold` consecutive
+    transient failures; after `reset_seconds` a single probe call is let through, which closes
+    the circuit on success and reopens it on failure.
+
+    Args:
+        failure_threshold (int): Consecutive failures that open the circuit.
+        reset_seconds (float): Seconds the circuit stays open before a probe.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        Returns True if a call may be made now.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                if now < self._opened_at + self.reset_seconds:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_started = None
+            if self.state == self.HALF_OPEN:
+                # A probe that never reported back (e.g. an abandoned stream) does not block the circuit forever.
+                if self._probe_started is not None and now < self._probe_started + self.reset_seconds:
+                    return False
+                self._probe_started = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._failures = 0
+                self._probe_started = None
+
+    def retry_after(self) -> float:
+        """
+        Returns the seconds until the circuit lets a probe through, 0 if calls are allowed.
+        """
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_seconds - time.monotonic())
+
+
+class LatencyTracker:
+    """
+    Keeps the latencies of the last `size` successful calls to estimate percentiles.
+    """
+
+    def __init__(self, size: int = LATENCY_WINDOW):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction: float):
+        """
+        Returns the latency below which `fraction` of the calls completed, or None while
+        fewer than HEDGE_MIN_SAMPLES calls have been seen.
+        """
+        with self._lock:
+            if len(self._samples) < HEDGE_MIN_SAMPLES:
+                return None
+            samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+class SharedTokenBucket:
+    """
+    Token bucket whose state is stored in the database, so every worker process of the
+    deployment draws from the same budget. Tokens are taken with a compare-and-swap on the
+    row version, which needs no table locks and works on every database backend. If the
+    database cannot be reached the bucket lets calls through rather than failing them.
+
+    Args:
+        name (str): The name of the bucket row.
+        rate (float): Tokens added per second.
+        burst (int): The bucket capacity.
+    """
+
+    # Compare-and-swap attempts before a contended take backs off.
+    SWAP_ATTEMPTS = 5
+
+    def __init__(self, name: str, rate: float, burst: int):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+
+    def _take(self, cost: float = 1) -> float:
+        """
+        Takes `cost` tokens if they are available. Returns 0 on success, otherwise the seconds to wait before trying again.
+        A cost above the capacity is taken from a full bucket, leaving it below zero.
+        """
+        from .models import RateLimitBucket
+
+        needed = min(cost, self.burst)
+        try:
+            for _ in range(self.SWAP_ATTEMPTS):
+                now = time.time()
+                bucket, created = RateLimitBucket.objects.get_or_create(
+                    name=self.name, defaults={'tokens': self.burst - cost, 'updated_at': now}
+                )
+                if created:
+                    return 0.0
+                tokens = min(self.burst, bucket.tokens + max(0.0, now - bucket.updated_at) * self.rate)
+                if tokens < needed:
+                    return (needed - tokens) / self.rate
+                taken = RateLimitBucket.objects.filter(name=self.name, version=bucket.version).update(
+                    tokens=tokens - cost, updated_at=now, version=bucket.version + 1
+                )
+                if taken:
+                    return 0.0
+        except DatabaseError:
+            logger.warning("Rate limit bucket %s is unavailable; letting the call through", self.name, exc_info=True)
+            return 0.0
+        return random.uniform(0, 1 / self.rate)
+
+    def reserve(self, cost: float = 1) -> float:
+        """
+        Takes `cost` tokens if they are available right now. Returns 0 on success, otherwise the
+        seconds until they will be. A cost above the bucket capacity is taken once the bucket is full
+        and leaves it in debt, so it is refilled no sooner than after `cost` separate takes.
+        """
+        return self._take(cost)
+
+    def try_acquire(self) -> bool:
+        """
+        Takes a token if one is available right now.
+        """
+        return self._take() == 0
+
+    def acquire(self, deadline: float) -> bool:
+        """
+        Waits for a token until the `time.monotonic()` deadline. Returns False if none became available in time.
+        """
+        while True:
+            delay = self._take()
+            if delay == 0:
+                return True
+            if time.monotonic() + delay > deadline:
+                return False
+            time.sleep(delay)
+
+    async def acquire_async(self, deadline: float) -> bool:
+        """
+        Asynchronous variant of `acquire` that waits without blocking the event loop.
+        """
+        while True:
+            delay = await sync_to_async(self._take)()
+            if delay == 0:
+                return True
+            if time.monotonic() + delay > deadline:
+                return False
+            await asyncio.sleep(delay)
+
+
+class ModelClient:
+    """
+    Calls the generative model with retries, deadlines, hedging and circuit breaking.
+
+    Transient errors are retried with exponential backoff and full jitter until MAX_ATTEMPTS
+    or the call deadline is reached. A request running longer than the model's p95 latency is
+    hedged with a second identical request and the first answer wins. Each model has a circuit
+    breaker; while the primary circuit is open calls fail over to the secondary model, and
+    with every circuit open they fail fast with ModelUnavailableError. An optional shared
+    token bucket keeps the whole deployment under the provider's rate limit.
+
+    Args:
+        primary (str): The name of the model used by default.
+        secondary (str): The name of the failover model, or None.
+        rate_limiter (SharedTokenBucket): The rate limiter taken before every request, or None.
+        hedging (bool): Whether slow requests are hedged.
+    """
+
+    def __init__(self, primary: str = MODEL_NAME, secondary: str = None, rate_limiter: SharedTokenBucket = None,
+                 hedging: bool = MODEL_HEDGING):
+        self.models = [name for name in (primary, secondary) if name]
+        self.breakers = {name: CircuitBreaker() for name in self.models}
+        self.latencies = {name: LatencyTracker() for name in self.models}
+        self.rate_limiter = rate_limiter
+        self.hedging = hedging
+        self.counters = Counter()
+        self._counters_lock = threading.Lock()
+
+    def is_available(self) -> bool:
+        """
+        Returns True unless every model's circuit is open.
+        """
+        return any(breaker.retry_after() == 0 for breaker in self.breakers.values())
+
+    def retry_after(self) -> int:
+        """
+        Returns the whole seconds after which a call may succeed again, at least 1.
+        """
+        return max(1, math.ceil(min(breaker.retry_after() for breaker in self.breakers.values())))
+
+    def stats(self) -> dict:
+        """
+        Returns the call counters and the circuit state and p95 latency of every model.
+        """
+        return {
+            'counters': self._counter_values(),
+            'models': {
+                name: {'circuit': self.breakers[name].state, 'p95_seconds': self.latencies[name].percentile(0.95)}
+                for name in self.models
+            },
+        }
+
+    def _count(self, event: str):
+        # Calls run in request threads and on the hedging executor; `+=` on a Counter is not atomic.
+        with self._counters_lock:
+            self.counters[event] += 1
+
+    def _counter_values(self) -> dict:
+        with self._counters_lock:
+            return dict(self.counters)
+
+    def _choose_model(self) -> str:
+        for name in self.models:
+            if self.breakers[name].allow():
+                if name != self.models[0]:
+                    self._count('failovers')
+                return name
+        self._count('shed')
+        raise ModelUnavailableError("The model is unavailable; try again later.", self.retry_after())
+
+    def _rate_limited(self) -> ModelUnavailableError:
+        self._count('rate_limited')
+        return ModelUnavailableError("The model rate limit has been reached; try again later.", 1)
+
+    def _record_failure(self, name: str, error: Exception) -> bool:
+        """
+        Records a failed request and returns True if it should be retried. Non-transient errors
+        mean the model did answer, so they count as a success for its circuit.
+        """
+        if is_transient(error):
+            self.breakers[name].record_failure()
+            self._count('transient_errors')
+            return True
+        self.breakers[name].record_success()
+        return False
+
+    def _backoff_delay(self, attempt: int, deadline: float):
+        """
+        Returns the jittered delay before the next attempt, or None if it would pass the deadline.
+        """
+        delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            return None
+        self._count('retries')
+        return delay
+
+    def _hedge_after(self, name: str, timeout: float):
+        if not self.hedging:
+            return None
+        p95 = self.latencies[name].percentile(0.95)
+        if p95 is None or p95 >= timeout:
+            return None
+        return p95
+
+    def _may_hedge(self) -> bool:
+        return self.rate_limiter is None or self.rate_limiter.try_acquire()
+
+    @stage('model')
+    def _call(self, name: str, prompt: str, timeout: float) -> str:
+        started = time.monotonic()
+        response = get_generative_model(name).generate_content(prompt, request_options={'timeout': timeout})
+        text = response.text
+        self.latencies[name].record(time.monotonic() - started)
+        return text
+
+    def _call_hedged(self, name: str, prompt: str, deadline: float) -> str:
+        timeout = min(CALL_TIMEOUT_SECONDS, deadline - time.monotonic())
+        hedge_after = self._hedge_after(name, timeout)
+        if hedge_after is None:
+            return self._call(name, prompt, timeout)
+
+        primary = _call_executor.submit(self._call, name, prompt, timeout)
+        done, _ = wait([primary], timeout=hedge_after)
+        if done or not self._may_hedge():
+            return primary.result(timeout=max(0.0, deadline - time.monotonic()))
+
+        self._count('hedged')
+        hedge = _call_executor.submit(self._call, name, prompt, timeout - hedge_after)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                raise TimeoutError("The model call exceeded its deadline.")
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count('hedge_wins')
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def generate(self, prompt: str) -> str:
+        """
+        Generates a response to the prompt.
+
+        Args:
+            prompt (str): The prompt to send.
+
+        Returns:
+            str: The text of the response.
+
+        Raises:
+            ModelUnavailableError: If no model may be called or the rate limit cannot be met in time.
+            Exception: The error of the last attempt if every attempt failed.
+        """
+        deadline = time.monotonic() + CALL_DEADLINE_SECONDS
+        for attempt in range(MAX_ATTEMPTS):
+            if self.rate_limiter is not None and not self.rate_limiter.acquire(deadline):
+                raise self._rate_limited()
+            name = self._choose_model()
+            try:
+                text = self._call_hedged(name, prompt, deadline)
+            except Exception as e:
+                retry = self._record_failure(name, e) and attempt < MAX_ATTEMPTS - 1
+                delay = self._backoff_delay(attempt, deadline) if retry else None
+                if delay is None:
+                    raise
+                time.sleep(delay)
+            else:
+                self.breakers[name].record_success()
+                note_model(name)
+                return text
+
+    def stream(self, prompt: str):
+        """
+        Generates a response to the prompt as a stream. Attempts are retried only until the
+        first chunk has been received; a stream failing midway raises.
+
+        Args:
+            prompt (str): The prompt to send.
+
+        Yields:
+            str: Consecutive chunks of the response text.
+        """
+        deadline = time.monotonic() + CALL_DEADLINE_SECONDS
+        for attempt in range(MAX_ATTEMPTS):
+            if self.rate_limiter is not None and not self.rate_limiter.acquire(deadline):
+                raise self._rate_limited()
+            name = self._choose_model()
+            started = False
+            try:
+                timeout = min(CALL_TIMEOUT_SECONDS, deadline - time.monotonic())
+                response = get_generative_model(name).generate_content(prompt, stream=True,
+                                                                       request_options={'timeout': timeout})
+                for chunk in response:
+                    started = True
+                    yield chunk.text
+            except Exception as e:
+                retry = self._record_failure(name, e) and not started and attempt < MAX_ATTEMPTS - 1
+                delay = self._backoff_delay(attempt, deadline) if retry else None
+                if delay is None:
+                    raise
+                time.sleep(delay)
+            else:
+                self.breakers[name].record_success()
+                note_model(name)
+                return
+
+    @stage('model')
+    async def _call_async(self, name: str, prompt: str, timeout: float) -> str:
+        started = time.monotonic()
+        response = await asyncio.wait_for(
+            get_generative_model(name).generate_content_async(prompt, request_options={'timeout': timeout}), timeout
+        )
+        text = response.text
+        self.latencies[name].record(time.monotonic() - started)
+        return text
+
+    async def _call_hedged_async(self, name: str, prompt: str, deadline: float) -> str:
+        timeout = min(CALL_TIMEOUT_SECONDS, deadline - time.monotonic())
+        hedge_after = self._hedge_after(name, timeout)
+        if hedge_after is None:
+            return await self._call_async(name, prompt, timeout)
+
+        primary = asyncio.ensure_future(self._call_async(name, prompt, timeout))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if done or not await sync_to_async(self._may_hedge)():
+                return await primary
+
+            self._count('hedged')
+            hedge = asyncio.ensure_future(self._call_async(name, prompt, timeout - hedge_after))
+            tasks.append(hedge)
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._count('hedge_wins')
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def generate_async(self, prompt: str) -> str:
+        """
+        Asynchronous variant of `generate` that does not block a thread while waiting.
+        """
+        deadline = time.monotonic() + CALL_DEADLINE_SECONDS
+        for attempt in range(MAX_ATTEMPTS):
+            if self.rate_limiter is not None and not await self.rate_limiter.acquire_async(deadline):
+                raise self._rate_limited()
+            name = self._choose_model()
+            try:
+                text = await self._call_hedged_async(name, prompt, deadline)
+            except Exception as e:
+                retry = self._record_failure(name, e) and attempt < MAX_ATTEMPTS - 1
+                delay = self._backoff_delay(attempt, deadline) if retry else None
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+            else:
+                self.breakers[name].record_success()
+                note_model(name)
+                return text
+
+
+_model_client = None
+_model_client_lock = threading.Lock()
+
+
+def get_model_client() -> ModelClient:
+    """
+    Returns the process-wide model client configured from the SUMMARY_FAILOVER_MODEL,
+    SUMMARY_MODEL_RATE_LIMIT and SUMMARY_MODEL_HEDGING settings.
+    """
+    global _model_client
+    if _model_client is None:
+        with _model_client_lock:
+            if _model_client is None:
+                rate_limiter = None
+                if MODEL_RATE_LIMIT:
+                    rate_limiter = SharedTokenBucket('model', MODEL_RATE_LIMIT, MODEL_RATE_BURST)
+                _model_client = ModelClient(secondary=FAILOVER_MODEL_NAME, rate_limiter=rate_limiter)
+    return _model_client
+
+
+@register_collector
+def model_client_metrics() -> list:
+    """
+    Exposes the retry, hedging, failover and shedding counters and the circuit state of every model.
+    """
+    if _model_client is None:
+        return []
+    stats = _model_client.stats()
+    lines = format_family('summarizer_model_events_total', 'Model client events by kind.', 'counter',
+                          [({'event': event}, count) for event, count in sorted(stats['counters'].items())])
+    lines.extend(format_family(
+        'summarizer_model_circuit_open', 'Whether the circuit of a model is open (1) or not (0).', 'gauge',
+        [({'model': name}, int(model['circuit'] == CircuitBreaker.OPEN)) for name, model in stats['models'].items()],
+    ))
+    return lines
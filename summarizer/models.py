@@ -1,3 +1,150 @@
+import uuid
+
 from django.db import models
 
-# Create your models here.
+
+class CachedSummary(models.Model):
+    """
+    A generated summary stored in the shared database cache tier, keyed by a hash
+    of the normalized text and the summary parameters.
+    """
+    key = models.CharField(max_length=64, primary_key=True)
+    summary = models.TextField()
+    created_at = models.DateTimeField()
+    accessed_at = models.DateTimeField(db_index=True)
+
+
+class SummaryJob(models.Model):
+    """
+    A summarization request processed in the background. Stores the input, the summary
+    options, the result and the time spent in each stage.
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUSES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=16, choices=STATUSES, default=STATUS_QUEUED, db_index=True)
+    input_type = models.CharField(max_length=8)
+    form = models.CharField(max_length=16)
+    length = models.PositiveSmallIntegerField()
+    language = models.CharField(max_length=64)
+    granularity = models.CharField(max_length=16)
+    text = models.TextField(blank=True)
+    url = models.URLField(max_length=2048, blank=True)
+    file_path = models.CharField(max_length=512, blank=True)
+    file_extension = models.CharField(max_length=8, blank=True)
+    callback_url = models.URLField(max_length=2048, blank=True)
+    summary = models.TextField(blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    extraction_seconds = models.FloatField(null=True, blank=True)
+    summarization_seconds = models.FloatField(null=True, blank=True)
+    # Times a worker claimed the job; more than one means a worker died while running it.
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Last time the worker running the job reported it was still alive.
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    @property
+    def queue_seconds(self):
+        if self.started_at is None:
+            return None
+        return (self.started_at - self.created_at).total_seconds()
+
+
+class RateLimitBucket(models.Model):
+    """
+    State of a token bucket shared by all worker processes. Rows are updated with a
+    compare-and-swap on `version`, so concurrent workers never take the same token twice.
+    """
+    name = models.CharField(max_length=64, primary_key=True)
+    tokens = models.FloatField()
+    updated_at = models.FloatField()
+    version = models.PositiveBigIntegerField(default=0)
+
+
+class StoredSummary(models.Model):
+    """
+    A summary returned to a client, kept so it can be fetched again by id without recomputing it.
+    Records the fingerprint of the extracted text, the summary options, the model that answered,
+    token counts and timings, and whether it is a degraded fallback summary, which is never reused for
+    other texts. A summary is only readable by the client it was returned to; summaries of watched URLs
+    have no client and are readable by anyone holding their id. Rows older than the retention period or
+    beyond the row limit are pruned.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    content_hash = models.CharField(max_length=64, db_index=True)
+    cache_key = models.CharField(max_length=64, db_index=True)
+    input_type = models.CharField(max_length=8)
+    form = models.CharField(max_length=16)
+    length = models.PositiveSmallIntegerField()
+    language = models.CharField(max_length=64)
+    granularity = models.CharField(max_length=16)
+    summary = models.TextField()
+    model = models.CharField(max_length=128, blank=True)
+    input_characters = models.PositiveIntegerField()
+    input_tokens = models.PositiveIntegerField()
+    summary_tokens = models.PositiveIntegerField()
+    extraction_seconds = models.FloatField(null=True, blank=True)
+    summarization_seconds = models.FloatField(null=True, blank=True)
+    degraded = models.BooleanField(default=False)
+    client = models.CharField(max_length=255, blank=True, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+
+class DocumentSignature(models.Model):
+    """
+    MinHash signature of an extracted text that has stored summaries, used to find near-duplicate
+    inputs. The signature is indexed by its locality-sensitive hashing bands in SignatureBand.
+    """
+    content_hash = models.CharField(max_length=64, primary_key=True)
+    signature = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class SignatureBand(models.Model):
+    """
+    One LSH band of a document signature. Documents sharing a band key are near-duplicate candidates.
+    """
+    band_key = models.CharField(max_length=32, db_index=True)
+    document = models.ForeignKey(DocumentSignature, on_delete=models.CASCADE, related_name='bands')
+
+
+class WatchedUrl(models.Model):
+    """
+    A URL whose summary is kept up to date by refreshing it on a schedule. The last extracted text
+    is kept as a list of `[hash, text]` blocks, so a refresh can tell which blocks changed and
+    update the summary from those alone.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    url = models.URLField(max_length=2048)
+    form = models.CharField(max_length=16)
+    length = models.PositiveSmallIntegerField()
+    language = models.CharField(max_length=64)
+    granularity = models.CharField(max_length=16)
+    blocks = models.JSONField(default=list)
+    summary = models.TextField(blank=True)
+    summary_id = models.UUIDField(null=True, blank=True)
+    # Incremental updates since the summary was last generated from the whole text.
+    incremental_updates = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    checked_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    changed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
@@ -0,0 +1,252 @@
+import functools
+import hashlib
+import logging
+import re
+import threading
+import zlib
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import Count
+
+from .metrics import Counter, stage
+from .model_client import note_model
+from .models import DocumentSignature, SignatureBand, StoredSummary
+from .registry import lazy_module
+
+np = lazy_module('numpy')
+
+logger = logging.getLogger(__name__)
+
+# Whether summaries stored for near-identical texts are reused instead of calling the model.
+NEAR_DUPLICATE_ENABLED = getattr(settings, 'SUMMARY_NEAR_DUPLICATE_ENABLED', True)
+# Estimated Jaccard similarity of the word shingles above which a stored summary is reused.
+NEAR_DUPLICATE_THRESHOLD = getattr(settings, 'SUMMARY_NEAR_DUPLICATE_THRESHOLD', 0.9)
+# Texts shorter than this many words are neither indexed nor matched; their similarity is too noisy.
+MIN_WORDS = 50
+# Words per shingle.
+SHINGLE_WORDS = 5
+# MinHash functions, split into BANDS bands of ROWS_PER_BAND values. Texts sharing any band are
+# compared; with 32 bands of 4 rows, pairs at 0.7 similarity are found 99.98% of the time.
+NUM_HASHES = 128
+BANDS = 32
+ROWS_PER_BAND = NUM_HASHES // BANDS
+# Candidates sharing the most bands whose signatures are compared.
+MAX_CANDIDATES = 20
+# Shingles hashed at once, bounding the temporary (NUM_HASHES x chunk) matrix.
+HASH_CHUNK = 8192
+# Signatures of the most recent texts kept by content hash, so the lookup and the indexing of one
+# request compute it once.
+SIGNATURE_CACHE_SIZE = 64
+
+WORD = re.compile(r'\w+', re.UNICODE)
+
+NEAR_DUPLICATE_LOOKUPS = Counter('summarizer_near_duplicate_lookups_total',
+                                 'Near-duplicate lookups by result.', ['result'])
+
+
+class ReusedSummary(str):
+    """
+    A stored summary served for a near-identical text, with the id of its record and the similarity.
+    """
+
+    def __new__(cls, summary: str, source_id, similarity: float):
+        reused = super().__new__(cls, summary)
+        reused.source_id = source_id
+        reused.similarity = similarity
+        return reused
+
+
+@functools.lru_cache(maxsize=None)
+def _hash_parameters():
+    # Multiply-shift hash functions with fixed parameters, so signatures stay comparable across processes.
+    def parameter(label: str) -> int:
+        return int.from_bytes(hashlib.blake2b(label.encode('ascii'), digest_size=8).digest(), 'little')
+
+    multipliers = np.array([parameter(f'a{i}') | 1 for i in range(NUM_HASHES)], dtype=np.uint64)
+    increments = np.array([parameter(f'b{i}') for i in range(NUM_HASHES)], dtype=np.uint64)
+    return multipliers[:, None], increments[:, None]
+
+
+def shingle_hashes(text: str):
+    """
+    Returns the distinct 64-bit hashes of the SHINGLE_WORDS-word shingles of the lowercased text,
+    or None if it has fewer than MIN_WORDS words.
+    """
+    words = WORD.findall(text.lower())
+    if len(words) < MIN_WORDS:
+        return None
+    word_ids = {}
+    hashes = np.array([word_ids.setdefault(word, zlib.crc32(word.encode('utf-8'))) for word in words],
+                      dtype=np.uint64)
+    count = len(words) - SHINGLE_WORDS + 1
+    shingles = np.zeros(count, dtype=np.uint64)
+    for offset in range(SHINGLE_WORDS):
+        # Polynomial combination of the word hashes; uint64 arithmetic wraps around.
+        shingles = shingles * np.uint64(1000003) + hashes[offset:offset + count]
+    return np.unique(shingles)
+
+
+def minhash_signature(text: str):
+    """
+    Computes the MinHash signature of the text: for each of NUM_HASHES hash functions, the smallest
+    hash of any of its shingles. The share of equal values in two signatures estimates the Jaccard
+    similarity of their shingle sets.
+
+    Args:
+        text (str): The extracted text.
+
+    Returns:
+        np.ndarray: NUM_HASHES uint32 values, or None for texts shorter than MIN_WORDS words.
+    """
+    shingles = shingle_hashes(text)
+    if shingles is None:
+        return None
+    multipliers, increments = _hash_parameters()
+    signature = np.full(NUM_HASHES, np.iinfo(np.uint64).max, dtype=np.uint64)
+    for start in range(0, len(shingles), HASH_CHUNK):
+        values = (multipliers * shingles[start:start + HASH_CHUNK] + increments) >> np.uint64(32)
+        np.minimum(signature, values.min(axis=1), out=signature)
+    return signature.astype(np.uint32)
+
+
+def band_keys(signature) -> list:
+    """
+    Returns the LSH band keys of a signature: the band number and a hash of its rows.
+    """
+    return [f"{band:02d}:{hashlib.blake2b(rows.tobytes(), digest_size=8).hexdigest()}"
+            for band, rows in enumerate(signature.reshape(BANDS, ROWS_PER_BAND))]
+
+
+_signatures = OrderedDict()
+_signatures_lock = threading.Lock()
+
+
+def _cached_signature(content_hash: str, text: str):
+    # Keyed on the hash alone: the cache must not keep the texts of the last requests alive.
+    with _signatures_lock:
+        if content_hash in _signatures:
+            _signatures.move_to_end(content_hash)
+            return _signatures[content_hash]
+    signature = minhash_signature(text)
+    with _signatures_lock:
+        _signatures[content_hash] = signature
+        while len(_signatures) > SIGNATURE_CACHE_SIZE:
+            _signatures.popitem(last=False)
+    return signature
+
+
+def similarity(first, second) -> float:
+    """
+    Estimates the Jaccard similarity of two texts from their signatures.
+    """
+    return float(np.count_nonzero(first == second)) / NUM_HASHES
+
+
+def _decode(signature_bytes) -> 'np.ndarray':
+    return np.frombuffer(bytes(signature_bytes), dtype='<u4')
+
+
+def index_document(content_hash: str, text: str):
+    """
+    Adds a text to the near-duplicate index, unless it is already indexed or too short.
+    Indexing is best effort: database errors are logged and ignored.
+
+    Args:
+        content_hash (str): The fingerprint of the text, as computed by `content_fingerprint`.
+        text (str): The extracted text.
+    """
+    if not NEAR_DUPLICATE_ENABLED:
+        return
+    try:
+        if DocumentSignature.objects.filter(pk=content_hash).exists():
+            return
+        with stage('near_duplicate_index'):
+            signature = _cached_signature(content_hash, text)
+        if signature is None:
+            return
+        with transaction.atomic():
+            document = DocumentSignature.objects.create(content_hash=content_hash,
+                                                        signature=signature.astype('<u4').tobytes())
+            SignatureBand.objects.bulk_create(SignatureBand(band_key=key, document=document)
+                                              for key in band_keys(signature))
+    except IntegrityError:
+        pass  # Indexed concurrently by another request.
+    except DatabaseError:
+        logger.warning("Indexing the document for near-duplicate lookup failed", exc_info=True)
+
+
+def find_reusable_summary(text: str, form: str, length: int, language: str, granularity: str):
+    """
+    Looks for a stored summary with the same options of a text that is nearly identical to this
+    one, such as the same article fetched from another URL or exported again with a new timestamp.
+    Texts sharing an LSH band with this one are candidates; the stored summary of the most similar
+    candidate at or above NEAR_DUPLICATE_THRESHOLD is returned; degraded fallback summaries are never
+    reused. The lookup is best effort.
+
+    Args:
+        text (str): The extracted text.
+        form (str): The summary form.
+        length (int): The summary length.
+        language (str): The summary language.
+        granularity (str): The summary granularity.
+
+    Returns:
+        ReusedSummary: The stored summary, or None if there is no close enough match.
+    """
+    if not NEAR_DUPLICATE_ENABLED:
+        return None
+    from .store import content_fingerprint
+
+    with stage('near_duplicate_lookup'):
+        content_hash = content_fingerprint(text)
+        signature = _cached_signature(content_hash, text)
+        if signature is None:
+            return None
+        try:
+            candidates = list(
+                SignatureBand.objects.filter(band_key__in=band_keys(signature))
+                .values('document_id').annotate(shared=Count('id')).order_by('-shared')
+                .values_list('document_id', flat=True)[:MAX_CANDIDATES]
+            )
+            summarized = set(StoredSummary.objects.filter(
+                content_hash__in=candidates, form=form, length=length, language=language, granularity=granularity,
+                degraded=False,
+            ).values_list('content_hash', flat=True))
+            best_hash, best_similarity = None, 0.0
+            for document in DocumentSignature.objects.filter(pk__in=summarized):
+                score = similarity(signature, _decode(document.signature))
+                if score > best_similarity:
+                    best_hash, best_similarity = document.content_hash, score
+            stored = None
+            if best_hash is not None and best_similarity >= NEAR_DUPLICATE_THRESHOLD:
+                stored = StoredSummary.objects.filter(
+                    content_hash=best_hash, form=form, length=length, language=language, granularity=granularity,
+                    degraded=False,
+                ).order_by('-created_at').first()
+        except DatabaseError:
+            logger.warning("Near-duplicate lookup failed", exc_info=True)
+            return None
+
+    if stored is None:
+        NEAR_DUPLICATE_LOOKUPS.inc(result='miss')
+        return None
+    NEAR_DUPLICATE_LOOKUPS.inc(result='reused')
+    note_model('near_duplicate')
+    return ReusedSummary(stored.summary, stored.id, best_similarity)
+
+
+def prune_signatures() -> int:
+    """
+    Deletes the signatures of texts that no longer have any stored summary.
+
+    Returns:
+        int: The number of deleted signatures.
+    """
+    try:
+        orphans = DocumentSignature.objects.exclude(content_hash__in=StoredSummary.objects.values('content_hash'))
+        return orphans.delete()[1].get(DocumentSignature._meta.label, 0)
+    except DatabaseError:
+        logger.warning("Pruning near-duplicate signatures failed", exc_info=True)
+        return 0
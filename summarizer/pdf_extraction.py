@@ -0,0 +1,171 @@
+import io
+import mmap
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from .registry import lazy_module
+
+PyPDF2 = lazy_module('PyPDF2')
+
+# Number of processes extracting PDF pages in parallel.
+PDF_WORKERS = min(4, os.cpu_count() or 1)
+# Number of tasks each worker process gets; every task re-opens the document, so fewer is cheaper.
+TASKS_PER_WORKER = 4
+# Separates the pages of extracted PDF text, so cleaning can tell page headers and footers from body lines.
+PAGE_BREAK = "\f"
+# Documents with at most this many pages are extracted in the calling process.
+PARALLEL_PAGE_THRESHOLD = 32
+# Worker processes are spawned rather than forked: forking a server process that runs gRPC and
+# database client threads can copy a held lock into the child and deadlock it.
+START_METHOD = 'spawn'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_pdf_executor() -> ProcessPoolExecutor:
+    """
+    Returns the process pool used for page extraction, creating it on first use.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(max_workers=PDF_WORKERS,
+                                                mp_context=multiprocessing.get_context(START_METHOD))
+    return _executor
+
+
+def _disk_path(file):
+    # The path of a file already on disk: a spooled Django upload or a file opened by path.
+    if hasattr(file, 'temporary_file_path'):
+        return file.temporary_file_path()
+    name = getattr(file, 'name', None)
+    if isinstance(name, str) and os.path.isfile(name):
+        return name
+    return None
+
+
+def _in_memory(file) -> bool:
+    return isinstance(getattr(file, 'file', file), io.BytesIO)
+
+
+@contextmanager
+def spooled_path(file):
+    """
+    Yields a path on disk holding the contents of the file. Files already on disk, such as uploads
+    Django has spooled, are used in place; other file-like objects are copied to a temporary file
+    that is removed afterwards.
+
+    Args:
+        file: A file-like object or an uploaded file.
+
+    Yields:
+        str: The path of the file on disk.
+    """
+    path = _disk_path(file)
+    if path is not None:
+        yield path
+        return
+
+    file.seek(0)
+    spool = tempfile.NamedTemporaryFile(suffix='.pdf', delete=False)
+    try:
+        with spool:
+            shutil.copyfileobj(file, spool)
+        yield spool.name
+    finally:
+        os.remove(spool.name)
+
+
+@contextmanager
+def _mapped_reader(path: str):
+    with open(path, 'rb') as handle:
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield PyPDF2.PdfReader(mapped)
+
+
+def _iter_page_range(reader, start: int, stop: int):
+    pages = reader.pages
+    for index in range(start, stop):
+        yield pages[index].extract_text() or ''
+
+
+def _extract_page_range(path: str, start: int, stop: int) -> list:
+    """
+    Extracts the text of pages [start, stop) of the PDF at the path. Runs in a worker process.
+    """
+    with _mapped_reader(path) as reader:
+        return list(_iter_page_range(reader, start, stop))
+
+
+def _iter_serial(path: str):
+    with _mapped_reader(path) as reader:
+        yield from _iter_page_range(reader, 0, len(reader.pages))
+
+
+def _iter_parallel(path: str, page_count: int):
+    batch_size = -(-page_count // (PDF_WORKERS * TASKS_PER_WORKER))
+    executor = get_pdf_executor()
+    futures = [
+        executor.submit(_extract_page_range, path, start, min(start + batch_size, page_count))
+        for start in range(0, page_count, batch_size)
+    ]
+    try:
+        for future in futures:
+            yield from future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def _limit(pages, max_chars: int):
+    produced = 0
+    try:
+        for page_text in pages:
+            if max_chars is not None and produced + len(page_text) >= max_chars:
+                yield page_text[:max_chars - produced]
+                return
+            produced += len(page_text)
+            yield page_text
+    finally:
+        pages.close()
+
+
+def iter_pdf_pages(file, max_chars: int = None):
+    """
+    Yields the text of each page of a PDF in order. Large documents are memory-mapped and
+    extracted in batches of pages across a process pool; extraction stops as soon as
+    `max_chars` characters have been produced. In-memory uploads, which are below Django's
+    upload spooling threshold, and documents with few pages are read in place rather than
+    copied to disk.
+
+    Args:
+        file: A file-like object representing the PDF file.
+        max_chars (int): The character budget, or None to extract every page.
+
+    Yields:
+        str: The text of consecutive pages, the last one truncated to the budget.
+    """
+    if _disk_path(file) is None:
+        file.seek(0)
+        reader = PyPDF2.PdfReader(file)
+        page_count = len(reader.pages)
+        if PDF_WORKERS == 1 or page_count <= PARALLEL_PAGE_THRESHOLD or _in_memory(file):
+            yield from _limit(_iter_page_range(reader, 0, page_count), max_chars)
+            return
+
+    with spooled_path(file) as path:
+        with _mapped_reader(path) as reader:
+            page_count = len(reader.pages)
+
+        if PDF_WORKERS > 1 and page_count > PARALLEL_PAGE_THRESHOLD:
+            pages = _iter_parallel(path, page_count)
+        else:
+            pages = _iter_serial(path)
+        yield from _limit(pages, max_chars)
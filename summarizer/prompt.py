@@ -0,0 +1,188 @@
+import math
+import re
+from collections import Counter
+
+from django.conf import settings
+
+from .metrics import stage
+from .pdf_extraction import PAGE_BREAK
+from .utils import get_model
+
+# Rough number of characters per model token, used to budget inputs without a round trip to the tokenizer.
+CHARS_PER_TOKEN = 4
+# Largest input, in tokens, passed on for summarization; longer texts are reduced by extractive pre-selection.
+INPUT_TOKEN_BUDGET = getattr(settings, 'SUMMARY_INPUT_TOKEN_BUDGET', 100000)
+# Estimates within this factor of the budget are confirmed with the model's own tokenizer.
+EXACT_COUNT_MARGIN = 0.2
+# Seconds allowed for a tokenizer call before falling back to the estimate.
+COUNT_TOKENS_TIMEOUT = 5
+
+HYPHENATED_BREAK = re.compile(r'(\w)-\n\s*(\w)')
+PAGE_NUMBER_LINE = re.compile(r'^\s*(?:-\s*)?(?:page\s+)?\d+(?:\s*(?:/|of)\s*\d+)?(?:\s*-)?\s*$', re.IGNORECASE)
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+WORD = re.compile(r'\w+', re.UNICODE)
+# Lines longer than this are content and are never dropped as repeated headers.
+MAX_HEADER_LINE_LENGTH = 120
+# Short lines occurring at least this many times are treated as running headers or footers.
+HEADER_MIN_OCCURRENCES = 3
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the number of model tokens in the text.
+
+    Args:
+        text (str): The text to measure.
+
+    Returns:
+        int: The estimated token count.
+    """
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def count_tokens(text: str) -> int:
+    """
+    Counts the tokens of the text for the summarization model, falling back to the
+    estimate if the tokenizer cannot be reached within COUNT_TOKENS_TIMEOUT seconds.
+
+    Args:
+        text (str): The text to measure.
+
+    Returns:
+        int: The token count.
+    """
+    try:
+        return get_model().count_tokens(text, request_options={'timeout': COUNT_TOKENS_TIMEOUT}).total_tokens
+    except Exception:
+        return estimate_tokens(text)
+
+
+def fits_budget(text: str, budget: int) -> bool:
+    """
+    Checks whether the text fits the token budget. The cheap estimate decides clear cases;
+    only texts close to the budget are counted with the model's tokenizer.
+
+    Args:
+        text (str): The text to measure.
+        budget (int): The token budget.
+
+    Returns:
+        bool: True if the text fits the budget.
+    """
+    estimate = estimate_tokens(text)
+    if estimate <= budget * (1 - EXACT_COUNT_MARGIN):
+        return True
+    if estimate > budget * (1 + EXACT_COUNT_MARGIN):
+        return False
+    return count_tokens(text) <= budget
+
+
+def strip_extraction_noise(text: str) -> str:
+    """
+    Removes artifacts of PDF and page extraction: words hyphenated across line breaks are
+    joined and, in multi-page extractions separated by PAGE_BREAK, page-number lines at the top
+    or bottom of pages are dropped and short lines repeated on many pages, such as running
+    headers and footers, are kept only once. Numeric lines elsewhere, such as table cells, and
+    repeated lines of single-page text, such as table rows or refrains, are content and are kept.
+
+    Args:
+        text (str): The extracted text.
+
+    Returns:
+        str: The cleaned text.
+    """
+    text = HYPHENATED_BREAK.sub(r'\1\2', text)
+
+    pages = [[" ".join(line.split()) for line in page.split("\n")] for page in text.split(PAGE_BREAK)]
+    multi_page = len(pages) > 1
+    # Only pages repeat headers and footers; without page breaks, repeated lines are content.
+    occurrences = Counter(line.lower() for page in pages for line in page
+                          if line and len(line) <= MAX_HEADER_LINE_LENGTH) if multi_page else Counter()
+
+    def is_running_line(line: str) -> bool:
+        return occurrences.get(line.lower(), 0) >= HEADER_MIN_OCCURRENCES
+
+    lines = []
+    for page_lines in pages:
+        if multi_page:
+            # Page numbers sit on the first or last line of a page, past any running header or footer.
+            filled = [index for index, line in enumerate(page_lines) if line and not is_running_line(line)]
+            edges = {filled[0], filled[-1]} if filled else set()
+            page_lines = [line for index, line in enumerate(page_lines)
+                          if index not in edges or not PAGE_NUMBER_LINE.match(line)]
+        lines.extend(page_lines)
+
+    kept = []
+    seen = set()
+    for line in lines:
+        key = line.lower()
+        if is_running_line(line):
+            if key in seen:
+                continue
+            seen.add(key)
+        kept.append(line)
+    return re.sub(r'\n{3,}', "\n\n", "\n".join(kept)).strip()
+
+
+def select_sentences(text: str, budget: int) -> str:
+    """
+    Reduces the text to the budget by keeping its most informative sentences. Sentences are
+    scored by the TF-IDF weight of their words, normalized by the square root of the sentence
+    length so long sentences are not favoured outright; every sentence is treated as a
+    document, and the best ones are kept in their original order.
+
+    Args:
+        text (str): The text to reduce.
+        budget (int): The token budget of the result.
+
+    Returns:
+        str: The selected sentences.
+    """
+    sentences = [sentence for sentence in SENTENCE_SPLIT.split(text) if sentence.strip()]
+    tokenized = [[word.lower() for word in WORD.findall(sentence)] for sentence in sentences]
+    document_frequency = Counter(word for words in tokenized for word in set(words))
+    total = len(sentences)
+
+    scores = []
+    for index, words in enumerate(tokenized):
+        if not words:
+            scores.append((0.0, index))
+            continue
+        term_frequency = Counter(words)
+        weight = sum(count * math.log(total / document_frequency[word]) for word, count in term_frequency.items())
+        scores.append((weight / math.sqrt(len(words)), index))
+
+    selected = {}
+    used = 0
+    for _, index in sorted(scores, reverse=True):
+        sentence = sentences[index]
+        cost = estimate_tokens(sentence)
+        if used + cost > budget:
+            if cost <= budget or used + 1 >= budget:
+                continue
+            # A sentence larger than the whole budget, such as an unpunctuated transcript,
+            # is cut to the space left instead of being dropped.
+            sentence = sentence[:(budget - used - 1) * CHARS_PER_TOKEN]
+            cost = estimate_tokens(sentence)
+        selected[index] = sentence
+        used += cost
+    return " ".join(selected[index] for index in sorted(selected))
+
+
+@stage('prepare')
+def prepare_text(text: str, budget: int = INPUT_TOKEN_BUDGET) -> str:
+    """
+    Prepares extracted text for the model: extraction noise and the running headers of
+    multi-page documents are removed and, if the text still exceeds the token budget, it is reduced by extractive sentence selection.
+
+    Args:
+        text (str): The extracted text.
+        budget (int): The token budget of the prepared text.
+
+    Returns:
+        str: The text to summarize.
+    """
+    text = strip_extraction_noise(text)
+    if not fits_budget(text, budget):
+        text = select_sentences(text, budget)
+    return text
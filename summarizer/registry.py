@@ -0,0 +1,63 @@
+import importlib
+import threading
+import time
+
+# Seconds spent importing each lazily loaded module in this process, by module name.
+LOAD_TIMES = {}
+
+_lock = threading.RLock()
+
+
+class LazyModule:
+    """
+    Stand-in for a heavy module that is imported on first attribute access. Lets request paths
+    that never need a library (for example audio or PDF support) skip its import cost entirely.
+
+    Args:
+        name (str): The dotted name of the module.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            with _lock:
+                if self._module is None:
+                    started = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    LOAD_TIMES[self._name] = time.perf_counter() - started
+                    self._module = module
+        return self._module
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+    def __repr__(self):
+        state = 'loaded' if self.is_loaded else 'not loaded'
+        return f"<LazyModule {self._name} ({state})>"
+
+
+# Registry of the lazily loaded modules, by module name.
+LAZY_MODULES = {}
+
+
+def lazy_module(name: str) -> LazyModule:
+    """
+    Returns the shared lazy stand-in for the module, registering it on first request.
+
+    Args:
+        name (str): The dotted name of the module.
+
+    Returns:
+        LazyModule: The stand-in, importing the module on first attribute access.
+    """
+    with _lock:
+        if name not in LAZY_MODULES:
+            LAZY_MODULES[name] = LazyModule(name)
+        return LAZY_MODULES[name]
@@ -1,6 +1,26 @@
+import itertools
+
 from rest_framework import serializers
 
+from .utils import is_public_url
+
+
+class OneOrManyField(serializers.ListField):
+    """
+    Accepts a single value or a list of values, as a JSON array or a repeated form field,
+    and returns the distinct values as a list in their original order.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, (str, int)) or not hasattr(data, '__iter__'):
+            data = [data]
+        return list(dict.fromkeys(super().to_internal_value(data)))
+
+
 class SummarizationSerializer(serializers.Serializer):
+    # Largest number of summary variants (combinations of form, length, language and granularity) per request.
+    MAX_VARIANTS = 12
+    VARIANT_FIELDS = ('form', 'length', 'language', 'granularity')
     INPUT_TYPES = [('text', 'Text'), ('file', 'File'), ('url', 'URL')]
     FORM_TYPES = [('text', 'Text'), ('bullet', 'Bullet Points')]
     LANGUAGES = [
@@ -47,13 +67,14 @@ class SummarizationSerializer(serializers.Serializer):
     GRANULARITIES = [('detailed', 'Detailed'), ('general', 'General')]
 
     input_type = serializers.ChoiceField(choices=INPUT_TYPES)
-    form = serializers.ChoiceField(choices=FORM_TYPES)
-    length = serializers.IntegerField(min_value=1, max_value=30)
-    language = serializers.ChoiceField(choices=LANGUAGES)
-    granularity = serializers.ChoiceField(choices=GRANULARITIES)
+    form = OneOrManyField(child=serializers.ChoiceField(choices=FORM_TYPES), min_length=1)
+    length = OneOrManyField(child=serializers.IntegerField(min_value=1, max_value=30), min_length=1)
+    language = OneOrManyField(child=serializers.ChoiceField(choices=LANGUAGES), min_length=1)
+    granularity = OneOrManyField(child=serializers.ChoiceField(choices=GRANULARITIES), min_length=1)
     text = serializers.CharField(required=False, allow_blank=True)
     file = serializers.FileField(required=False)
     url = serializers.URLField(required=False, allow_blank=True)
+    stream = serializers.BooleanField(required=False, default=False)
 
     def validate(self, data):
         input_type = data.get('input_type')
@@ -65,4 +86,72 @@ class SummarizationSerializer(serializers.Serializer):
         if input_type == 'url' and not data.get('url'):
             raise serializers.ValidationError("A valid URL is required when 'input_type' is 'url'.")
 
-        return data
\ No newline at end of file
+        # Every combination of the requested options is one variant; the option fields keep the first one.
+        variants = [dict(zip(self.VARIANT_FIELDS, values))
+                    for values in itertools.product(*(data[field] for field in self.VARIANT_FIELDS))]
+        if len(variants) > self.MAX_VARIANTS:
+            raise serializers.ValidationError(
+                f"{len(variants)} summary variants were requested; the limit is {self.MAX_VARIANTS}.")
+        if len(variants) > 1 and data.get('stream'):
+            raise serializers.ValidationError("Streaming supports a single summary variant.")
+        data.update(variants[0])
+        data['variants'] = variants
+
+        return data
+
+
+class SummarizationJobSerializer(SummarizationSerializer):
+    MAX_VARIANTS = 1
+
+    callback_url = serializers.URLField(required=False, allow_blank=True)
+
+    def validate_callback_url(self, value):
+        if value and not is_public_url(value):
+            raise serializers.ValidationError("The callback URL must be a public http or https URL.")
+        return value
+
+
+class BatchItemSerializer(SummarizationSerializer):
+    MAX_VARIANTS = 1
+
+
+class BatchSummarizationSerializer(serializers.Serializer):
+    MAX_ITEMS = 1000
+
+    items = serializers.ListField(child=serializers.DictField(), min_length=1, max_length=MAX_ITEMS)
+
+
+class SummaryExportSerializer(serializers.Serializer):
+    FORMATS = [('docx', 'DOCX'), ('pdf', 'PDF'), ('md', 'Markdown'), ('txt', 'Plain text')]
+    MAX_CHARACTERS = 100000
+
+    format = serializers.ChoiceField(choices=FORMATS, default='docx')
+    summary = serializers.CharField(required=False, default='', allow_blank=True, trim_whitespace=False,
+                                    max_length=MAX_CHARACTERS)
+
+
+class BulkSummaryExportSerializer(serializers.Serializer):
+    MAX_ITEMS = 1000
+
+    format = serializers.ChoiceField(choices=SummaryExportSerializer.FORMATS, default='docx')
+    summaries = serializers.ListField(
+        child=serializers.CharField(allow_blank=True, trim_whitespace=False,
+                                    max_length=SummaryExportSerializer.MAX_CHARACTERS),
+        required=False, max_length=MAX_ITEMS)
+    summary_ids = serializers.ListField(child=serializers.UUIDField(), required=False, max_length=MAX_ITEMS)
+
+    def validate(self, data):
+        count = len(data.get('summaries', [])) + len(data.get('summary_ids', []))
+        if not count:
+            raise serializers.ValidationError("Provide 'summaries' or 'summary_ids' to export.")
+        if count > self.MAX_ITEMS:
+            raise serializers.ValidationError(f"At most {self.MAX_ITEMS} summaries can be exported at once.")
+        return data
+
+
+class WatchedUrlSerializer(serializers.Serializer):
+    url = serializers.URLField(max_length=2048)
+    form = serializers.ChoiceField(choices=SummarizationSerializer.FORM_TYPES)
+    length = serializers.IntegerField(min_value=1, max_value=30)
+    language = serializers.ChoiceField(choices=SummarizationSerializer.LANGUAGES)
+    granularity = serializers.ChoiceField(choices=SummarizationSerializer.GRANULARITIES)
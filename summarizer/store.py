@@ -0,0 +1,186 @@
+import hashlib
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+from .cache import normalize_text
+from .metrics import current_timings
+from .models import StoredSummary
+from .near_duplicates import index_document, prune_signatures
+from .prompt import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Whether summaries returned by /api/ are stored for later retrieval by id.
+STORE_ENABLED = getattr(settings, 'SUMMARY_STORE_ENABLED', True)
+# Stored summaries are deleted once they are older than STORE_RETENTION_DAYS days, and the oldest
+# rows are deleted whenever there are more than STORE_MAX_ROWS.
+STORE_RETENTION_DAYS = getattr(settings, 'SUMMARY_STORE_RETENTION_DAYS', 30)
+STORE_MAX_ROWS = getattr(settings, 'SUMMARY_STORE_MAX_ROWS', 10000)
+# Number of stored summaries between two pruning passes in each process.
+PRUNE_EVERY = 100
+
+_writes = 0
+_writes_lock = threading.Lock()
+
+
+def content_fingerprint(text: str) -> str:
+    """
+    Returns the SHA-256 of the normalized extracted text, shared by all summaries of the same content.
+    """
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+def _extraction_seconds():
+    # Extraction is timed by the ingest and extract_* stages of the current request.
+    timings = current_timings()
+    seconds = [value for name, value in timings.items() if name == 'ingest' or name.startswith('extract_')]
+    return sum(seconds) if seconds else None
+
+
+def store_summary(cache_key: str, text: str, summary: str, input_type: str, form: str, length: int,
+                  language: str, granularity: str, models: list, summarization_seconds: float = None,
+                  client: str = '', index: bool = True):
+    """
+    Stores a summary returned to a client and adds its text to the near-duplicate index. Degraded
+    fallback summaries, and summaries stored with `index` False, are stored for retrieval but not
+    indexed. A summary identical to the last one stored for the same text, options and client is not
+    stored twice; its existing record is returned instead. Storing is best effort: a failing query is
+    logged and None is returned.
+
+    Args:
+        cache_key (str): The key built by `make_cache_key` for the text and options.
+        text (str): The extracted text that was summarized.
+        summary (str): The summary.
+        input_type (str): The input type of the request ('text' or 'file').
+        form (str): The summary form.
+        length (int): The summary length.
+        language (str): The summary language.
+        granularity (str): The summary granularity.
+        models (list): The models or engines that answered, empty for a summary served from the cache.
+        summarization_seconds (float): Time spent producing the summary.
+        client (str): The identity of the requesting client (see `admission.client_identity`), the only
+                      one allowed to read the summary back; empty for summaries readable by anyone.
+        index (bool): Whether the summary may be reused for near-identical texts.
+
+    Returns:
+        StoredSummary: The stored record, or None if the store is disabled or unavailable.
+    """
+    if not STORE_ENABLED:
+        return None
+    try:
+        latest = StoredSummary.objects.filter(cache_key=cache_key, client=client).order_by('-created_at').first()
+        if latest is not None and latest.summary == summary:
+            return latest
+        content_hash = content_fingerprint(text)
+        stored = StoredSummary.objects.create(
+            content_hash=content_hash,
+            cache_key=cache_key,
+            input_type=input_type,
+            form=form,
+            length=length,
+            language=language,
+            granularity=granularity,
+            summary=summary,
+            model=",".join(models),
+            input_characters=len(text),
+            input_tokens=estimate_tokens(text),
+            summary_tokens=estimate_tokens(summary),
+            extraction_seconds=_extraction_seconds(),
+            summarization_seconds=summarization_seconds,
+            degraded=getattr(summary, 'degraded', False),
+            client=client,
+        )
+    except DatabaseError:
+        logger.warning("Storing the summary failed", exc_info=True)
+        return None
+    if index and getattr(summary, 'cacheable', True):
+        index_document(content_hash, text)
+
+    global _writes
+    with _writes_lock:
+        _writes += 1
+        prune = _writes % PRUNE_EVERY == 0
+    if prune:
+        prune_summaries()
+    return stored
+
+
+def _readable_by(client: str):
+    # Summaries stored without a client are readable by anyone holding their id.
+    return StoredSummary.objects.filter(client__in=[client, ''])
+
+
+def get_stored_summary(summary_id, client: str):
+    """
+    Returns the stored summary with the id, or None if it does not exist, has been pruned
+    or was returned to another client.
+    """
+    return _readable_by(client).filter(pk=summary_id).first()
+
+
+def missing_summary_ids(summary_ids: list, client: str) -> list:
+    """
+    Returns the ids, among the given ones, of summaries the client cannot read: those that
+    do not exist, have been pruned or were returned to another client.
+    """
+    found = set(_readable_by(client).filter(pk__in=summary_ids).values_list('pk', flat=True))
+    return [summary_id for summary_id in summary_ids if summary_id not in found]
+
+
+def iter_stored_summaries(summary_ids: list, client: str):
+    """
+    Yields the stored summaries with the ids readable by the client, fetching them from the database in batches.
+    """
+    yield from _readable_by(client).filter(pk__in=summary_ids).only('id', 'summary').iterator(chunk_size=100)
+
+
+def prune_summaries() -> int:
+    """
+    Deletes stored summaries older than the retention period and the oldest ones above STORE_MAX_ROWS,
+    and the near-duplicate signatures of texts left without any summary.
+
+    Returns:
+        int: The number of deleted summaries.
+    """
+    try:
+        deleted = StoredSummary.objects.filter(
+            created_at__lt=timezone.now() - timedelta(days=STORE_RETENTION_DAYS)
+        ).delete()[0]
+        excess = list(StoredSummary.objects.order_by('-created_at').values_list('pk', flat=True)[STORE_MAX_ROWS:])
+        if excess:
+            deleted += StoredSummary.objects.filter(pk__in=excess).delete()[0]
+    except DatabaseError:
+        logger.warning("Pruning stored summaries failed", exc_info=True)
+        return 0
+    if deleted:
+        prune_signatures()
+    return deleted
+
+
+def serialize_stored_summary(stored: StoredSummary) -> dict:
+    """
+    Builds the representation of a stored summary returned by the API.
+    """
+    return {
+        'id': str(stored.id),
+        'summary': stored.summary,
+        'input_type': stored.input_type,
+        'form': stored.form,
+        'length': stored.length,
+        'language': stored.language,
+        'granularity': stored.granularity,
+        'content_hash': stored.content_hash,
+        'model': stored.model,
+        'input_characters': stored.input_characters,
+        'input_tokens': stored.input_tokens,
+        'summary_tokens': stored.summary_tokens,
+        'extraction_seconds': stored.extraction_seconds,
+        'summarization_seconds': stored.summarization_seconds,
+        'degraded': stored.degraded,
+        'created_at': stored.created_at.isoformat(),
+    }
@@ -1,3 +1,1348 @@
-from django.test import TestCase
+import hashlib
+import io
+import json
+import mmap
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import bs4
+import docx
+import requests
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from django.core.signals import request_started
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from google.api_core import exceptions as api_exceptions
+from reportlab.pdfgen import canvas
+
+from benchmarks.fake_model import FakeModelServer, fake_summary
+
+from . import admission, docx_extraction, fetch
+from .admission import AdmissionController, AdmissionQueue, AdmissionRejected, ClientQuotas
+from .async_utils import extract_text_from_url_async
+from .backends import DegradedSummary, ExtractiveBackend, RoutingBackend, fallback_summary
+from .batch import BatchSummarizer
+from .cache import DatabaseCacheBackend, LRUCacheBackend, SummaryCache, get_summary_cache, make_cache_key
+from .chunking import split_into_chunks, summarize_document
+from .docx_extraction import MC_FALLBACK, W, iter_docx_blocks, iter_part_blocks
+from .export import export_archive, export_summary
+from .extraction_cache import ExtractionDiskCache, extract_cached, extraction_key
+from .html_extraction import extract_main_text
+from .ingestion import ingest_upload
+from .jobs import JOB_MAX_ATTEMPTS, JOB_STALE_SECONDS, JobHeartbeat, claim_next_job, extract_job_text, \
+    process_job, reclaim_stale_jobs, send_callback, serialize_job, start_worker_pool
+from .management.commands.startup_report import BOOT_SCRIPT
+from .metrics import REGISTRY, STAGE_ERRORS, STAGE_SECONDS, Histogram, stage
+from .model_client import CircuitBreaker, ModelClient, ModelUnavailableError, SummaryGenerationError, \
+    get_generative_model
+from .models import DocumentSignature, StoredSummary, SummaryJob, WatchedUrl
+from .near_duplicates import find_reusable_summary, minhash_signature, prune_signatures, similarity
+from .pdf_extraction import PAGE_BREAK, START_METHOD, iter_pdf_pages
+from .prompt import estimate_tokens, prepare_text, select_sentences, strip_extraction_noise
+from .registry import LAZY_MODULES, LOAD_TIMES, LazyModule, lazy_module
+from .store import content_fingerprint, prune_summaries, store_summary
+from .transcription import TranscriptionBackend, iter_wav_segments, merge_transcripts, transcribe_wav
+from .utils import ExtractionError, SummaryStreamFormatter, extract_text_from_docx, extract_text_from_pdf, \
+    extract_text_from_url, format_summary
+from .variants import VariantSummarizer
+from .watch import diff_blocks, refresh_watch
+
+REPLY = "A short summary."
+OPTIONS = {'form': 'text', 'length': 2, 'language': 'English', 'granularity': 'general'}
+
+
+def setUpModule():
+    # Tests drive jobs directly; a worker pool started by the first test request would race them.
+    request_started.disconnect(start_worker_pool)
+
+
+def article_page(paragraphs: int) -> str:
+    body = "".join(f"<div><p>Paragraph number {index} has enough words to count as article content.</p></div>"
+                   for index in range(paragraphs))
+    return f"<html><body><nav><a href='/'>Home</a></nav><article>{body}</article><footer>Legal</footer></body></html>"
+
+
+def article_text(words: int, seed: str = 'river') -> str:
+    return " ".join(f"{seed}{index % 7} flows past stone {index} near the old mill." for index in range(words // 8))
+
+
+def pdf_document(pages: int) -> bytes:
+    buffer = io.BytesIO()
+    document = canvas.Canvas(buffer)
+    for page in range(pages):
+        document.drawString(72, 720, f"Text of page {page}.")
+        document.showPage()
+    document.save()
+    return buffer.getvalue()
+
+
+def wav_recording(parts: list, rate: int = 8000, channels: int = 1) -> io.BytesIO:
+    """
+    Builds a 16-bit WAV file from `(seconds, loud)` parts: a square wave when loud, else silence.
+    """
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        for seconds, loud in parts:
+            frames = int(seconds * rate)
+            sample = (8000).to_bytes(2, 'little', signed=True) if loud else bytes(2)
+            low = (-8000).to_bytes(2, 'little', signed=True) if loud else bytes(2)
+            wav.writeframes(b"".join((sample if index % 20 < 10 else low) * channels for index in range(frames)))
+    buffer.seek(0)
+    return buffer
+
+
+def http_response(status: int, body: bytes = b'', headers: dict = None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    response.raw = io.BytesIO(body)
+    response.encoding = 'utf-8'
+    return response
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeModel:
+    """
+    Stands in for the Gemini model: answers every prompt with `reply`, or raises `error`.
+    """
+
+    def __init__(self, reply: str = REPLY, error: Exception = None):
+        self.reply = reply
+        self.error = error
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def _answer(self, prompt):
+        with self._lock:
+            self.prompts.append(prompt)
+        if self.error is not None:
+            raise self.error
+        return FakeResponse(self.reply)
+
+    def generate_content(self, prompt, stream=False, request_options=None):
+        response = self._answer(prompt)
+        if stream:
+            # Cut the reply mid-word, as the real stream does.
+            return iter([FakeResponse(response.text[start:start + 5]) for start in range(0, len(response.text), 5)])
+        return response
+
+    async def generate_content_async(self, prompt, request_options=None):
+        return self._answer(prompt)
+
+
+class ModelTestMixin:
+    """
+    Replaces the model with a FakeModel and gives every test its own model client, summary cache
+    and admission controller, so circuits, cached summaries and quotas do not leak between tests.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.model = FakeModel()
+        self.models = {}
+        patches = [
+            mock.patch('summarizer.model_client.get_generative_model',
+                       side_effect=lambda name=None: self.models.get(name, self.model)),
+            mock.patch('summarizer.model_client.BACKOFF_BASE_SECONDS', 0.001),
+            mock.patch('summarizer.model_client._model_client', ModelClient(hedging=False)),
+            mock.patch('summarizer.cache._summary_cache', SummaryCache([LRUCacheBackend()])),
+            mock.patch('summarizer.admission._admission_controller', AdmissionController()),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def fail_model(self, fallback: bool = False):
+        self.model.error = api_exceptions.InvalidArgument('bad prompt')
+        patcher = mock.patch('summarizer.backends.EXTRACTIVE_FALLBACK', fallback)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def summarize(self, text: str, **options):
+        return self.client.post('/api/', dict(OPTIONS, input_type='text', text=text, **options))
+
+
+class SummaryCacheTests(TestCase):
+    def test_slower_tier_hit_is_copied_to_faster_tiers(self):
+        memory, database = LRUCacheBackend(), DatabaseCacheBackend()
+        database.set('key', 'summary')
+        self.assertEqual(SummaryCache([memory, database]).get('key'), 'summary')
+        self.assertEqual(memory.get('key'), 'summary')
+
+    def test_least_recently_used_entry_is_evicted(self):
+        memory = LRUCacheBackend(max_entries=2)
+        memory.set('a', 'first')
+        memory.set('b', 'second')
+        memory.get('a')
+        memory.set('c', 'third')
+        self.assertIsNone(memory.get('b'))
+        self.assertEqual(memory.get('a'), 'first')
+
+    def test_expired_database_entry_is_a_miss(self):
+        database = DatabaseCacheBackend(ttl=60)
+        database.set('key', 'summary')
+        with mock.patch('summarizer.cache.timezone.now', return_value=timezone.now() + timedelta(seconds=61)):
+            self.assertIsNone(database.get('key'))
+
+    def test_degraded_summaries_and_failures_are_not_cached(self):
+        cache = SummaryCache([LRUCacheBackend()])
+        self.assertEqual(cache.get_or_generate('degraded', lambda: DegradedSummary('fallback')), 'fallback')
+        self.assertIsNone(cache.get('degraded'))
+
+        def fail():
+            raise SummaryGenerationError("Error generating summary: down")
+
+        with self.assertRaises(SummaryGenerationError):
+            cache.get_or_generate('failed', fail)
+        self.assertIsNone(cache.get('failed'))
+
+    def test_cache_key_ignores_whitespace_but_not_options(self):
+        key = make_cache_key("Some  text\n", **OPTIONS)
+        self.assertEqual(key, make_cache_key("Some text", **OPTIONS))
+        self.assertNotEqual(key, make_cache_key("Some text", **dict(OPTIONS, form='bullet')))
+
+
+class ChunkingTests(ModelTestMixin, TestCase):
+    def long_document(self) -> str:
+        return "\n\n".join(f"Section {index}: " + article_text(64, seed=f's{index}-') for index in range(100))
+
+    def test_chunks_fit_the_budget_and_keep_the_order(self):
+        paragraphs = [f"Paragraph {index} says something different from the others." for index in range(40)]
+        chunks = split_into_chunks("\n\n".join(paragraphs), max_tokens=50)
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(chunk) <= 200 for chunk in chunks))
+        self.assertEqual("\n\n".join(chunks).split("\n\n"), paragraphs)
+
+    def test_oversized_sentence_is_cut(self):
+        chunks = split_into_chunks("x" * 1000, max_tokens=50)
+        self.assertEqual("".join(chunks), "x" * 1000)
+        self.assertTrue(all(len(chunk) <= 200 for chunk in chunks))
+
+    def test_long_document_is_condensed_before_the_summary(self):
+        text = self.long_document()
+        self.assertEqual(summarize_document(text=text, **OPTIONS), REPLY)
+        chunk_prompts = [prompt for prompt in self.model.prompts if prompt.startswith("This is one part")]
+        self.assertEqual(len(chunk_prompts), len(split_into_chunks(prepare_text(text))))
+        self.assertGreater(len(chunk_prompts), 1)
+        self.assertTrue(self.model.prompts[-1].startswith("Summarize the given text"))
+
+    def test_failed_condensing_without_fallback_raises(self):
+        self.fail_model()
+        with self.assertRaises(SummaryGenerationError):
+            summarize_document(text=self.long_document(), **OPTIONS)
+
+
+class AsyncSummarizeTests(ModelTestMixin, TestCase):
+    def test_text_is_summarized_through_the_async_model_call(self):
+        response = self.client.post('/api/async/', dict(OPTIONS, input_type='text', text="A document to summarize."))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['summary'], REPLY)
+        self.assertEqual(len(self.model.prompts), 1)
+
+    def test_model_failure_is_answered_with_503(self):
+        self.fail_model()
+        response = self.client.post('/api/async/', dict(OPTIONS, input_type='text', text="A document."))
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+
+    def test_unfetchable_urls_give_the_same_error_as_the_sync_path(self):
+        for url in ('http://[::1/', 'ftp://example.com/'):
+            with self.subTest(url=url):
+                text = async_to_sync(extract_text_from_url_async)(url)
+                self.assertTrue(text.startswith("Error fetching content from URL"))
+                self.assertTrue(extract_text_from_url(url).startswith("Error fetching content from URL"))
+
+    def test_unknown_charset_falls_back_to_utf8(self):
+        self.assertEqual(fetch.decode_body("Caf\u00e9".encode('utf-8'), 'no-such-charset'), "Caf\u00e9")
+
+
+class StreamingTests(ModelTestMixin, TestCase):
+    def stream_events(self, text: str) -> list:
+        response = self.client.post('/api/', dict(OPTIONS, input_type='text', text=text, stream='true'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = []
+        for block in b"".join(response.streaming_content).decode().split("\n\n"):
+            if block:
+                event, data = block.split("\n")
+                events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+        return events
+
+    def test_formatter_output_matches_the_formatted_summary(self):
+        reply = "Intro line.  * First   point * Second point\n* Third"
+        for form in ('text', 'bullet'):
+            with self.subTest(form=form):
+                formatter = SummaryStreamFormatter(form)
+                pieces = [formatter.feed(reply[start:start + 3]) for start in range(0, len(reply), 3)]
+                self.assertEqual("".join(pieces) + formatter.finish(), format_summary(form, reply))
+
+    def test_summary_is_streamed_as_deltas_and_a_final_event(self):
+        self.model.reply = "The streamed summary has several words in it."
+        events = self.stream_events("A document to summarize.")
+        deltas = [data['text'] for event, data in events if event == 'delta']
+        self.assertGreater(len(deltas), 1)
+        self.assertEqual(events[-1][0], 'done')
+        self.assertEqual("".join(deltas), events[-1][1]['summary'])
+        self.assertEqual(events[-1][1]['summary'], self.model.reply)
+        self.assertIn('summary_id', events[-1][1])
+
+    def test_cached_summary_is_sent_as_one_delta(self):
+        self.stream_events("A document to summarize.")
+        events = self.stream_events("A document to summarize.")
+        self.assertEqual([event for event, _ in events], ['delta', 'done'])
+        self.assertEqual(len(self.model.prompts), 1)
+
+    def test_model_failure_is_sent_as_an_error_event(self):
+        self.fail_model()
+        events = self.stream_events("A document to summarize.")
+        self.assertEqual(events[-1][0], 'error')
+        self.assertTrue(events[-1][1]['error'].startswith("Error generating summary"))
+
+
+class JobLifecycleTests(ModelTestMixin, TestCase):
+    def create_job(self, **fields) -> SummaryJob:
+        fields = dict({'input_type': 'text', 'text': "Some text worth summarizing."}, **fields)
+        return SummaryJob.objects.create(**OPTIONS, **fields)
+
+    def stored_upload(self, content: bytes) -> str:
+        file = tempfile.NamedTemporaryFile(delete=False)
+        file.write(content)
+        file.close()
+        self.addCleanup(lambda: os.path.exists(file.name) and os.remove(file.name))
+        return file.name
+
+    def test_job_is_claimed_and_succeeds(self):
+        job = self.create_job()
+        claimed = claim_next_job()
+        self.assertEqual((claimed.pk, claimed.status, claimed.attempts), (job.pk, SummaryJob.STATUS_RUNNING, 1))
+        self.assertIsNotNone(claimed.heartbeat_at)
+        self.assertIsNone(claim_next_job())
+
+        process_job(claimed)
+        job.refresh_from_db()
+        self.assertEqual(job.status, SummaryJob.STATUS_SUCCEEDED)
+        self.assertEqual(serialize_job(job)['summary'], REPLY)
+        self.assertIsNotNone(job.summarization_seconds)
+
+    def test_model_failure_fails_the_job(self):
+        self.fail_model()
+        self.create_job()
+        process_job(claim_next_job())
+        job = SummaryJob.objects.get()
+        self.assertEqual(job.status, SummaryJob.STATUS_FAILED)
+        self.assertTrue(job.error.startswith("Error generating summary"))
+
+    def test_jobs_without_a_recent_heartbeat_are_queued_again_until_the_attempt_limit(self):
+        long_ago = timezone.now() - timedelta(seconds=JOB_STALE_SECONDS + 60)
+        retried = self.create_job(status=SummaryJob.STATUS_RUNNING, started_at=long_ago, heartbeat_at=long_ago,
+                                  attempts=1)
+        path = self.stored_upload(b"content")
+        exhausted = self.create_job(status=SummaryJob.STATUS_RUNNING, started_at=long_ago, heartbeat_at=long_ago,
+                                    attempts=JOB_MAX_ATTEMPTS, file_path=path)
+        slow = self.create_job(status=SummaryJob.STATUS_RUNNING, started_at=long_ago, heartbeat_at=timezone.now(),
+                               attempts=1)
+
+        self.assertEqual(reclaim_stale_jobs(), 1)
+        statuses = dict(SummaryJob.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[retried.pk], SummaryJob.STATUS_QUEUED)
+        self.assertEqual(statuses[exhausted.pk], SummaryJob.STATUS_FAILED)
+        self.assertEqual(statuses[slow.pk], SummaryJob.STATUS_RUNNING)
+        self.assertFalse(os.path.exists(path))
+
+    def test_stored_upload_is_hashed_and_removed(self):
+        content = b"Text of an uploaded file. " * 1000
+        path = self.stored_upload(content)
+        job = self.create_job(input_type='file', text='', file_path=path, file_extension='txt')
+        with mock.patch('summarizer.jobs.extract_cached', return_value="Extracted text.") as extract:
+            self.assertEqual(extract_job_text(job), "Extracted text.")
+        self.assertEqual(extract.call_args.args[1], hashlib.sha256(content).hexdigest())
+
+        process_job(job)
+        self.assertFalse(os.path.exists(path))
+
+    def test_private_callback_urls_are_rejected(self):
+        with mock.patch('summarizer.jobs.JOB_RUN_IN_PROCESS', False):
+            for url in ('http://127.0.0.1/hook', 'http://10.0.0.1/hook', 'http://169.254.169.254/latest'):
+                with self.subTest(url=url):
+                    response = self.client.post('/api/jobs/', dict(OPTIONS, input_type='text', text="A document.",
+                                                                    callback_url=url))
+                    self.assertEqual(response.status_code, 400)
+            response = self.client.post('/api/jobs/', dict(OPTIONS, input_type='text', text="A document.",
+                                                            callback_url='https://93.184.216.34/hook'))
+            self.assertEqual(response.status_code, 202)
+
+    def test_callback_is_not_sent_to_private_hosts_or_redirected(self):
+        with mock.patch('summarizer.jobs.requests.post') as post:
+            send_callback(self.create_job(callback_url='http://127.0.0.1/hook'))
+            post.assert_not_called()
+            send_callback(self.create_job(callback_url='https://93.184.216.34/hook'))
+        self.assertFalse(post.call_args.kwargs['allow_redirects'])
+
+
+class JobHeartbeatTests(TransactionTestCase):
+    def test_heartbeat_is_refreshed_while_the_job_runs(self):
+        long_ago = timezone.now() - timedelta(seconds=JOB_STALE_SECONDS + 60)
+        job = SummaryJob.objects.create(input_type='text', text="Text.", status=SummaryJob.STATUS_RUNNING,
+                                        started_at=long_ago, heartbeat_at=long_ago, attempts=1, **OPTIONS)
+        with JobHeartbeat(job, interval=0.01):
+            deadline = time.monotonic() + 5
+            while SummaryJob.objects.get(pk=job.pk).heartbeat_at == long_ago and time.monotonic() < deadline:
+                time.sleep(0.01)
+        self.assertEqual(reclaim_stale_jobs(), 0)
+        self.assertEqual(SummaryJob.objects.get(pk=job.pk).status, SummaryJob.STATUS_RUNNING)
+
+
+class PdfExtractionTests(SimpleTestCase):
+    def pdf_on_disk(self, pages: int) -> str:
+        file = tempfile.NamedTemporaryFile(suffix='.pdf', delete=False)
+        file.write(pdf_document(pages))
+        file.close()
+        self.addCleanup(os.remove, file.name)
+        return file.name
+
+    def page_texts(self, pages) -> list:
+        return [text.strip() for text in pages]
+
+    def test_small_in_memory_document_is_read_in_place(self):
+        upload = SimpleUploadedFile('doc.pdf', pdf_document(3), content_type='application/pdf')
+        with mock.patch('summarizer.pdf_extraction.spooled_path', side_effect=AssertionError):
+            pages = self.page_texts(iter_pdf_pages(upload))
+        self.assertEqual(pages, ["Text of page 0.", "Text of page 1.", "Text of page 2."])
+
+    def test_pages_are_joined_with_page_breaks(self):
+        text = extract_text_from_pdf(io.BytesIO(pdf_document(2)))
+        self.assertEqual(self.page_texts(text.split(PAGE_BREAK)), ["Text of page 0.", "Text of page 1."])
+
+    def test_extraction_stops_at_the_character_budget(self):
+        pages = list(iter_pdf_pages(io.BytesIO(pdf_document(10)), max_chars=20))
+        self.assertEqual(sum(len(page) for page in pages), 20)
+        self.assertLess(len(pages), 10)
+
+    def test_large_document_on_disk_is_extracted_in_worker_processes(self):
+        executor = ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context(START_METHOD))
+        self.addCleanup(executor.shutdown)
+        with open(self.pdf_on_disk(12), 'rb') as file, \
+                mock.patch('summarizer.pdf_extraction._executor', executor), \
+                mock.patch('summarizer.pdf_extraction.PDF_WORKERS', 2), \
+                mock.patch('summarizer.pdf_extraction.PARALLEL_PAGE_THRESHOLD', 4), \
+                mock.patch('summarizer.pdf_extraction._iter_serial', side_effect=AssertionError):
+            pages = self.page_texts(iter_pdf_pages(file))
+        self.assertEqual(pages, [f"Text of page {page}." for page in range(12)])
+
+    def test_small_document_on_disk_is_extracted_serially(self):
+        with open(self.pdf_on_disk(3), 'rb') as file, \
+                mock.patch('summarizer.pdf_extraction.get_pdf_executor', side_effect=AssertionError):
+            pages = self.page_texts(iter_pdf_pages(file))
+        self.assertEqual(pages, ["Text of page 0.", "Text of page 1.", "Text of page 2."])
+
+
+class TranscriptionTests(SimpleTestCase):
+    def durations(self, segments) -> list:
+        return [round(len(segment.frame_data) / (segment.sample_rate * segment.sample_width), 1)
+                for segment in segments]
+
+    def test_segments_are_cut_in_silence_or_at_the_maximum_length(self):
+        recording = wav_recording([(12, True), (0.5, False), (40, True)])
+        # Cut in the first silent block after 10 s, then at 30 s repeating the last second.
+        self.assertEqual(self.durations(iter_wav_segments(recording)), [12.1, 30.0, 11.4])
+
+    def test_only_the_first_channel_is_kept(self):
+        segments = list(iter_wav_segments(wav_recording([(2, True)], channels=2)))
+        self.assertEqual(self.durations(segments), [2.0])
+
+    def test_overlapping_words_are_merged_once(self):
+        self.assertEqual(merge_transcripts(["hello there general", "General Kenobi", "", "you are a bold one"]),
+                         "hello there general Kenobi you are a bold one")
+        self.assertEqual(merge_transcripts(["no overlap", "at all"]), "no overlap at all")
+
+    def test_segments_are_transcribed_in_order(self):
+        class DurationBackend(TranscriptionBackend):
+            def transcribe(self, audio):
+                seconds = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+                time.sleep(0.05 if seconds > 20 else 0)  # Finish out of order.
+                return f"segment of {seconds:.1f} seconds"
+
+        transcript = transcribe_wav(wav_recording([(12, True), (0.5, False), (40, True)]), DurationBackend())
+        self.assertEqual(transcript, "segment of 12.1 seconds segment of 30.0 seconds segment of 11.4 seconds")
+
+
+class FetchTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = fetch.HTTPDiskCache(directory.name)
+
+    def test_declared_length_over_the_cap_is_rejected(self):
+        with mock.patch('summarizer.fetch.MAX_DOWNLOAD_BYTES', 10):
+            with self.assertRaises(fetch.ResponseTooLarge):
+                fetch.CappedBody({'Content-Length': '11'})
+
+    def test_streamed_body_over_the_cap_is_rejected(self):
+        with mock.patch('summarizer.fetch.MAX_DOWNLOAD_BYTES', 10):
+            body = fetch.CappedBody({})
+            body.add(b'x' * 10)
+            with self.assertRaises(fetch.ResponseTooLarge):
+                body.add(b'x')
+
+    def test_cache_write_failure_is_ignored(self):
+        with tempfile.NamedTemporaryFile() as file:
+            cache = fetch.HTTPDiskCache(file.name)  # A file where the directory should be
+            with self.assertLogs('summarizer.fetch', 'WARNING'):
+                cache.set('https://example.com/', {'body': 'page'})
+            self.assertIsNone(cache.get('https://example.com/'))
+
+    def test_unchanged_page_is_revalidated_from_the_cache(self):
+        session = mock.Mock()
+        session.get.side_effect = [
+            http_response(200, b'<p>Page</p>', {'ETag': '"v1"'}),
+            http_response(304),
+        ]
+        with mock.patch('summarizer.fetch.get_session', return_value=session), \
+                mock.patch('summarizer.fetch.get_disk_cache', return_value=self.cache):
+            self.assertEqual(fetch.fetch_url('https://example.com/'), '<p>Page</p>')
+            self.assertEqual(fetch.fetch_url('https://example.com/'), '<p>Page</p>')
+        self.assertEqual(session.get.call_args.kwargs['headers'], {'If-None-Match': '"v1"'})
+
+    def test_oversized_page_is_not_cached(self):
+        session = mock.Mock()
+        session.get.return_value = http_response(200, b'x' * 20, {'ETag': '"v1"'})
+        with mock.patch('summarizer.fetch.get_session', return_value=session), \
+                mock.patch('summarizer.fetch.get_disk_cache', return_value=self.cache), \
+                mock.patch('summarizer.fetch.MAX_DOWNLOAD_BYTES', 10):
+            with self.assertRaises(fetch.ResponseTooLarge):
+                fetch.fetch_url('https://example.com/')
+        self.assertIsNone(self.cache.get('https://example.com/'))
+
+
+class HtmlExtractionTests(SimpleTestCase):
+    def test_keeps_article_and_drops_boilerplate(self):
+        text = extract_main_text(article_page(20))
+        self.assertIn("Paragraph number 0 has", text)
+        self.assertIn("Paragraph number 19 has", text)
+        self.assertNotIn("Home", text)
+        self.assertNotIn("Legal", text)
+
+    def test_identical_blocks_are_scored_separately(self):
+        paragraph = "<p>The same sentence repeated in two different blocks of the page.</p>" * 6
+        links = "<p><a href='/a'>A link that makes up the whole text of this paragraph here</a></p>" * 6
+        html = f"<html><body><div class='post'>{paragraph}</div><div class='post'>{paragraph}</div>" \
+               f"<div>{links}</div></body></html>"
+        self.assertIn("The same sentence repeated", extract_main_text(html))
+
+    def test_blocks_are_never_hashed(self):
+        # Hashing a Tag serializes its whole subtree; scoring 500 paragraphs that way took over 15 seconds.
+        def unhashable(tag):
+            raise AssertionError("Tag hashed during extraction")
+
+        with mock.patch.object(bs4.element.Tag, '__hash__', unhashable):
+            text = extract_main_text(article_page(500))
+        self.assertEqual(len(text.splitlines()), 999)
+
+    def test_wrappers_mentioning_boilerplate_keep_the_article(self):
+        for wrapper in ('class="has-sidebar"', 'id="content-with-sidebar"', 'class="post related-wrapper"'):
+            with self.subTest(wrapper=wrapper):
+                html = article_page(20).replace("<article>", f"<div {wrapper}><article>") \
+                    .replace("</article>", "</article></div>")
+                self.assertIn("Paragraph number 19 has", extract_main_text(html))
+
+    def test_boilerplate_blocks_are_removed_and_not_scored(self):
+        sidebar = "".join(f"<p>Sidebar teaser {index} with a long enough line of text to be scored.</p>"
+                          for index in range(40))
+        html = article_page(20).replace("<footer>", f"<div class='sidebar widget'>{sidebar}</div><footer>")
+        text = extract_main_text(html)
+        self.assertIn("Paragraph number 19 has", text)
+        self.assertNotIn("Sidebar teaser", text)
+
+    def test_boilerplate_block_holding_the_only_content_is_kept(self):
+        html = article_page(20).replace("<article>", "<div id='share'><article>") \
+            .replace("</article>", "</article></div>")
+        self.assertIn("Paragraph number 19 has", extract_main_text(html))
+
+
+class NoiseAndBudgetTests(SimpleTestCase):
+    def pdf_text(self) -> str:
+        pages = [f"ACME Annual Report\nSection {page} covers the reve-\nnue of the year.\n{page * 100 + 7}\n"
+                 f"Closing remarks of section {page}.\n{page}" for page in range(1, 4)]
+        return PAGE_BREAK.join(pages)
+
+    def test_running_headers_and_page_numbers_are_removed(self):
+        lines = strip_extraction_noise(self.pdf_text()).splitlines()
+        self.assertEqual(lines.count("ACME Annual Report"), 1)
+        for page in ("1", "2", "3"):
+            self.assertNotIn(page, lines)
+        self.assertIn("Section 2 covers the revenue of the year.", lines)
+
+    def test_numeric_content_is_kept(self):
+        lines = strip_extraction_noise(self.pdf_text()).splitlines()
+        self.assertEqual([line for line in lines if line.endswith("07")], ["107", "207", "307"])
+
+    def test_single_page_keeps_numeric_lines(self):
+        self.assertEqual(strip_extraction_noise("Totals\n42\nEnd of table."), "Totals\n42\nEnd of table.")
+
+    def test_single_page_keeps_repeated_lines(self):
+        text = "Verse one.\nSing it again\nVerse two.\nSing it again\nVerse three.\nSing it again"
+        self.assertEqual(strip_extraction_noise(text), text)
+        rows = "\n".join(["| yes | yes |"] * 5)
+        self.assertEqual(strip_extraction_noise(rows), rows)
+
+    def test_selection_fits_the_budget(self):
+        text = " ".join(f"Sentence {index} talks about topic {index % 5} in words." for index in range(200))
+        selected = select_sentences(text, 100)
+        self.assertTrue(selected)
+        self.assertLessEqual(estimate_tokens(selected), 100)
+
+    def test_sentence_larger_than_the_budget_is_truncated(self):
+        selected = select_sentences("word " * 2000, 100)
+        self.assertTrue(selected.startswith("word word"))
+        self.assertLessEqual(estimate_tokens(selected), 100)
+
+    def test_prepared_text_fits_the_budget(self):
+        text = " ".join(f"Sentence {index} talks about topic {index % 5} in words." for index in range(500))
+        self.assertLessEqual(estimate_tokens(prepare_text(text, budget=200)), 200)
+
+
+class BatchTests(ModelTestMixin, TransactionTestCase):
+    def run_batch(self, items: list) -> dict:
+        response = self.client.post('/api/batch/', {'items': items}, content_type='application/json')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        return {line['index']: line for line in lines}
+
+    def test_results_stream_as_ndjson_and_duplicates_share_a_model_call(self):
+        item = dict(OPTIONS, input_type='text', text="The same document sent twice.")
+        results = self.run_batch([item, item, {'input_type': 'text'}])
+        self.assertEqual(results[0]['summary'], REPLY)
+        self.assertEqual(results[1]['summary'], REPLY)
+        self.assertIn('error', results[2])
+        self.assertEqual(len(self.model.prompts), 1)
+
+    def test_model_failure_is_reported_per_item(self):
+        self.fail_model()
+        results = self.run_batch([dict(OPTIONS, input_type='text', text="A document.")])
+        self.assertTrue(results[0]['error'].startswith("Error generating summary"))
+
+    def test_fallback_summaries_are_flagged_in_batches(self):
+        self.fail_model(fallback=True)
+        results = self.run_batch([dict(OPTIONS, input_type='text', text="First sentence. Second sentence.")])
+        self.assertTrue(results[0]['degraded'])
+
+    def test_model_call_rate_is_configurable(self):
+        with mock.patch('summarizer.batch.BATCH_MODEL_RATE', None):
+            self.assertIsNone(BatchSummarizer()._rate_limiter)
+        with mock.patch('summarizer.batch.BATCH_MODEL_RATE', 50.0):
+            self.assertEqual(BatchSummarizer()._rate_limiter.rate, 50.0)
+
+
+class ExtractiveFallbackTests(ModelTestMixin, TestCase):
+    TEXT = ("Solar panels convert sunlight into electricity. Solar panels on roofs cut electricity bills. "
+            "My cat likes boxes. Electricity from solar panels can be stored in batteries.")
+
+    def test_central_sentences_are_kept_in_document_order(self):
+        summary = ExtractiveBackend().summarize('text', 2, 'English', self.TEXT, 'general')
+        self.assertNotIn("cat", summary)
+        self.assertTrue(summary.startswith("Solar panels"))
+        self.assertEqual(len(summary.split(". ")), 2)
+
+    def test_bullet_form_puts_one_sentence_per_point(self):
+        summary = ExtractiveBackend().summarize('bullet', 2, 'English', self.TEXT, 'general')
+        self.assertEqual(summary.count("\n* "), 2)
+
+    def test_short_inputs_are_routed_to_the_extractive_engine(self):
+        with mock.patch('summarizer.backends.EXTRACTIVE_MAX_TOKENS', 1000):
+            summary = RoutingBackend().summarize('text', 2, 'English', self.TEXT, 'general')
+        self.assertFalse(getattr(summary, 'degraded', False))
+        self.assertEqual(self.model.prompts, [])
+
+    def test_failed_model_call_falls_back_to_a_degraded_summary(self):
+        self.fail_model(fallback=True)
+        summary = RoutingBackend().summarize('text', 2, 'English', self.TEXT, 'general')
+        self.assertTrue(summary.degraded)
+        self.assertFalse(summary.cacheable)
+
+    def test_failed_model_serves_a_degraded_summary(self):
+        self.fail_model(fallback=True)
+        response = self.summarize("The first sentence. The second sentence. The third sentence.")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['degraded'])
+
+    def test_no_fallback_without_sentences_or_when_disabled(self):
+        self.assertIsNone(fallback_summary('text', 2, "   "))
+        with mock.patch('summarizer.backends.EXTRACTIVE_FALLBACK', False):
+            self.assertIsNone(fallback_summary('text', 2, self.TEXT))
+
+
+class LazyLoadingTests(SimpleTestCase):
+    def test_module_is_imported_on_first_attribute_access(self):
+        module = LazyModule('json')
+        self.assertFalse(module.is_loaded)
+        self.assertIn("not loaded", repr(module))
+        self.assertEqual(module.dumps([1]), "[1]")
+        self.assertTrue(module.is_loaded)
+        self.assertIn('json', LOAD_TIMES)
+
+    def test_stand_ins_are_shared_by_name(self):
+        self.assertIs(lazy_module('numpy'), lazy_module('numpy'))
+        self.assertIs(LAZY_MODULES['numpy'], lazy_module('numpy'))
+
+    def test_missing_module_fails_on_first_use(self):
+        module = LazyModule('summarizer.no_such_module')
+        with self.assertRaises(ImportError):
+            module.anything
+
+    def test_worker_boot_imports_no_heavy_library(self):
+        environment = dict(os.environ, DJANGO_SETTINGS_MODULE='SummarizationProject.settings')
+        boot = subprocess.run([sys.executable, '-c', BOOT_SCRIPT, json.dumps(sorted(LAZY_MODULES))],
+                              cwd=settings.BASE_DIR, env=environment, capture_output=True, text=True, check=True)
+        self.assertEqual(json.loads(boot.stdout.splitlines()[-1])['heavy_modules_loaded'], [])
+
+    @override_settings(SUMMARY_GEMINI_KEY='test-key')
+    def test_model_client_is_configured_once_on_first_use(self):
+        with mock.patch('summarizer.model_client.genai') as genai, \
+                mock.patch('summarizer.model_client._models', {}):
+            first = get_generative_model('first')
+            self.assertIs(get_generative_model('first'), first)
+            get_generative_model('second')
+        genai.configure.assert_called_once()
+        self.assertEqual(genai.GenerativeModel.call_count, 2)
+
+
+class ModelFailureTests(ModelTestMixin, TestCase):
+    def test_circuit_opens_and_lets_a_single_probe_through(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.05)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_calls_fail_over_while_the_primary_circuit_is_open(self):
+        self.models['primary'] = FakeModel(error=api_exceptions.ServiceUnavailable('down'))
+        self.models['secondary'] = FakeModel(reply="From the failover model.")
+        client = ModelClient(primary='primary', secondary='secondary', hedging=False)
+        client.breakers['primary'] = CircuitBreaker(failure_threshold=1)
+
+        self.assertEqual(client.generate("prompt"), "From the failover model.")
+        self.assertEqual(client.breakers['primary'].state, CircuitBreaker.OPEN)
+        self.assertEqual(client.stats()['counters']['failovers'], 1)
+
+    def test_calls_are_shed_when_every_circuit_is_open(self):
+        client = ModelClient(primary='primary', hedging=False)
+        client.breakers['primary'].record_failure()
+        for _ in range(client.breakers['primary'].failure_threshold):
+            client.breakers['primary'].record_failure()
+        with self.assertRaises(ModelUnavailableError):
+            client.generate("prompt")
+        self.assertEqual(client.stats()['counters']['shed'], 1)
+        self.assertEqual(self.model.prompts, [])
+
+    def test_failed_model_without_fallback_is_answered_with_503(self):
+        self.fail_model()
+        response = self.summarize("The first sentence. The second sentence.")
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+        self.assertTrue(response.json()['error'].startswith("Error generating summary"))
+
+    def test_variants_fail_with_503_only_when_all_fail(self):
+        self.fail_model()
+        response = self.summarize("The first sentence. The second sentence.", language=['English', 'Polish'])
+        self.assertEqual(response.status_code, 503)
+
+    def test_transient_errors_are_retried(self):
+        self.model.error = api_exceptions.ServiceUnavailable('overloaded')
+        client = ModelClient(hedging=False)
+        with self.assertRaises(api_exceptions.ServiceUnavailable):
+            client.generate("prompt")
+        self.assertGreater(len(self.model.prompts), 1)
+
+        self.model.prompts.clear()
+        self.model.error = api_exceptions.InvalidArgument('bad prompt')
+        with self.assertRaises(api_exceptions.InvalidArgument):
+            client.generate("prompt")
+        self.assertEqual(len(self.model.prompts), 1)
+
+
+class MetricsTests(ModelTestMixin, TestCase):
+    def test_histogram_renders_cumulative_buckets(self):
+        histogram = Histogram('test_seconds', 'Test durations.', ['kind'], buckets=(1, 5))
+        self.addCleanup(REGISTRY.remove, histogram)
+        for value in (0.5, 2, 7):
+            histogram.observe(value, kind='a')
+        self.assertEqual(histogram.samples(), [
+            'test_seconds_bucket{kind="a",le="1.0"} 1',
+            'test_seconds_bucket{kind="a",le="5.0"} 2',
+            'test_seconds_bucket{kind="a",le="+Inf"} 3',
+            'test_seconds_sum{kind="a"} 9.5',
+            'test_seconds_count{kind="a"} 3',
+        ])
+
+    def test_stage_times_functions_and_counts_errors(self):
+        @stage('test_sync_stage')
+        def failing():
+            raise ValueError("failed")
+
+        @stage('test_async_stage')
+        async def succeeding():
+            return "done"
+
+        with self.assertRaises(ValueError):
+            failing()
+        self.assertEqual(async_to_sync(succeeding)(), "done")
+        self.assertEqual(STAGE_ERRORS._values[('test_sync_stage',)], 1)
+        for name in ('test_sync_stage', 'test_async_stage'):
+            counts, _ = STAGE_SECONDS._values[(name,)]
+            self.assertEqual(sum(counts), 1)
+
+    def test_metrics_endpoint_exposes_requests_and_stages(self):
+        self.summarize("A document to summarize.")
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('summarizer_request_seconds_count{view="summarize_text",status="200"}', body)
+        self.assertIn('summarizer_stage_seconds_count{stage="model"}', body)
+
+    def test_server_timing_header_lists_the_stages(self):
+        with mock.patch('summarizer.metrics.TIMING_HEADERS', True):
+            response = self.summarize("A document to summarize.")
+        timing = response['Server-Timing']
+        self.assertIn('model;dur=', timing)
+        self.assertTrue(timing.split(', ')[-1].startswith('total;dur='))
+        self.assertNotIn('Server-Timing', self.summarize("Another document."))
+
+
+class BenchmarkStandInTests(SimpleTestCase):
+    def setUp(self):
+        self.server = FakeModelServer(latency=0.0, jitter=0.0, chunk_interval=0.0).start()
+        self.addCleanup(self.server.stop)
+
+    def generate(self, method: str, prompt: str) -> requests.Response:
+        body = {'contents': [{'role': 'user', 'parts': [{'text': prompt}]}]}
+        return requests.post(f'{self.server.url}/v1beta/models/fake:{method}', json=body, timeout=5)
+
+    def test_summary_has_the_requested_length_and_form(self):
+        bullets = fake_summary("Summarize in form of 4 bullet points: rivers carry water")
+        self.assertEqual(len(bullets.splitlines()), 4)
+        self.assertTrue(all(line.startswith("* ") for line in bullets.splitlines()))
+        self.assertEqual(fake_summary("Summarize in form of a 2 sentence text: rivers").count("."), 2)
+
+    def test_generation_counting_and_streaming_are_answered(self):
+        prompt = "Summarize in form of a 3 sentence text: rivers carry water past mills"
+        reply = self.generate('generateContent', prompt).json()
+        text = reply['candidates'][0]['content']['parts'][0]['text']
+        self.assertEqual(text, fake_summary(prompt))
+        self.assertEqual(self.generate('countTokens', prompt).json(), {'totalTokens': len(prompt) // 4 + 1})
+        chunks = self.generate('streamGenerateContent', prompt).json()
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunk['candidates'][0]['content']['parts'][0]['text'] for chunk in chunks), text)
+        self.assertEqual(self.server.requests, 3)
+
+    def test_error_rate_answers_503(self):
+        self.server.options['error_rate'] = 1.0
+        response = self.generate('generateContent', "rivers")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['error']['status'], 'UNAVAILABLE')
+
+
+class IngestionTests(SimpleTestCase):
+    def test_in_memory_upload_shares_its_buffer(self):
+        content = b"Rivers carry water past the old mill."
+        upload = ingest_upload(SimpleUploadedFile('notes.txt', content))
+        with upload:
+            self.assertIsInstance(upload.buffer, memoryview)
+            # A view, not a copy: the BytesIO sees writes made through it.
+            upload.buffer[0:1] = b"r"
+            self.assertEqual(upload.file.file.getvalue()[:6], b"rivers")
+            upload.buffer[0:1] = b"R"
+            self.assertIsNone(upload.path)
+            self.assertEqual((upload.mime_type, upload.size), ('text/plain', len(content)))
+            self.assertEqual(upload.digest(), hashlib.sha256(content).hexdigest())
+
+    def test_upload_on_disk_is_mapped_in_place(self):
+        content = b"Rivers carry water past the old mill.\n" * 100
+        file = TemporaryUploadedFile('notes.txt', 'text/plain', len(content), 'utf-8')
+        file.write(content)
+        file.seek(0)
+        self.addCleanup(file.close)
+        with ingest_upload(file) as upload:
+            self.assertIsInstance(upload.buffer, mmap.mmap)
+            self.assertEqual(upload.path, file.temporary_file_path())
+            self.assertEqual(upload.buffer[:], content)
+
+    def test_large_stream_is_spooled_once(self):
+        content = b"Rivers carry water past the old mill.\n" * 100
+
+        class Stream(io.RawIOBase):
+            # A readable stream without getbuffer, like a file received from another source.
+            def __init__(self):
+                self.inner = io.BytesIO(content)
+                self.name, self.size = 'notes.txt', len(content)
+
+            def readable(self):
+                return True
+
+            def readinto(self, buffer):
+                return self.inner.readinto(buffer)
+
+            def seek(self, offset, whence=0):
+                return self.inner.seek(offset, whence)
+
+        with mock.patch('summarizer.ingestion.SPOOL_THRESHOLD', 64), ingest_upload(Stream()) as upload:
+            self.assertIsInstance(upload.buffer, mmap.mmap)
+            self.assertIsNone(upload.path)
+            self.assertEqual(upload.open().read(), content)
+            self.assertEqual(upload.digest(), hashlib.sha256(content).hexdigest())
+
+    def test_mismatched_type_and_extension_are_rejected(self):
+        with self.assertRaisesMessage(ValidationError, "Expected application/pdf, but got text/plain"):
+            ingest_upload(SimpleUploadedFile('notes.pdf', b"Plain text, not a PDF."))
+        with self.assertRaisesMessage(ValidationError, "File extension exe is not supported."):
+            ingest_upload(SimpleUploadedFile('notes.exe', b"MZ"))
+
+
+def docx_document(paragraphs: int = 2) -> io.BytesIO:
+    document = docx.Document()
+    document.sections[0].header.paragraphs[0].text = "Quarterly report"
+    for index in range(paragraphs):
+        document.add_paragraph(f"Paragraph {index} of the body.")
+    table = document.add_table(rows=2, cols=2)
+    for row, cells in enumerate([("Region", "Sales"), ("North", "42")]):
+        for column, text in enumerate(cells):
+            table.cell(row, column).text = text
+    table.cell(1, 1).add_paragraph("units")
+    buffer = io.BytesIO()
+    document.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+class DocxExtractionTests(SimpleTestCase):
+    def test_headers_paragraphs_and_table_rows_are_extracted_in_order(self):
+        self.assertEqual(list(iter_docx_blocks(docx_document())), [
+            "Quarterly report", "Paragraph 0 of the body.", "Paragraph 1 of the body.",
+            "Region | Sales", "North | 42 units",
+        ])
+
+    def test_extraction_stops_at_the_budget(self):
+        blocks = list(iter_docx_blocks(docx_document(1000), max_chars=60))
+        self.assertEqual(blocks, ["Quarterly report", "Paragraph 0 of the body.", "Paragraph 1 of the b"])
+        self.assertEqual(sum(map(len, blocks)), 60)
+
+    def test_text_boxes_are_read_once_and_finished_blocks_are_discarded(self):
+        body = (
+            f'<w:document xmlns:w="{W[1:-1]}" xmlns:mc="{MC_FALLBACK[1:].split("}")[0]}"><w:body>'
+            '<w:p><w:r><w:t>Before</w:t><w:tab/><w:t>box</w:t></w:r></w:p>'
+            '<mc:AlternateContent><mc:Choice><w:p><w:r><w:t>Boxed</w:t></w:r></w:p></mc:Choice>'
+            '<mc:Fallback><w:p><w:r><w:t>Boxed</w:t></w:r></w:p></mc:Fallback></mc:AlternateContent>'
+            + '<w:p><w:r><w:t>After</w:t></w:r></w:p>' * 50 + '</w:body></w:document>'
+        )
+        leftovers = []
+        original = docx_extraction._discard
+
+        def discard(element):
+            original(element)
+            leftovers.append((element.getparent().index(element), len(element)))
+
+        with mock.patch.object(docx_extraction, '_discard', side_effect=discard):
+            blocks = list(iter_part_blocks(io.BytesIO(body.encode('utf-8'))))
+        self.assertEqual(blocks, ["Before\tbox", "Boxed"] + ["After"] * 50)
+        # Each finished block is emptied and everything before it is dropped.
+        self.assertEqual(set(leftovers), {(0, 0)})
+
+    def test_unreadable_docx_is_reported(self):
+        with self.assertRaisesMessage(ExtractionError, "Error extracting text from DOCX file"):
+            extract_text_from_docx(io.BytesIO(b"not a zip"))
+
+
+class StoredSummaryTests(ModelTestMixin, TestCase):
+    def test_summary_is_stored_once_and_fetched_by_id(self):
+        text = article_text(400)
+        summary_id = self.summarize(text).json()['summary_id']
+        self.assertEqual(self.summarize(text).json()['summary_id'], summary_id)
+        self.assertEqual(StoredSummary.objects.count(), 1)
+        stored = self.client.get(f'/api/summaries/{summary_id}/').json()
+        self.assertEqual((stored['summary'], stored['form'], stored['length']), (REPLY, 'text', 2))
+        self.assertEqual(stored['content_hash'], content_fingerprint(text))
+        self.assertEqual(len(self.model.prompts), 1)
+
+    def test_stored_summary_is_downloaded_as_a_document(self):
+        summary_id = self.summarize(article_text(400)).json()['summary_id']
+        response = self.client.get(f'/api/summaries/{summary_id}/download/', {'format': 'txt'})
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename=summary-{summary_id}.txt')
+        self.assertIn(REPLY, response.content.decode('utf-8'))
+        self.assertEqual(self.client.get(f'/api/summaries/{summary_id}/download/', {'format': 'odt'}).status_code, 400)
+
+    def test_summaries_are_only_readable_by_their_client(self):
+        summary_id = self.summarize(article_text(400)).json()['summary_id']
+        other = {'REMOTE_ADDR': '10.0.0.2'}
+        self.assertEqual(self.client.get(f'/api/summaries/{summary_id}/', **other).status_code, 404)
+        self.assertEqual(self.client.get(f'/api/summaries/{summary_id}/download/', **other).status_code, 404)
+        response = self.client.post('/api/download-summaries/', {'summary_ids': [summary_id]},
+                                    content_type='application/json', **other)
+        self.assertEqual(response.json()['missing'], [summary_id])
+        response = self.client.post('/api/download-summaries/', {'summary_ids': [summary_id]},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_summaries_without_a_client_are_readable_by_anyone(self):
+        stored = store_summary('key', "Watched page text.", REPLY, 'url', 'text', 2, 'English', 'general', [])
+        response = self.client.get(f'/api/summaries/{stored.id}/', REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.json()['summary'], REPLY)
+
+    def test_old_and_excess_summaries_are_pruned(self):
+        for index in range(3):
+            store_summary(f'key{index}', f"Text {index}.", REPLY, 'text', 'text', 2, 'English', 'general', [])
+        StoredSummary.objects.filter(cache_key='key0').update(created_at=timezone.now() - timedelta(days=365))
+        with mock.patch('summarizer.store.STORE_MAX_ROWS', 1):
+            self.assertEqual(prune_summaries(), 2)
+        self.assertEqual(list(StoredSummary.objects.values_list('cache_key', flat=True)), ['key2'])
+
+
+class ExtractionCacheTests(ModelTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = ExtractionDiskCache(directory.name, max_bytes=10_000)
+        patcher = mock.patch('summarizer.extraction_cache._extraction_cache', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_extracted_text_is_served_from_the_cache(self):
+        extract = mock.Mock(return_value="Text of the document.")
+        self.assertEqual(extract_cached('pdf', 'digest', extract), "Text of the document.")
+        self.assertEqual(extract_cached('pdf', 'digest', extract), "Text of the document.")
+        self.assertEqual(extract.call_count, 1)
+        self.assertNotEqual(extraction_key('pdf', 'digest'), extraction_key('docx', 'digest'))
+
+    def test_failed_extraction_is_not_cached(self):
+        extract = mock.Mock(side_effect=ExtractionError("Error extracting text from PDF: broken"))
+        for _ in range(2):
+            with self.assertRaisesMessage(ExtractionError, "broken"):
+                extract_cached('pdf', 'digest', extract)
+        self.assertEqual(extract.call_count, 2)
+        self.assertEqual(self.cache.info()['hits'], 0)
+
+    def test_large_texts_are_compressed(self):
+        text = "word " * 5000
+        self.cache.set('aakey', text)
+        self.assertTrue(os.path.exists(os.path.join(self.cache.directory, 'aa', 'aakey.txt.z')))
+        self.assertEqual(self.cache.get('aakey'), text)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        self.cache.max_bytes = 2500
+        for index in range(4):
+            self.cache.set(f'{index:02x}key', str(index) * 1000)
+            time.sleep(0.01)
+        self.assertEqual([self.cache.get(f'{index:02x}key') is not None for index in range(4)],
+                         [False, False, True, True])
+        self.assertEqual(self.cache.info()['evictions'], 2)
+
+    def test_unreadable_upload_is_answered_with_400(self):
+        upload = SimpleUploadedFile('report.pdf', b"%PDF-1.4\nnot really a PDF")
+        response = self.client.post('/api/', dict(OPTIONS, input_type='file', file=upload))
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.json()['error'].startswith("Error extracting text from PDF"))
+        self.assertEqual(self.model.prompts, [])
+
+
+class VariantTests(ModelTestMixin, TransactionTestCase):
+    # Variants are generated in worker threads, which need their own database connections.
+
+    def variants(self, *languages, form='text'):
+        return [dict(OPTIONS, form=form, language=language) for language in languages]
+
+    def translations(self) -> list:
+        return [prompt for prompt in self.model.prompts if prompt.startswith("Translate")]
+
+    def test_other_languages_are_translated_from_one_summary(self):
+        results = VariantSummarizer(article_text(400), 'text').summarize(self.variants('English', 'French', 'German'))
+        self.assertEqual([result['summary'] for result in results], [REPLY] * 3)
+        self.assertEqual(len(self.model.prompts), 3)
+        self.assertEqual([prompt.split(",")[0] for prompt in self.translations()],
+                         ["Translate this summary into French", "Translate this summary into German"])
+        self.assertTrue(all(prompt.endswith(REPLY) for prompt in self.translations()))
+        self.assertEqual(len({result['stored'].id for result in results}), 3)
+
+    def test_cached_variant_is_the_pivot(self):
+        text = article_text(400)
+        VariantSummarizer(text, 'text').summarize(self.variants('English'))
+        self.model.prompts.clear()
+        VariantSummarizer(text, 'text').summarize(self.variants('English', 'French'))
+        self.assertEqual(len(self.model.prompts), 1)
+        self.assertEqual(len(self.translations()), 1)
+
+    def test_each_language_is_summarized_without_translation(self):
+        with mock.patch('summarizer.variants.TRANSLATE_VARIANTS', False):
+            VariantSummarizer(article_text(400), 'text').summarize(self.variants('English', 'French'))
+        self.assertEqual((len(self.model.prompts), self.translations()), (2, []))
+
+    def test_failed_translation_falls_back_to_the_document(self):
+        with mock.patch('summarizer.variants.translate_summary', side_effect=SummaryGenerationError("down")):
+            results = VariantSummarizer(article_text(400), 'text').summarize(self.variants('English', 'French'))
+        self.assertEqual([result['summary'] for result in results], [REPLY, REPLY])
+        self.assertEqual(len(self.model.prompts), 2)
+
+    def test_degraded_pivot_is_not_translated(self):
+        self.fail_model(fallback=True)
+        results = VariantSummarizer(article_text(400), 'text').summarize(self.variants('English', 'French'))
+        self.assertTrue(all(result['summary'].degraded for result in results))
+        self.assertEqual(self.translations(), [])
+
+    def test_variants_are_listed_in_the_response(self):
+        response = self.client.post('/api/', dict(OPTIONS, input_type='text', text=article_text(400),
+                                                  form=['text', 'bullet'], language=['English', 'French']),
+                                    content_type='application/json')
+        summaries = response.json()['summaries']
+        self.assertEqual([(entry['form'], entry['language']) for entry in summaries],
+                         [('text', 'English'), ('text', 'French'), ('bullet', 'English'), ('bullet', 'French')])
+        self.assertTrue(all('summary_id' in entry for entry in summaries))
+        self.assertEqual(len(self.translations()), 2)
+
+
+class ExportTests(SimpleTestCase):
+    def test_docx_keeps_bullet_points(self):
+        document = docx.Document(io.BytesIO(b"".join(export_summary("\n* First point\n* Second point", 'docx'))))
+        bullets = [paragraph.text for paragraph in document.paragraphs if paragraph.style.name == 'List Bullet']
+        self.assertEqual(bullets, ["First point", "Second point"])
+
+    def test_text_exports_keep_list_items_together(self):
+        text = b"".join(export_summary("Intro line.\n* First point\n* Second point", 'md')).decode('utf-8')
+        self.assertTrue(text.startswith("# "))
+        self.assertIn("Intro line.\n\n- First point\n- Second point\n", text)
+
+    def test_pdf_export_is_readable(self):
+        data = b"".join(export_summary("* First point\n* Second point", 'pdf'))
+        self.assertIn("Second point", extract_text_from_pdf(io.BytesIO(data)))
+
+    def test_archive_holds_one_document_per_summary(self):
+        data = b"".join(export_archive([('first', "First summary."), ('second', "Second summary.")], 'txt'))
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.namelist(), ['first.txt', 'second.txt'])
+            self.assertIn("Second summary.", archive.read('second.txt').decode('utf-8'))
+
+    def test_archive_of_docx_documents_is_readable(self):
+        data = b"".join(export_archive([('summary', "Only paragraph.")], 'docx'))
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            self.assertIsNone(archive.testzip())
+            document = docx.Document(io.BytesIO(archive.read('summary.docx')))
+        self.assertIn("Only paragraph.", [paragraph.text for paragraph in document.paragraphs])
+
+    def test_download_endpoint_answers_the_requested_format(self):
+        response = self.client.post('/api/download-summary/', {'summary': "One.", 'format': 'txt'},
+                                    content_type='application/json')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename=summary.txt')
+        self.assertIn("One.", response.content.decode('utf-8'))
+        response = self.client.post('/api/download-summary/', {'summary': "One.", 'format': 'odt'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_endpoint_streams_a_zip(self):
+        response = self.client.post('/api/download-summaries/', {'format': 'md', 'summaries': ["One.", "Two."]},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as archive:
+            self.assertEqual(archive.namelist(), ['summary-1.md', 'summary-2.md'])
+
+
+class AdmissionTests(ModelTestMixin, TestCase):
+    def test_full_queue_rejects_bounded_requests(self):
+        queue = AdmissionQueue(concurrency=1, max_queue=0, max_wait=1)
+        slot = queue.acquire()
+        with self.assertRaises(AdmissionRejected) as raised:
+            queue.acquire()
+        self.assertEqual(raised.exception.reason, 'queue_full')
+        slot.release()
+        queue.acquire().release()
+
+    def test_unbounded_request_waits_for_a_slot(self):
+        queue = AdmissionQueue(concurrency=1, max_queue=0, max_wait=1)
+        slot = queue.acquire()
+        granted = threading.Event()
+
+        def wait_for_slot():
+            with queue.acquire(admission.BATCH, bounded=False):
+                granted.set()
+
+        thread = threading.Thread(target=wait_for_slot)
+        thread.start()
+        self.assertFalse(granted.wait(0.1))
+        slot.release()
+        thread.join(5)
+        self.assertTrue(granted.is_set())
+
+    def test_request_quota_is_enforced_per_client(self):
+        quotas = ClientQuotas(request_rate=0.01, request_burst=2, token_rate=None)
+        quotas.check_request('client-a')
+        quotas.check_request('client-a')
+        with self.assertRaises(AdmissionRejected) as raised:
+            quotas.check_request('client-a')
+        self.assertEqual(raised.exception.reason, 'request_quota')
+        self.assertGreaterEqual(raised.exception.retry_after, 1)
+        quotas.check_request('client-b')
+
+    def test_batch_larger_than_the_burst_is_charged_in_full(self):
+        quotas = ClientQuotas(request_rate=1, request_burst=20, token_rate=None)
+        quotas.check_request('client', 50)
+        with self.assertRaises(AdmissionRejected) as raised:
+            quotas.check_request('client')
+        # The client waits for the 30 requests of debt and the one it asked for.
+        self.assertGreaterEqual(raised.exception.retry_after, 31)
+        with self.assertRaises(AdmissionRejected):
+            quotas.check_request('client', 50)
+
+    def test_token_quota_is_enforced(self):
+        quotas = ClientQuotas(request_rate=None, token_rate=1, token_burst=100)
+        quotas.charge_tokens('client', 80)
+        with self.assertRaises(AdmissionRejected) as raised:
+            quotas.charge_tokens('client', 80)
+        self.assertEqual(raised.exception.reason, 'token_quota')
+
+    def test_view_answers_429_over_quota(self):
+        admission.get_admission_controller().quotas = ClientQuotas(request_rate=0.01, request_burst=1)
+        self.assertEqual(self.summarize("A document.").status_code, 200)
+        response = self.summarize("A document.")
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    def test_batch_is_refused_while_its_items_exceed_the_quota(self):
+        admission.get_admission_controller().quotas = ClientQuotas(request_rate=0.01, request_burst=2)
+        self.assertEqual(self.summarize("A document.").status_code, 200)
+        items = [dict(OPTIONS, input_type='text', text=f"Document {index}.") for index in range(3)]
+        response = self.client.post('/api/batch/', {'items': items}, content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(len(self.model.prompts), 1)
+
+
+class NearDuplicateTests(ModelTestMixin, TestCase):
+    def test_signature_similarity_estimates_shared_shingles(self):
+        text = article_text(400)
+        signature = minhash_signature(text)
+        self.assertEqual(similarity(signature, minhash_signature(text)), 1.0)
+        self.assertGreaterEqual(similarity(signature, minhash_signature(text.replace("stone 17 ", "stone x "))), 0.9)
+        self.assertLess(similarity(signature, minhash_signature(article_text(400, seed='forest'))), 0.9)
+
+    def test_near_identical_text_reuses_the_stored_summary(self):
+        text = article_text(400)
+        first = self.summarize(text).json()
+        second = self.summarize(text.replace("stone 17 ", "stone seventeen ")).json()
+        self.assertEqual(second['summary'], REPLY)
+        self.assertEqual(second['near_duplicate']['summary_id'], first['summary_id'])
+        self.assertGreaterEqual(second['near_duplicate']['similarity'], 0.9)
+        self.assertEqual(len(self.model.prompts), 1)
+
+    def test_different_text_or_options_are_summarized(self):
+        self.summarize(article_text(400))
+        response = self.summarize(article_text(400, seed='forest')).json()
+        self.assertNotIn('near_duplicate', response)
+        self.assertNotIn('near_duplicate', self.summarize(article_text(400), language='French').json())
+        self.assertEqual(len(self.model.prompts), 3)
+
+    def test_degraded_summary_is_not_reused(self):
+        text = article_text(400)
+        store_summary(make_cache_key(text, **OPTIONS), text, DegradedSummary("Fallback."), 'text', **OPTIONS,
+                      models=['extractive'])
+        self.assertIsNone(find_reusable_summary(text.replace("stone 17 ", "stone seventeen "), **OPTIONS))
+
+    def test_newer_degraded_summary_of_the_same_text_is_skipped(self):
+        text = article_text(400)
+        stored = store_summary(make_cache_key(text, **OPTIONS), text, REPLY, 'text', **OPTIONS, models=['model'])
+        store_summary(make_cache_key(text, **OPTIONS), text, DegradedSummary("Fallback."), 'text', **OPTIONS,
+                      models=['extractive'])
+        reused = find_reusable_summary(text.replace("stone 17 ", "stone seventeen "), **OPTIONS)
+        self.assertEqual((reused, reused.source_id), (REPLY, stored.id))
+
+    def test_signatures_without_summaries_are_pruned(self):
+        text = article_text(400)
+        store_summary(make_cache_key(text, **OPTIONS), text, REPLY, 'text', **OPTIONS, models=['model'])
+        StoredSummary.objects.all().delete()
+        self.assertEqual(prune_signatures(), 1)
+        self.assertIsNone(find_reusable_summary(text, **OPTIONS))
+
+
+class WatchTests(ModelTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.page = article_page(20)
+        patcher = mock.patch('summarizer.watch.fetch_url', side_effect=lambda url: self.page)
+        self.fetch_url = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.watch = WatchedUrl(url='https://example.com/article', **OPTIONS)
+
+    def test_blocks_are_diffed_by_hash(self):
+        self.assertEqual(diff_blocks(['a', 'b', 'c'], ['a', 'x', 'c', 'd']), ([1], [1, 3]))
+
+    def test_unchanged_page_does_not_call_the_model(self):
+        self.assertEqual(refresh_watch(self.watch)['result'], 'full')
+        self.assertEqual(refresh_watch(self.watch)['result'], 'unchanged')
+        self.assertEqual(len(self.model.prompts), 1)
+
+    def test_small_change_updates_the_summary_incrementally(self):
+        refresh_watch(self.watch)
+        self.page = self.page.replace("Paragraph number 7 has", "Paragraph number 7 now has")
+        self.model.reply = "An updated summary."
+        refresh = refresh_watch(self.watch)
+        self.assertEqual((refresh['result'], refresh['added_blocks'], refresh['removed_blocks']),
+                         ('incremental', 1, 1))
+        self.assertIn("Paragraph number 7 now has", self.model.prompts[-1])
+        self.assertNotIn("Paragraph number 8 has", self.model.prompts[-1])
+        self.assertEqual(WatchedUrl.objects.get().summary, "An updated summary.")
+
+    def test_incremental_summary_is_stored_but_not_cached_or_indexed(self):
+        refresh_watch(self.watch)
+        self.page = self.page.replace("Paragraph number 7 has", "Paragraph number 7 now has")
+        self.model.reply = "An updated summary."
+        refresh_watch(self.watch)
+        text = extract_main_text(self.page)
+        self.assertIsNone(get_summary_cache().get(make_cache_key(text, **OPTIONS)))
+        self.assertFalse(DocumentSignature.objects.filter(pk=content_fingerprint(text)).exists())
+        self.assertEqual(StoredSummary.objects.get(pk=self.watch.summary_id).summary, "An updated summary.")
+        self.assertIsNone(find_reusable_summary(text.replace("number 3", "number three"), **OPTIONS))
+
+    def test_failed_incremental_update_falls_back_to_a_full_summary(self):
+        refresh_watch(self.watch)
+        self.page = self.page.replace("Paragraph number 7 has", "Paragraph number 7 now has")
+        with mock.patch('summarizer.watch.generate_update', side_effect=SummaryGenerationError("down")), \
+                self.assertLogs('summarizer.watch', 'WARNING'):
+            self.assertEqual(refresh_watch(self.watch)['result'], 'full')
+        self.assertTrue(get_summary_cache().get(make_cache_key(extract_main_text(self.page), **OPTIONS)))
+
+    def test_full_summary_does_not_reuse_a_near_duplicate(self):
+        with mock.patch('summarizer.chunking.find_reusable_summary') as find:
+            refresh_watch(self.watch)
+        find.assert_not_called()
+
+    def test_fetch_failure_is_reported(self):
+        self.fetch_url.side_effect = requests.ConnectionError("refused")
+        refresh = refresh_watch(self.watch)
+        self.assertEqual(refresh['result'], 'error')
+        self.assertTrue(refresh['error'].startswith("Error fetching content from URL"))
+
+    def test_model_failure_is_answered_with_503(self):
+        self.fail_model()
+        response = self.client.post('/api/watches/', dict(OPTIONS, url=self.watch.url))
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(WatchedUrl.objects.exists())
@@ -0,0 +1,191 @@
+import wave
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .registry import lazy_module
+
+sr = lazy_module('speech_recognition')
+
+# Length of the blocks, in seconds, whose loudness decides where the audio is split.
+BLOCK_SECONDS = 0.1
+# Segments are cut at the first silent block after this many seconds.
+MIN_SEGMENT_SECONDS = 10
+# Segments without any silence are cut at this length.
+MAX_SEGMENT_SECONDS = 30
+# Audio repeated at the start of a segment following a cut made without silence, so no word is lost.
+OVERLAP_SECONDS = 1
+# Blocks quieter than this fraction of the maximum amplitude count as silence.
+SILENCE_THRESHOLD = 0.02
+# Number of segments transcribed at the same time.
+TRANSCRIPTION_WORKERS = 4
+# Longest run of words, at the end of one segment and the start of the next, merged as overlap.
+MAX_OVERLAP_WORDS = 8
+
+
+class TranscriptionBackend:
+    """
+    Interface of a speech-to-text backend transcribing one audio segment at a time.
+    """
+
+    def transcribe(self, audio: 'sr.AudioData') -> str:
+        """
+        Transcribes a segment of audio.
+
+        Args:
+            audio (sr.AudioData): The segment to transcribe.
+
+        Returns:
+            str: The transcript, or an empty string if no speech was recognized.
+
+        Raises:
+            sr.RequestError: If the recognition service cannot be reached.
+        """
+        raise NotImplementedError
+
+
+class GoogleTranscriptionBackend(TranscriptionBackend):
+    """
+    Transcribes audio with the Google Web Speech API.
+    """
+
+    def transcribe(self, audio: 'sr.AudioData') -> str:
+        try:
+            return sr.Recognizer().recognize_google(audio)
+        except sr.UnknownValueError:
+            return ""
+
+
+class SphinxTranscriptionBackend(TranscriptionBackend):
+    """
+    Transcribes audio offline with CMU Sphinx. Requires the pocketsphinx package.
+    """
+
+    def transcribe(self, audio: 'sr.AudioData') -> str:
+        try:
+            return sr.Recognizer().recognize_sphinx(audio)
+        except sr.UnknownValueError:
+            return ""
+
+
+def get_transcription_backend() -> TranscriptionBackend:
+    """
+    Returns an instance of the backend named by the SUMMARY_TRANSCRIPTION_BACKEND setting.
+    """
+    path = getattr(settings, 'SUMMARY_TRANSCRIPTION_BACKEND',
+                   'summarizer.transcription.GoogleTranscriptionBackend')
+    return import_string(path)()
+
+
+def _block_peak(frames: bytes, sample_width: int) -> int:
+    if sample_width not in (1, 2, 4):
+        # 24-bit samples have no array type; treat them as never silent.
+        return 2 ** (8 * sample_width - 1)
+    if sample_width == 1:
+        return max((abs(sample - 128) for sample in frames), default=0)
+    samples = array({2: 'h', 4: 'i'}[sample_width], frames)
+    return max(max(samples, default=0), -min(samples, default=0))
+
+
+def iter_wav_segments(file):
+    """
+    Reads a WAV file block by block and yields segments of at most MAX_SEGMENT_SECONDS.
+    Segments are cut in silence when possible; a cut made in the middle of speech repeats
+    the last OVERLAP_SECONDS at the start of the next segment. Only one segment is held
+    in memory at a time.
+
+    Args:
+        file: A file-like object representing the WAV file.
+
+    Yields:
+        sr.AudioData: Consecutive segments of the recording.
+    """
+    with wave.open(file, 'rb') as wav:
+        sample_rate = wav.getframerate()
+        sample_width = wav.getsampwidth()
+        channels = wav.getnchannels()
+        block_frames = max(1, int(sample_rate * BLOCK_SECONDS))
+        frame_bytes = sample_width * channels
+        full_scale = 2 ** (8 * sample_width - 1)
+        silence_level = full_scale * SILENCE_THRESHOLD
+        min_blocks = int(MIN_SEGMENT_SECONDS / BLOCK_SECONDS)
+        max_blocks = int(MAX_SEGMENT_SECONDS / BLOCK_SECONDS)
+        overlap_blocks = int(OVERLAP_SECONDS / BLOCK_SECONDS)
+
+        def to_audio(blocks):
+            data = b"".join(blocks)
+            if channels > 1:
+                # Keep the first channel; speech recognition expects mono audio.
+                data = b"".join(data[i:i + sample_width] for i in range(0, len(data), frame_bytes))
+            return sr.AudioData(data, sample_rate, sample_width)
+
+        segment = []
+        while True:
+            block = wav.readframes(block_frames)
+            if not block:
+                break
+            segment.append(block)
+            silent = _block_peak(block, sample_width) < silence_level
+            if len(segment) >= min_blocks and silent:
+                yield to_audio(segment)
+                segment = []
+            elif len(segment) >= max_blocks:
+                yield to_audio(segment)
+                segment = segment[-overlap_blocks:] if overlap_blocks else []
+
+        if segment:
+            yield to_audio(segment)
+
+
+def merge_transcripts(transcripts) -> str:
+    """
+    Joins segment transcripts in order, dropping words repeated because of overlapping segments.
+
+    Args:
+        transcripts: The transcripts of consecutive segments.
+
+    Returns:
+        str: The stitched transcript.
+    """
+    words = []
+    for transcript in transcripts:
+        new_words = transcript.split()
+        overlap = 0
+        for size in range(min(MAX_OVERLAP_WORDS, len(words), len(new_words)), 0, -1):
+            if [w.lower() for w in words[-size:]] == [w.lower() for w in new_words[:size]]:
+                overlap = size
+                break
+        words.extend(new_words[overlap:])
+    return " ".join(words)
+
+
+def transcribe_wav(file, backend: TranscriptionBackend = None) -> str:
+    """
+    Transcribes a WAV file by splitting it into segments and transcribing them concurrently.
+    At most twice TRANSCRIPTION_WORKERS segments are in flight, so memory stays bounded
+    regardless of the recording length.
+
+    Args:
+        file: A file-like object representing the WAV file.
+        backend (TranscriptionBackend): The backend to use, by default the configured one.
+
+    Returns:
+        str: The transcript of the whole recording.
+
+    Raises:
+        sr.RequestError: If the recognition service cannot be reached.
+    """
+    backend = backend or get_transcription_backend()
+    transcripts = []
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=TRANSCRIPTION_WORKERS) as executor:
+        for segment in iter_wav_segments(file):
+            pending.append(executor.submit(backend.transcribe, segment))
+            if len(pending) >= 2 * TRANSCRIPTION_WORKERS:
+                transcripts.append(pending.popleft().result())
+        while pending:
+            transcripts.append(pending.popleft().result())
+    return merge_transcripts(transcripts)
@@ -1,9 +1,18 @@
-from django.contrib import admin
-from django.urls import path, include
+from django.urls import path
 from summarizer.views import *
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
-    path('api/', include('summarizer.urls')),
+    path('', summarize_text, name='summarize_text'),
+    path('async/', summarize_text_async, name='summarize_text_async'),
+    path('batch/', summarize_batch, name='summarize_batch'),
     path('download-summary/', download_summary, name='download_summary'),
-]
\ No newline at end of file
+    path('download-summaries/', download_summaries, name='download_summaries'),
+    path('summaries/<uuid:summary_id>/', stored_summary, name='stored_summary'),
+    path('summaries/<uuid:summary_id>/download/', download_stored_summary, name='download_stored_summary'),
+    path('cache-stats/', cache_stats, name='cache_stats'),
+    path('jobs/', submit_summary_job, name='submit_summary_job'),
+    path('jobs/<uuid:job_id>/', summary_job_status, name='summary_job_status'),
+    path('watches/', watch_url, name='watch_url'),
+    path('watches/<uuid:watch_id>/', watched_url, name='watched_url'),
+    path('watches/<uuid:watch_id>/refresh/', refresh_watched_url, name='refresh_watched_url'),
+]
@@ -1,15 +1,21 @@
-import google.generativeai as genai
-from PyPDF2 import PdfReader
-from docx import Document
+import ipaddress
+import mmap
 import requests
-from bs4 import BeautifulSoup
-import json
+import socket
 from urllib.parse import urlparse
-import bleach
-from django.core.exceptions import ValidationError
 import re
-import magic
-import speech_recognition as sr
+from .registry import lazy_module
+from .docx_extraction import iter_docx_blocks
+from .pdf_extraction import PAGE_BREAK, iter_pdf_pages
+from .transcription import transcribe_wav
+from .fetch import fetch_url
+from .html_extraction import extract_main_text
+from .metrics import stage
+from .model_client import MODEL_NAME, SummaryGenerationError, get_generative_model, get_model_client
+
+# Heavy libraries are imported on first use, so processes that never need them do not pay for them.
+bleach = lazy_module("bleach")
+sr = lazy_module("speech_recognition")
 
 # 2.5MB - 2621440
 # 5MB - 5242880
@@ -26,16 +32,24 @@ ALLOWED_MIME_TYPES = {
     "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
     "wav": "audio/x-wav",
 }
+# Largest text accepted when typed directly into the input field.
+MAX_TEXT_LENGTH = 4096
+# Upper bound on the text extracted from a single document; longer documents are truncated.
+MAX_EXTRACTED_CHARS = 2000000
 
-# Configuring the generative AI model with the provided API key
-with open("config.json", "r") as config_file:
-    config = json.load(config_file)
-key = config["GEMINI_KEY"]
-if not key:
-    raise Exception("API key not found in config.json")
 
-genai.configure(api_key=key)
-model = genai.GenerativeModel(model_name="gemini-1.5-flash")
+def get_model():
+    """
+    Returns the generative AI model, configuring it with the API key from config.json on first use.
+    Summaries are requested through `get_model_client()`, which adds retries and circuit breaking.
+
+    Raises:
+        Exception: If the API key is missing from config.json.
+
+    Returns:
+        genai.GenerativeModel: The model shared by the whole process.
+    """
+    return get_generative_model(MODEL_NAME)
 
 def extract_text_from_input_field(text: str) -> str:
     """
@@ -50,82 +64,100 @@ def extract_text_from_input_field(text: str) -> str:
     return text
 
 
+class ExtractionError(Exception):
+    """
+    Raised when no text could be extracted from an uploaded file. The message is the error
+    reported to the client.
+    """
+
+
+@stage('extract_txt')
 def extract_text_from_txt(file) -> str:
     """
     Extracts text from a TXT file.
 
     Args:
-        file: A file-like object representing the TXT file.
+        file: A file-like object representing the TXT file, or its content as a bytes-like buffer.
+
+    Raises:
+        ExtractionError: If the file cannot be read.
 
     Returns:
-        str: Extracted text from the file, or an error message if reading fails.
+        str: Extracted text from the file.
     """
     try:
-        text = file.read()  # Reading file content
+        text = file if isinstance(file, (bytes, memoryview, mmap.mmap)) else file.read()  # Reading file content
+        if not isinstance(text, str):
+            text = str(text, "utf-8", errors="replace")
         return text
     except Exception as e:
-        return f"Error reading TXT file: {e}"
+        raise ExtractionError(f"Error reading TXT file: {e}") from e
 
 
+@stage('extract_pdf')
 def extract_text_from_pdf(file) -> str:
     """
-    Extracts text from a PDF file.
+    Extracts text from a PDF file, stopping once MAX_EXTRACTED_CHARS characters have been read.
 
     Args:
         file: A file-like object representing the PDF file.
 
+    Raises:
+        ExtractionError: If the PDF cannot be read.
+
     Returns:
-        str: Extracted text from the PDF, or an error message if reading fails.
+        str: Extracted text from the PDF.
     """
     try:
-        reader = PdfReader(file)
-        text = ''
-        for page in reader.pages:
-            text += page.extract_text()
-        return text
+        return PAGE_BREAK.join(iter_pdf_pages(file, max_chars=MAX_EXTRACTED_CHARS))
     except Exception as e:
-        return f"Error extracting text from PDF: {e}"
+        raise ExtractionError(f"Error extracting text from PDF: {e}") from e
 
+@stage('extract_docx')
 def extract_text_from_docx(file) -> str:
     """
-        Extracts text from a DOCX file.
+        Extracts text from a DOCX file: its headers, paragraphs, tables and text boxes,
+        stopping once MAX_EXTRACTED_CHARS characters have been read.
 
         Args:
             file: A file-like object representing the DOCX file.
 
+        Raises:
+            ExtractionError: If the DOCX file cannot be read.
+
         Returns:
-            str: Extracted text from the PDF, or an error message if reading fails.
+            str: Extracted text from the DOCX file.
     """
     try:
-        doc = Document(file)
-        text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-        return text
+        return "\n".join(iter_docx_blocks(file, max_chars=MAX_EXTRACTED_CHARS))
     except Exception as e:
-        return f"Error extracting text from PDF: {e}"
+        raise ExtractionError(f"Error extracting text from DOCX file: {e}") from e
 
+@stage('extract_wav')
 def extract_text_from_audio(file) -> str:
     """
-        Extracts text from an audio file using speech recognition.
+        Extracts text from an audio file using speech recognition. The recording is split into
+        segments that are transcribed concurrently by the configured transcription backend.
 
         Args:
             file (str): A file-like object representing the audio file (mp3, wav, etc.)
 
+        Raises:
+            ExtractionError: If the speech service cannot be reached or no speech was understood.
+
         Returns:
             str: Transcribed text from the audio file.
     """
-    recognizer = sr.Recognizer()
-    with sr.AudioFile(file) as source:
-        audio = recognizer.record(source)
-
     try:
-        text = recognizer.recognize_google(audio)
-        return text
-    except sr.UnknownValueError:
-        return "Error understanding the audio."
-    except sr.RequestError:
-        return "Error connecting to the service."
+        text = transcribe_wav(file)
+    except sr.RequestError as e:
+        raise ExtractionError("Error connecting to the service.") from e
+    if not text:
+        raise ExtractionError("Error understanding the audio.")
+    return text
 
 
+@stage('extract_url')
 def extract_text_from_url(url: str) -> str:
     """
     Extracts and returns the text content from a URL.
@@ -137,14 +169,128 @@ def extract_text_from_url(url: str) -> str:
         str: Extracted text from the webpage, or an error message if fetching fails.
     """
     try:
-        response = requests.get(url)
-        response.raise_for_status()  # Ensure successful request
-        soup = BeautifulSoup(response.text, "html.parser")
-        return soup.get_text()
+        return extract_main_text(fetch_url(url))
     except requests.RequestException as e:
         return f"Error fetching content from URL: {e}"
 
 
+FILE_EXTRACTORS = {
+    'txt': extract_text_from_txt,
+    'pdf': extract_text_from_pdf,
+    'docx': extract_text_from_docx,
+    'wav': extract_text_from_audio,
+}
+
+
+def build_summary_prompt(form: str, length: str, language: str, text: str, granularity: str) -> str:
+    """
+    Builds the model prompt for the requested summary.
+
+    Args:
+        form (str): The desired form of the summary ('text' or 'bullet').
+        length (str): The desired length of the summary as number of sentences (1-30).
+        language (str): The language in which the summary should be written (e.g., 'en', 'pl').
+        text (str): The input text to be summarized.
+        granularity (str): The granularity in which the summary should be written ('general', 'detailed').
+
+    Returns:
+        str: The prompt to send to the model.
+    """
+    if form == "bullet":
+        return f"Summarize the given text in {language} in form of {length} bullet points with key information, the summary should be {granularity}: {text}."
+    return f"Summarize the given text in {language} in form of a {length} sentence text, the summary should be {granularity}: {text}."
+
+
+def format_summary(form: str, response_text: str) -> str:
+    """
+    Cleans up the raw model output, placing every bullet point on its own line for bullet summaries.
+
+    Args:
+        form (str): The form of the summary ('text' or 'bullet').
+        response_text (str): The text returned by the model.
+
+    Returns:
+        str: The formatted summary.
+    """
+    if form == "bullet":
+        response_list = response_text.split()
+        for i in range(len(response_list)):
+            if response_list[i] == "*":
+                response_list[i] = "\n*"
+        return " ".join(response_list)
+    return " ".join(response_text.split())  # Clean up extra spaces
+
+
+class SummaryStreamFormatter:
+    """
+    Applies the `format_summary` cleanup incrementally to streamed model output. A token is only
+    emitted once the whitespace after it has arrived, so words split across chunks stay intact and
+    the concatenated output equals `format_summary` applied to the full text.
+
+    Args:
+        form (str): The form of the summary ('text' or 'bullet').
+    """
+
+    def __init__(self, form: str):
+        self.form = form
+        self._pending = ""
+        self._started = False
+
+    def _emit(self, tokens: list) -> str:
+        parts = []
+        for token in tokens:
+            if self.form == "bullet" and token == "*":
+                token = "\n*"
+            parts.append(" " + token if self._started else token)
+            self._started = True
+        return "".join(parts)
+
+    def feed(self, chunk: str) -> str:
+        """
+        Consumes a chunk of model output and returns the formatted text that is complete so far.
+        """
+        data = self._pending + chunk
+        tokens = data.split()
+        if tokens and not data[-1].isspace():
+            self._pending = tokens.pop()
+        else:
+            self._pending = ""
+        return self._emit(tokens)
+
+    def finish(self) -> str:
+        """
+        Returns the formatted remainder once the stream has ended.
+        """
+        tokens = self._pending.split()
+        self._pending = ""
+        return self._emit(tokens)
+
+
+def stream_summary(form: str, length: str, language: str, text: str, granularity: str):
+    """
+    Generates a summary as a stream, yielding formatted pieces as soon as the model produces them.
+
+    Args:
+        form (str): The desired form of the summary ('text' or 'bullet').
+        length (str): The desired length of the summary as number of sentences (1-30).
+        language (str): The language in which the summary should be written (e.g., 'en', 'pl').
+        text (str): The input text to be summarized.
+        granularity (str): The granularity in which the summary should be written ('general', 'detailed').
+
+    Yields:
+        str: Consecutive pieces of the formatted summary.
+    """
+    formatter = SummaryStreamFormatter(form)
+    prompt = build_summary_prompt(form, length, language, text, granularity)
+    for chunk in get_model_client().stream(prompt):
+        piece = formatter.feed(chunk)
+        if piece:
+            yield piece
+    piece = formatter.finish()
+    if piece:
+        yield piece
+
+
 def generate_summary(form: str, length: str, language: str, text: str, granularity: str) -> str:
     """
     Generates a summary for the provided text based on specified parameters.
@@ -158,26 +304,40 @@ def generate_summary(form: str, length: str, language: str, text: str, granulari
 
     Returns:
         str: The generated summary.
+
+    Raises:
+        SummaryGenerationError: If the model call failed.
     """
     try:
         # Generating the summary using the generative AI model
-        if form == "text":
-            prompt = f"Summarize the given text in {language} in form of a {length} sentence text, the summary should be {granularity}: {text}."
-            response = model.generate_content(prompt)
-            cleaned_response = " ".join(response.text.split())  # Clean up extra spaces
-            return cleaned_response
-        elif form == "bullet":
-            prompt = f"Summarize the given text in {language} in form of {length} bullet points with key information, the summary should be {granularity}: {text}."
-            response = model.generate_content(prompt)
-            response_list = response.text.split()
-            for i in range(len(response_list)):
-                if response_list[i] == "*":
-                    response_list[i] = "\n*"
-            formatted_response = " ".join(response_list)
-            return formatted_response
+        prompt = build_summary_prompt(form, length, language, text, granularity)
+        return format_summary(form, get_model_client().generate(prompt))
+    except Exception as e:
+        raise SummaryGenerationError(f"Error generating summary: {e}") from e
+
+
+async def generate_summary_async(form: str, length: str, language: str, text: str, granularity: str) -> str:
+    """
+    Asynchronous variant of `generate_summary` that does not block a worker thread while waiting for the model.
+
+    Args:
+        form (str): The desired form of the summary ('text' or 'bullet').
+        length (str): The desired length of the summary as number of sentences (1-30).
+        language (str): The language in which the summary should be written (e.g., 'en', 'pl').
+        text (str): The input text to be summarized.
+        granularity (str): The granularity in which the summary should be written ('general', 'detailed').
 
+    Returns:
+        str: The generated summary.
+
+    Raises:
+        SummaryGenerationError: If the model call failed.
+    """
+    try:
+        prompt = build_summary_prompt(form, length, language, text, granularity)
+        return format_summary(form, await get_model_client().generate_async(prompt))
     except Exception as e:
-        return f"Error generating summary: {e}"
+        raise SummaryGenerationError(f"Error generating summary: {e}") from e
 
 def extract_and_validate_url(text: str) -> str:
     """
@@ -200,6 +360,34 @@ def extract_and_validate_url(text: str) -> str:
 
     return ""
 
+def is_public_url(url: str) -> bool:
+    """
+    Checks that a URL uses http or https and that every address its host resolves to is a public
+    one, so server-side requests to it cannot reach loopback, private or link-local services.
+
+    Args:
+        url (str): The URL to check.
+
+    Returns:
+        bool: True if the URL may be requested by the server.
+    """
+    try:
+        parsed_url = urlparse(url)
+        if parsed_url.scheme not in ["http", "https"] or not parsed_url.hostname:
+            return False
+        port = parsed_url.port or (443 if parsed_url.scheme == "https" else 80)
+        addresses = socket.getaddrinfo(parsed_url.hostname, port, proto=socket.IPPROTO_TCP)
+    except (ValueError, UnicodeError, OSError):
+        return False
+    for *_, address in addresses:
+        ip = ipaddress.ip_address(address[0].split('%')[0])
+        if ip.version == 6 and ip.ipv4_mapped:
+            ip = ip.ipv4_mapped
+        if not ip.is_global or ip.is_multicast:
+            return False
+    return bool(addresses)
+
+@stage('sanitize')
 def sanitize_input(text):
     """
         Sanitizes the input text by removing potentially harmful HTML while preserving allowed tags.
@@ -220,6 +408,8 @@ def sanitize_input(text):
 def validate_uploaded_file(file):
     """
         Validates an uploaded file based on its size, extension, and MIME type.
+        Callers that go on to extract the file should use `ingestion.ingest_upload`,
+        which validates it in the same pass that maps its content.
 
         Args:
             file: The uploaded file object.
@@ -231,19 +421,7 @@ def validate_uploaded_file(file):
         Returns:
             file: The validated file object if it passes all checks.
     """
-    if file.size > int(MAX_UPLOAD_SIZE):
-        raise ValidationError(f"File is too large! Max size is {int(MAX_UPLOAD_SIZE)/(1024*1024)}MB.")
-
-    file_extension = file.name.split('.')[-1].lower()
-    if file_extension not in ALLOWED_MIME_TYPES:
-        raise ValidationError(f"File extension {file_extension} is not supported.")
-
-    mime = magic.Magic(mime=True)
-    file_mime_type = mime.from_buffer(file.read(2048))
-    file.seek(0)
-
-    expected_mime = ALLOWED_MIME_TYPES.get(file_extension)
-    if file_mime_type != expected_mime:
-        raise ValidationError(f"Invalid file format. Expected {expected_mime}, but got {file_mime_type}.")
+    from .ingestion import ingest_upload
 
+    ingest_upload(file).close()
     return file
\ No newline at end of file
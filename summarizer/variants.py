@@ -0,0 +1,190 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+from .backends import fallback_summary, get_summarizer_backend
+from .cache import get_summary_cache, make_cache_key
+from .chunking import CHUNK_TOKEN_BUDGET, reduce_to_budget
+from .metrics import stage
+from .model_client import SummaryGenerationError, get_model_client, track_models
+from .near_duplicates import find_reusable_summary
+from .prompt import estimate_tokens, prepare_text
+from .store import store_summary
+from .utils import format_summary
+
+# Model calls of one multi-variant request in flight at the same time.
+MAX_VARIANT_WORKERS = 4
+# Whether a variant differing from another one only in its language is translated from that
+# variant's summary instead of being generated from the document again.
+TRANSLATE_VARIANTS = getattr(settings, 'SUMMARY_TRANSLATE_VARIANTS', True)
+# Long documents are condensed once for all variants, keeping their own language.
+SOURCE_LANGUAGE = "the language of the document"
+
+
+def translate_summary(form: str, summary: str, language: str) -> str:
+    """
+    Translates a finished summary into another language, keeping its form and length.
+    The prompt holds the summary only, so it costs a fraction of summarizing the document again.
+
+    Args:
+        form (str): The form of the summary ('text' or 'bullet').
+        summary (str): The summary to translate.
+        language (str): The target language.
+
+    Returns:
+        str: The translated summary.
+    """
+    shape = "every bullet point starting with '*'" if form == 'bullet' else "the same number of sentences"
+    prompt = f"Translate this summary into {language}, keeping {shape} and nothing else: {summary}"
+    return format_summary(form, get_model_client().generate(prompt))
+
+
+class VariantSummarizer:
+    """
+    Produces several summaries of one extracted text, one per variant (a combination of form,
+    length, language and granularity). The text is prepared, and condensed if it is too long,
+    once for all variants; variants found in the summary cache cost nothing; the remaining ones
+    are generated concurrently, and variants that only differ by language are translated from
+    the first summary of their group.
+
+    Args:
+        text (str): The extracted text to be summarized.
+        input_type (str): The input type of the request, recorded with the stored summaries.
+        client (str): The identity of the requesting client, allowed to read the stored summaries back.
+    """
+
+    def __init__(self, text: str, input_type: str, client: str = ''):
+        self.text = text
+        self.input_type = input_type
+        self.client = client
+        self._granularity = 'general'
+        self._condensed = None
+        self._condense_error = None
+        self._condense_models = []
+        self._condense_lock = threading.Lock()
+
+    def _source_text(self) -> str:
+        # Prepared, and condensed if needed, by the first variant generated from the document.
+        with self._condense_lock:
+            if self._condensed is None:
+                with track_models() as models:
+                    prepared = prepare_text(self.text)
+                    if estimate_tokens(prepared) > CHUNK_TOKEN_BUDGET:
+                        try:
+                            prepared = reduce_to_budget(prepared, SOURCE_LANGUAGE, self._granularity)
+                        except Exception as e:
+                            self._condense_error = e
+                self._condensed = prepared
+                self._condense_models = list(models)
+        return self._condensed
+
+    def _summarize_document(self, variant: dict) -> str:
+        reused = find_reusable_summary(self.text, **variant)
+        if reused is not None:
+            return reused
+        text = self._source_text()
+        if self._condense_error is not None:
+            summary = fallback_summary(variant['form'], variant['length'], text)
+            if summary is None:
+                raise SummaryGenerationError(f"Error generating summary: {self._condense_error}")
+            return summary
+        return get_summarizer_backend().summarize(variant['form'], variant['length'], variant['language'], text,
+                                                  variant['granularity'])
+
+    def _generate(self, result: dict, source: str = None):
+        variant = result['variant']
+        started = time.perf_counter()
+        summary = None
+        try:
+            with track_models() as models:
+                if source is not None:
+                    try:
+                        summary = translate_summary(variant['form'], source, variant['language'])
+                    except Exception:
+                        summary = None
+                if summary is None:
+                    summary = self._summarize_document(variant)
+                    models[:0] = [name for name in self._condense_models if name not in models]
+        except SummaryGenerationError as e:
+            result['error'] = str(e)
+        finally:
+            # Worker threads open their own database connections for the cache; do not leak them.
+            connections.close_all()
+        result.update(summary=summary, models=list(models), seconds=time.perf_counter() - started)
+
+    def _translate(self, pair):
+        result, pivot = pair
+        source = pivot['summary']
+        if source is None or not getattr(source, 'cacheable', True):
+            # Failed and degraded summaries are not worth translating; use the document instead.
+            source = None
+        self._generate(result, source)
+
+    def _store(self, result: dict):
+        variant = result['variant']
+        summary = result['summary']
+        if summary is None:
+            result['stored'] = None
+            return
+        if result['models'] and getattr(summary, 'cacheable', True):
+            get_summary_cache().set(result['cache_key'], summary)
+        result['stored'] = store_summary(result['cache_key'], self.text, summary, self.input_type,
+                                         variant['form'], variant['length'], variant['language'],
+                                         variant['granularity'], result['models'], result['seconds'], self.client)
+
+    @stage('variants')
+    def summarize(self, variants: list) -> list:
+        """
+        Summarizes the text once per variant.
+
+        Args:
+            variants (list): Distinct dictionaries with `form`, `length`, `language` and `granularity`.
+
+        Returns:
+            list: One dictionary per variant, in the given order, with the variant, its `summary`
+            (None if it failed, with the message in `error`), its `cache_key` and its `stored`
+            record (or None).
+        """
+        summary_cache = get_summary_cache()
+        results = []
+        for variant in variants:
+            cache_key = make_cache_key(self.text, **variant)
+            summary = summary_cache.get(cache_key)
+            results.append({'variant': variant, 'cache_key': cache_key, 'summary': summary, 'models': [],
+                            'seconds': 0.0})
+
+        # Group the variants missing from the cache by everything but the language. Without
+        # translation every variant is generated from the document.
+        groups = {}
+        for result in results:
+            variant = result['variant']
+            group_key = (variant['form'], variant['length'], variant['granularity'])
+            if not TRANSLATE_VARIANTS:
+                group_key += (variant['language'],)
+            groups.setdefault(group_key, []).append(result)
+
+        pivots, translations = [], []
+        for group in groups.values():
+            missing = [result for result in group if result['summary'] is None]
+            if not missing:
+                continue
+            cached = [result for result in group if result['summary'] is not None]
+            if cached:
+                translations.extend((result, cached[0]) for result in missing)
+            else:
+                pivots.append(missing[0])
+                translations.extend((result, missing[0]) for result in missing[1:])
+
+        if any(result['variant']['granularity'] == 'detailed' for result in results):
+            # Keep detail if any variant asks for it; the condensed text serves every granularity.
+            self._granularity = 'detailed'
+        with ThreadPoolExecutor(max_workers=MAX_VARIANT_WORKERS) as executor:
+            list(executor.map(self._generate, pivots))
+            list(executor.map(self._translate, translations))
+
+        for result in results:
+            self._store(result)
+        return results
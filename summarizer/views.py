@@ -1,19 +1,186 @@
+import asyncio
+import functools
 import json
-from docx import Document
-from django.http import HttpResponse
+import time
+from contextlib import asynccontextmanager
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
-from .utils import extract_text_from_txt, extract_text_from_pdf, extract_text_from_url, generate_summary, \
-    sanitize_input, validate_uploaded_file, extract_and_validate_url, extract_text_from_docx, extract_text_from_audio
+from .utils import extract_text_from_url, sanitize_input, extract_and_validate_url, generate_summary_async, \
+    stream_summary, ExtractionError, MAX_TEXT_LENGTH
+from .async_utils import extract_text_from_url_async, extract_text_from_upload_async
+from .ingestion import ingest_upload, extract_text_from_upload
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from .serializers import SummarizationSerializer
-from django.views.decorators.csrf import csrf_protect, csrf_exempt
+from .serializers import SummarizationSerializer, SummarizationJobSerializer, BatchSummarizationSerializer, \
+    SummaryExportSerializer, BulkSummaryExportSerializer, WatchedUrlSerializer
+from .batch import BatchSummarizer
+from .cache import get_summary_cache, make_cache_key
+from .jobs import enqueue_job, queue_depth, serialize_job, store_job_upload
+from .models import SummaryJob, WatchedUrl
+from .store import get_stored_summary, iter_stored_summaries, missing_summary_ids, serialize_stored_summary, \
+    store_summary
+from .export import EXPORTERS, export_archive, export_summary, get_exporter
+from .variants import VariantSummarizer
+from .near_duplicates import find_reusable_summary
+from .watch import FAILED, refresh_watch, serialize_watch
+from .admission import INTERACTIVE, SlotReleasingStream, client_identity, get_admission_controller, rejects_with_429
+from .chunking import summarize_document, reduce_to_budget, estimate_tokens, CHUNK_TOKEN_BUDGET
+from .prompt import prepare_text
+from .backends import fallback_summary
+from .model_client import SummaryGenerationError, get_model_client, track_models
+from .metrics import OUTPUT_CHARACTERS, record_sizes, render_metrics, stage
+from django.views.decorators.csrf import csrf_exempt
 from django.core.exceptions import ValidationError
+from django.db import connections
 
-MAX_TEXT_LENGTH = 4096
+def _model_failure_response(error: SummaryGenerationError) -> JsonResponse:
+    # Summaries that failed after every retry are reported as 503 with a hint when to come back.
+    return JsonResponse({'error': str(error)}, status=503,
+                        headers={'Retry-After': str(get_model_client().retry_after())})
+
+
+def fails_with_503(view):
+    """
+    Decorates a view, sync or async, so that SummaryGenerationError raised while handling the
+    request is answered with 503 Service Unavailable and a Retry-After header.
+    """
+    if asyncio.iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            try:
+                return await view(request, *args, **kwargs)
+            except SummaryGenerationError as e:
+                return _model_failure_response(e)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except SummaryGenerationError as e:
+            return _model_failure_response(e)
+    return wrapper
+
+
+def _sse_event(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+def _summary_payload(summary: str, stored) -> dict:
+    # The id is only returned when the summary could be stored for retrieval.
+    payload = {'summary': summary}
+    if stored is not None:
+        payload['summary_id'] = str(stored.id)
+    if getattr(summary, 'degraded', False):
+        # Extractive fallback served while the model fails, in the language of the document.
+        payload['degraded'] = True
+    if hasattr(summary, 'source_id'):
+        # Served from the stored summary of a near-identical text.
+        payload['near_duplicate'] = {'summary_id': str(summary.source_id), 'similarity': summary.similarity}
+    return payload
+
+
+def _variants_payload(results: list) -> dict:
+    """
+    Builds the response to a request for several summary variants. Each variant carries its
+    options and either its summary or its error.
+
+    Raises:
+        SummaryGenerationError: If no variant could be produced.
+    """
+    summaries = []
+    for result in results:
+        entry = dict(result['variant'])
+        summary = result['summary']
+        if summary is None:
+            entry['error'] = result['error']
+        else:
+            OUTPUT_CHARACTERS.observe(len(summary))
+            entry.update(_summary_payload(summary, result['stored']))
+        summaries.append(entry)
+    if all('error' in entry for entry in summaries):
+        raise SummaryGenerationError(summaries[0]['error'])
+    return {'summaries': summaries}
+
+
+def _summarize_variants_in_thread(text: str, input_type: str, variants: list, client: str) -> list:
+    # Runs in a thread of its own under the async view; close the connections it opened.
+    try:
+        return VariantSummarizer(text, input_type, client).summarize(variants)
+    finally:
+        connections.close_all()
+
+
+def summary_event_stream(form, length, language, text, granularity, input_type='text', client=''):
+    """
+    Streams a summary as Server-Sent Events. Every formatted piece is sent as a `delta` event,
+    followed by a `done` event carrying the full summary and its stored id, or an `error` event
+    if generation fails. Cached summaries are sent as a single delta.
+
+    Args:
+        form (str): The desired form of the summary ('text' or 'bullet').
+        length (int): The desired length of the summary.
+        language (str): The language of the summary.
+        text (str): The extracted text to be summarized.
+        granularity (str): The granularity of the summary ('general', 'detailed').
+        input_type (str): The input type of the request, recorded with the stored summary.
+        client (str): The identity of the requesting client, allowed to read the stored summary back.
+
+    Yields:
+        str: Encoded Server-Sent Events.
+    """
+    summary_cache = get_summary_cache()
+    cache_key = make_cache_key(text, form, length, language, granularity)
+    started = time.perf_counter()
+    summary = summary_cache.get(cache_key)
+    if summary is not None:
+        stored = store_summary(cache_key, text, summary, input_type, form, length, language, granularity, [],
+                               time.perf_counter() - started, client)
+        yield _sse_event('delta', {'text': summary})
+        yield _sse_event('done', _summary_payload(summary, stored))
+        return
+
+    pieces = []
+    prepared = text
+    with track_models() as models:
+        summary = find_reusable_summary(text, form, length, language, granularity)
+        if summary is not None:
+            summary_cache.set(cache_key, summary)
+            stored = store_summary(cache_key, text, summary, input_type, form, length, language, granularity,
+                                   models, time.perf_counter() - started, client)
+            yield _sse_event('delta', {'text': summary})
+            yield _sse_event('done', _summary_payload(summary, stored))
+            return
+        try:
+            prepared = prepare_text(text)
+            if estimate_tokens(prepared) > CHUNK_TOKEN_BUDGET:
+                prepared = reduce_to_budget(prepared, language, granularity)
+            for piece in stream_summary(form=form, length=length, language=language, text=prepared,
+                                        granularity=granularity):
+                pieces.append(piece)
+                yield _sse_event('delta', {'text': piece})
+        except Exception as e:
+            summary = None if pieces else fallback_summary(form, length, prepared)
+            if summary:
+                stored = store_summary(cache_key, text, summary, input_type, form, length, language, granularity,
+                                       models, time.perf_counter() - started, client)
+                yield _sse_event('delta', {'text': summary})
+                yield _sse_event('done', _summary_payload(summary, stored))
+            else:
+                yield _sse_event('error', {'error': f"Error generating summary: {e}"})
+            return
+
+    summary = "".join(pieces)
+    summary_cache.set(cache_key, summary)
+    stored = store_summary(cache_key, text, summary, input_type, form, length, language, granularity, models,
+                           time.perf_counter() - started, client)
+    yield _sse_event('done', _summary_payload(summary, stored))
 
 
 @api_view(['POST'])
+@rejects_with_429
+@fails_with_503
 def summarize_text(request):
     """
     This view handles the summarization of text based on the input type.
@@ -23,11 +190,18 @@ def summarize_text(request):
         request (HttpRequest): The HTTP request object containing the data.
 
     Returns:
-        JsonResponse: A response with either the summary or an error message.
+        JsonResponse: A response with either the summary or an error message, 429 when the
+        client's quota is exhausted or the server is too busy, or 503 when the model failed.
     """
-    serializer = SummarizationSerializer(data=request.data)
+    admission = get_admission_controller()
+    client = client_identity(request)
+    admission.check_request(client)
+
+    with stage('validate_request'):
+        serializer = SummarizationSerializer(data=request.data)
+        valid = serializer.is_valid()
 
-    if serializer.is_valid():
+    if valid:
         data = serializer.validated_data
         input_type = data['input_type']
         form = data['form']
@@ -53,45 +227,510 @@ def summarize_text(request):
             uploaded_file = data['file']
 
             try:
-                validate_uploaded_file(uploaded_file)
+                upload = ingest_upload(uploaded_file)
             except ValidationError as e:
                 return Response({'error': str(e)}, status=400)
 
-            if uploaded_file.name.endswith('.txt'):
-                text = extract_text_from_txt(uploaded_file)
-            elif uploaded_file.name.endswith('.pdf'):
-                text = extract_text_from_pdf(uploaded_file)
-            elif uploaded_file.name.endswith('.docx'):
-                text = extract_text_from_docx(uploaded_file)
-            elif uploaded_file.name.endswith('.wav'):
-                text = extract_text_from_audio(uploaded_file)
-            else:
-                return Response({'error': 'Unsupported file format'}, status=400)
+            with upload:
+                try:
+                    text = extract_text_from_upload(upload)
+                except ExtractionError as e:
+                    return Response({'error': str(e)}, status=400)
 
         if not text:
             return Response({'error': 'No valid text found'}, status=400)
+        input_bytes = upload.size if input_type == 'file' else len(data['text'].encode('utf-8'))
+        record_sizes(input_type, input_bytes, text, estimate_tokens(text))
+        admission.charge_tokens(client, estimate_tokens(text))
+
+        if len(data['variants']) > 1:
+            with admission.slot():
+                results = VariantSummarizer(text, input_type, client).summarize(data['variants'])
+            return Response(_variants_payload(results), status=200)
 
-        summary = generate_summary(form=form, length=length, language=language, text=text, granularity=granularity)
-        return Response({'summary': summary}, status=200)
+        if data.get('stream'):
+            # The slot is taken before the response starts, so a busy server still answers 429.
+            slot = admission.slot()
+            response = StreamingHttpResponse(
+                SlotReleasingStream(
+                    summary_event_stream(form, length, language, text, granularity, input_type, client), slot),
+                content_type='text/event-stream',
+            )
+            response['Cache-Control'] = 'no-cache'
+            response['X-Accel-Buffering'] = 'no'  # Keep reverse proxies from buffering the stream
+            return response
+
+        cache_key = make_cache_key(text, form, length, language, granularity)
+        started = time.perf_counter()
+        def generate():
+            with admission.slot():
+                return summarize_document(form=form, length=length, language=language, text=text,
+                                          granularity=granularity)
+
+        with track_models() as models:
+            summary = get_summary_cache().get_or_generate(cache_key, generate)
+        OUTPUT_CHARACTERS.observe(len(summary))
+        stored = store_summary(cache_key, text, summary, input_type, form, length, language, granularity, models,
+                               time.perf_counter() - started, client)
+        return Response(_summary_payload(summary, stored), status=200)
 
     return Response({'error': serializer.errors}, status=400)
 
+async def _summarize_async(summary_cache, cache_key, form, length, language, text, granularity) -> str:
+    summary = await sync_to_async(summary_cache.get)(cache_key)
+    if summary is None:
+        async with _admission_slot():
+            summary = await _generate_async(form, length, language, text, granularity)
+        if summary and getattr(summary, 'cacheable', True):
+            await sync_to_async(summary_cache.set)(cache_key, summary)
+    return summary
+
+async def _generate_async(form, length, language, text, granularity) -> str:
+    reused = await sync_to_async(find_reusable_summary)(text, form, length, language, granularity)
+    if reused is not None:
+        return reused
+    text = await sync_to_async(prepare_text, thread_sensitive=False)(text)
+    if estimate_tokens(text) > CHUNK_TOKEN_BUDGET:
+        return await sync_to_async(summarize_document, thread_sensitive=False)(
+            form=form, length=length, language=language, text=text, granularity=granularity)
+    try:
+        return await generate_summary_async(form=form, length=length, language=language, text=text,
+                                            granularity=granularity)
+    except SummaryGenerationError:
+        summary = fallback_summary(form, length, text)
+        if summary is None:
+            raise
+        return summary
+
+@asynccontextmanager
+async def _admission_slot():
+    slot = await get_admission_controller().slot_async()
+    try:
+        yield slot
+    finally:
+        slot.release()
+
+@rejects_with_429
+@fails_with_503
+async def summarize_text_async(request):
+    """
+    Asynchronous variant of `summarize_text` for deployments served over ASGI.
+    URL fetching and the model call are awaited, and file extraction runs in a thread pool,
+    so a slow upstream does not tie up a worker.
+
+    Args:
+        request (HttpRequest): The HTTP request object containing the data.
+
+    Returns:
+        JsonResponse: A response with either the summary or an error message, 429 when the
+        client's quota is exhausted or the server is too busy, or 503 when the model failed.
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+
+    admission = get_admission_controller()
+    client = client_identity(request)
+    await sync_to_async(admission.check_request)(client)
+
+    if request.content_type == 'application/json':
+        try:
+            payload = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    else:
+        # Repeated fields list several summary variants.
+        payload = {key: values if len(values) > 1 else values[0] for key, values in request.POST.lists()}
+        payload.update(request.FILES.dict())
+
+    with stage('validate_request'):
+        serializer = SummarizationSerializer(data=payload)
+        valid = serializer.is_valid()
+    if not valid:
+        return JsonResponse({'error': serializer.errors}, status=400)
+
+    data = serializer.validated_data
+    input_type = data['input_type']
+    form = data['form']
+    length = data['length']
+    language = data['language']
+    granularity = data['granularity']
+    text = None
+
+    if input_type == 'text':
+        raw_text = data['text']
+        url = extract_and_validate_url(raw_text)
+
+        if url and raw_text.startswith(url):
+            text = await extract_text_from_url_async(url)
+            if not text:
+                return JsonResponse({'error': 'Invalid or unsafe URL'}, status=400)
+        else:
+            text = sanitize_input(raw_text)
+            if len(text) > MAX_TEXT_LENGTH:
+                return JsonResponse({'error': f'Text is too long! Max size is {MAX_TEXT_LENGTH} characters.'}, status=400)
+
+    elif input_type == 'file':
+        uploaded_file = data['file']
+
+        try:
+            upload = await sync_to_async(ingest_upload, thread_sensitive=False)(uploaded_file)
+        except ValidationError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        with upload:
+            try:
+                text = await extract_text_from_upload_async(upload)
+            except ExtractionError as e:
+                return JsonResponse({'error': str(e)}, status=400)
+
+    if not text:
+        return JsonResponse({'error': 'No valid text found'}, status=400)
+    input_bytes = upload.size if input_type == 'file' else len(data['text'].encode('utf-8'))
+    record_sizes(input_type, input_bytes, text, estimate_tokens(text))
+    await sync_to_async(admission.charge_tokens)(client, estimate_tokens(text))
+
+    if len(data['variants']) > 1:
+        async with _admission_slot():
+            results = await sync_to_async(_summarize_variants_in_thread, thread_sensitive=False)(
+                text, input_type, data['variants'], client)
+        return JsonResponse(_variants_payload(results), status=200)
+
+    summary_cache = get_summary_cache()
+    cache_key = make_cache_key(text, form, length, language, granularity)
+    started = time.perf_counter()
+    with track_models() as models:
+        summary = await _summarize_async(summary_cache, cache_key, form, length, language, text, granularity)
+    OUTPUT_CHARACTERS.observe(len(summary))
+    stored = await sync_to_async(store_summary)(cache_key, text, summary, input_type, form, length, language,
+                                                granularity, models, time.perf_counter() - started, client)
+    return JsonResponse(_summary_payload(summary, stored), status=200)
+
+# Django 4.2 decorators wrap views synchronously, so the async view opts out of CSRF checks directly.
+summarize_text_async.csrf_exempt = True
+
+@api_view(['POST'])
+@rejects_with_429
+def submit_summary_job(request):
+    """
+    Queues a summarization job and returns its id immediately. Extraction and summarization
+    run in a background worker; the result is available from `summary_job_status` and is
+    also posted to `callback_url` when one is given.
+
+    Args:
+        request (HttpRequest): The HTTP request object containing the data.
+
+    Returns:
+        Response: A 202 response with the job id and the current queue depth, or an error message.
+    """
+    get_admission_controller().check_request(client_identity(request))
+    serializer = SummarizationJobSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({'error': serializer.errors}, status=400)
+
+    data = serializer.validated_data
+    job = SummaryJob(
+        input_type=data['input_type'],
+        form=data['form'],
+        length=data['length'],
+        language=data['language'],
+        granularity=data['granularity'],
+        callback_url=data.get('callback_url', ''),
+    )
+
+    if job.input_type == 'text':
+        job.text = data['text']
+        url = extract_and_validate_url(job.text)
+        if not (url and job.text.startswith(url)) and len(sanitize_input(job.text)) > MAX_TEXT_LENGTH:
+            return Response({'error': f'Text is too long! Max size is {MAX_TEXT_LENGTH} characters.'}, status=400)
+    elif job.input_type == 'url':
+        job.url = data['url']
+    else:
+        uploaded_file = data['file']
+        try:
+            upload = ingest_upload(uploaded_file)
+        except ValidationError as e:
+            return Response({'error': str(e)}, status=400)
+        with upload:
+            job.file_extension = upload.extension
+            job.file_path = store_job_upload(upload)
+
+    job.save()
+    enqueue_job(job)
+    return Response({'job_id': str(job.id), 'status': job.status, 'queue_depth': queue_depth()}, status=202)
+
+@api_view(['GET'])
+def summary_job_status(request, job_id):
+    """
+    Returns the status of a summarization job, with its summary once it has finished.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        job_id (UUID): The id returned by `submit_summary_job`.
+
+    Returns:
+        Response: A response with the job status, result and per-stage timings.
+    """
+    job = SummaryJob.objects.filter(pk=job_id).first()
+    if job is None:
+        return Response({'error': 'Job not found'}, status=404)
+    data = serialize_job(job)
+    data['queue_depth'] = queue_depth()
+    return Response(data, status=200)
+
+def _watch_response(watch: WatchedUrl, refresh: dict, status: int = 200) -> Response:
+    # A page that cannot be fetched is a client error; model failures raise and are answered with 503.
+    if refresh['result'] == FAILED:
+        return Response({'error': refresh['error']}, status=400)
+    data = serialize_watch(watch)
+    data['refresh'] = refresh
+    return Response(data, status=status)
+
+@api_view(['POST'])
+@rejects_with_429
+@fails_with_503
+def watch_url(request):
+    """
+    Starts watching a URL: its page is summarized with the given options and its text is kept
+    in blocks for incremental refreshes. Watching a URL already watched with the same options
+    refreshes the existing watch instead.
+
+    Args:
+        request (HttpRequest): The HTTP request object with `url`, `form`, `length`, `language` and `granularity`.
+
+    Returns:
+        Response: The watch with its summary and the result of the refresh, or an error message.
+    """
+    get_admission_controller().check_request(client_identity(request))
+    serializer = WatchedUrlSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({'error': serializer.errors}, status=400)
+
+    watch = WatchedUrl.objects.filter(**serializer.validated_data).first()
+    created = watch is None
+    if created:
+        watch = WatchedUrl(**serializer.validated_data)
+    refresh = refresh_watch(watch, INTERACTIVE, bounded=True)
+    return _watch_response(watch, refresh, status=201 if created else 200)
+
+@api_view(['GET', 'DELETE'])
+def watched_url(request, watch_id):
+    """
+    Returns a watched URL with its latest summary, or stops watching it.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        watch_id (UUID): The `watch_id` returned by `watch_url`.
+
+    Returns:
+        Response: The watch, an empty 204 response once deleted, or 404 if it does not exist.
+    """
+    watch = WatchedUrl.objects.filter(pk=watch_id).first()
+    if watch is None:
+        return Response({'error': 'Watch not found'}, status=404)
+    if request.method == 'DELETE':
+        watch.delete()
+        return Response(status=204)
+    return Response(serialize_watch(watch), status=200)
+
+@api_view(['POST'])
+@rejects_with_429
+@fails_with_503
+def refresh_watched_url(request, watch_id):
+    """
+    Fetches a watched URL again and updates its summary. The model is not called when no block
+    of the page changed, and only the changed blocks are sent to it when a few did.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        watch_id (UUID): The `watch_id` returned by `watch_url`.
+
+    Returns:
+        Response: The watch with its summary and the result of the refresh, or an error message.
+    """
+    get_admission_controller().check_request(client_identity(request))
+    watch = WatchedUrl.objects.filter(pk=watch_id).first()
+    if watch is None:
+        return Response({'error': 'Watch not found'}, status=404)
+    return _watch_response(watch, refresh_watch(watch, INTERACTIVE, bounded=True))
+
+@api_view(['POST'])
+@rejects_with_429
+def summarize_batch(request):
+    """
+    Summarizes many documents in one request. The body holds a list of `items`, each with the
+    fields of a single `/api/` request; for file items `file` names the multipart field holding
+    the upload, and `items` is then sent as a JSON string. Results are streamed back as NDJSON,
+    one line per item as soon as it is ready, and a failing item does not affect the others.
+
+    Args:
+        request (HttpRequest): The HTTP request object containing the items.
+
+    Returns:
+        StreamingHttpResponse: An NDJSON stream of `{"index", "summary"}` or `{"index", "error"}` lines.
+    """
+    payload = request.data
+    items = payload.get('items')
+    if isinstance(items, str):
+        try:
+            items = json.loads(items)
+        except ValueError:
+            return Response({'error': 'Invalid JSON in items'}, status=400)
+
+    serializer = BatchSummarizationSerializer(data={'items': items})
+    if not serializer.is_valid():
+        return Response({'error': serializer.errors}, status=400)
+
+    # Every item counts as a request; items are then charged their input tokens and run at batch priority.
+    client = client_identity(request)
+    items = serializer.validated_data['items']
+    get_admission_controller().check_request(client, len(items))
+    results = BatchSummarizer(client).run(items, request.FILES)
+    return StreamingHttpResponse(
+        (json.dumps(result) + "\n" for result in results),
+        content_type='application/x-ndjson',
+    )
+
+@api_view(['GET'])
+def cache_stats(request):
+    """
+    Returns the hit, miss and eviction counters of every summary cache tier.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        Response: A response with the statistics of each cache backend.
+    """
+    return Response({'cache': get_summary_cache().info()}, status=200)
+
+@require_http_methods(["GET"])
+def prometheus_metrics(request):
+    """
+    Exposes the latency histograms, size histograms and counters of this process in the
+    Prometheus text format.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        HttpResponse: The metrics in text exposition format 0.0.4.
+    """
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def _export_response(summary: str, export_format: str, stem: str = 'summary') -> HttpResponse:
+    exporter = get_exporter(export_format)
+    response = HttpResponse(content_type=exporter.content_type)
+    response['Content-Disposition'] = f'attachment; filename={stem}.{exporter.extension}'
+    # The chunks go to the response as they are; the pre-compressed template parts of a DOCX are not copied.
+    for chunk in export_summary(summary, export_format):
+        response.write(chunk)
+    return response
+
+@api_view(['GET'])
+def stored_summary(request, summary_id):
+    """
+    Returns a stored summary with its options, model, token counts and timings. Summaries returned
+    to another client are answered like missing ones.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        summary_id (UUID): The `summary_id` returned with the summary.
+
+    Returns:
+        Response: The stored summary, or 404 if it does not exist, has been pruned or belongs to another client.
+    """
+    stored = get_stored_summary(summary_id, client_identity(request))
+    if stored is None:
+        return Response({'error': 'Summary not found'}, status=404)
+    return Response(serialize_stored_summary(stored), status=200)
+
+@require_http_methods(["GET"])
+def download_stored_summary(request, summary_id):
+    """
+    Downloads a stored summary as a document, without the client sending it back.
+    The `format` query parameter selects DOCX (the default), PDF, Markdown or plain text.
+    Only the client the summary was returned to may download it.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        summary_id (UUID): The `summary_id` returned with the summary.
+
+    Returns:
+        HttpResponse: The document, or 404 if the summary does not exist, has been pruned or belongs
+        to another client.
+    """
+    export_format = request.GET.get('format', 'docx')
+    if export_format not in EXPORTERS:
+        return JsonResponse({'error': f'Unsupported format {export_format}.'}, status=400)
+    stored = get_stored_summary(summary_id, client_identity(request))
+    if stored is None:
+        return JsonResponse({'error': 'Summary not found'}, status=404)
+    return _export_response(stored.summary, export_format, f'summary-{stored.id}')
+
+def _export_payload(request):
+    try:
+        return json.loads(request.body)
+    except ValueError:
+        return None
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def download_summary(request):
+    """
+    Exports a summary sent by the client as a document: DOCX (the default), PDF, Markdown or
+    plain text, chosen with `format`. Bullet summaries are exported as list items.
 
-    data = json.loads(request.body)
-    summary = data.get('summary', '')
+    Args:
+        request (HttpRequest): The HTTP request object with a JSON body holding `summary` and `format`.
 
-    doc = Document()
-    doc.add_heading('Summary Document', 0)
-    doc.add_paragraph(summary)
+    Returns:
+        HttpResponse: The document, or an error message.
+    """
+    payload = _export_payload(request)
+    if payload is None:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    serializer = SummaryExportSerializer(data=payload)
+    if not serializer.is_valid():
+        return JsonResponse({'error': serializer.errors}, status=400)
+    data = serializer.validated_data
+    return _export_response(data['summary'], data['format'])
 
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-    )
-    response['Content-Disposition'] = 'attachment; filename=summary.docx'
+@csrf_exempt
+@require_http_methods(["POST"])
+def download_summaries(request):
+    """
+    Exports many summaries as one ZIP archive of documents in the same `format`. The body holds
+    summary texts in `summaries` and/or stored summary ids in `summary_ids`. The archive is
+    streamed while it is built, one document at a time. Stored summaries returned to another
+    client are reported as missing.
+
+    Args:
+        request (HttpRequest): The HTTP request object with a JSON body.
+
+    Returns:
+        StreamingHttpResponse: The ZIP archive, or an error message.
+    """
+    payload = _export_payload(request)
+    if payload is None:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    serializer = BulkSummaryExportSerializer(data=payload)
+    if not serializer.is_valid():
+        return JsonResponse({'error': serializer.errors}, status=400)
+    data = serializer.validated_data
+
+    client = client_identity(request)
+    summary_ids = data.get('summary_ids', [])
+    missing = missing_summary_ids(summary_ids, client)
+    if missing:
+        return JsonResponse({'error': 'Summaries not found', 'missing': [str(summary_id) for summary_id in missing]},
+                            status=404)
 
-    doc.save(response)
+    def entries():
+        for index, summary in enumerate(data.get('summaries', []), 1):
+            yield f'summary-{index}', summary
+        for stored in iter_stored_summaries(summary_ids, client):
+            yield f'summary-{stored.id}', stored.summary
 
-    return response
\ No newline at end of file
+    response = StreamingHttpResponse(export_archive(entries(), data['format']), content_type='application/zip')
+    response['Content-Disposition'] = 'attachment; filename=summaries.zip'
+    return response
@@ -0,0 +1,247 @@
+import difflib
+import hashlib
+import logging
+import time
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+
+from .admission import BATCH, get_admission_controller
+from .cache import get_summary_cache, make_cache_key
+from .chunking import CHUNK_TOKEN_BUDGET, summarize_document
+from .fetch import fetch_url
+from .html_extraction import extract_main_text
+from .metrics import Counter, stage
+from .model_client import ModelUnavailableError, SummaryGenerationError, get_model_client, track_models
+from .models import WatchedUrl
+from .prompt import estimate_tokens
+from .store import store_summary
+from .utils import format_summary
+
+logger = logging.getLogger(__name__)
+
+# Largest share of the previous blocks that may change for the summary to be updated from the
+# changed blocks; beyond it the summary is generated from the whole text again.
+WATCH_MAX_INCREMENTAL_CHANGE = getattr(settings, 'SUMMARY_WATCH_MAX_INCREMENTAL_CHANGE', 0.5)
+# Incremental updates in a row after which the summary is generated from the whole text again,
+# so small errors of successive updates do not accumulate.
+WATCH_MAX_INCREMENTAL_UPDATES = getattr(settings, 'SUMMARY_WATCH_MAX_INCREMENTAL_UPDATES', 10)
+
+UNCHANGED, CACHED, INCREMENTAL, FULL, FAILED = 'unchanged', 'cached', 'incremental', 'full', 'error'
+
+WATCH_REFRESHES = Counter('summarizer_watch_refreshes_total', 'Refreshes of watched URLs by result.', ['result'])
+
+
+def split_blocks(text: str) -> list:
+    """
+    Splits extracted page text into blocks, one per non-empty line. The HTML extractor puts
+    every paragraph, heading and list item on a line of its own.
+    """
+    return [line.strip() for line in text.split("\n") if line.strip()]
+
+
+def block_hash(block: str) -> str:
+    """
+    Returns the hash of a block, insensitive to changes of whitespace.
+    """
+    return hashlib.blake2b(" ".join(block.split()).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def diff_blocks(previous: list, current: list) -> tuple:
+    """
+    Compares two sequences of block hashes.
+
+    Args:
+        previous (list): The block hashes of the previous text.
+        current (list): The block hashes of the new text.
+
+    Returns:
+        tuple: The indices of the blocks of `previous` that were removed or rewritten, and the
+        indices of the blocks of `current` that were added or rewritten.
+    """
+    removed, added = [], []
+    matcher = difflib.SequenceMatcher(None, previous, current, autojunk=False)
+    for operation, previous_start, previous_end, current_start, current_end in matcher.get_opcodes():
+        if operation != 'equal':
+            removed.extend(range(previous_start, previous_end))
+            added.extend(range(current_start, current_end))
+    return removed, added
+
+
+def build_update_prompt(watch: WatchedUrl, removed: list, added: list) -> str:
+    """
+    Builds the prompt asking the model to update the previous summary of a watched URL for the
+    blocks removed from and added to its text.
+    """
+    shape = f"{watch.length} bullet points, every one starting with '*'" if watch.form == 'bullet' \
+        else f"a {watch.length} sentence text"
+    parts = [f"This is a {watch.granularity} summary in {watch.language} of a document: {watch.summary}"]
+    if removed:
+        parts.append("These passages were removed from the document:\n" + "\n".join(removed))
+    if added:
+        parts.append("These passages were added to the document:\n" + "\n".join(added))
+    parts.append(f"Update the summary for these changes and return only the updated summary, in "
+                 f"{watch.language}, in form of {shape}, keeping it {watch.granularity}.")
+    return "\n\n".join(parts)
+
+
+def generate_update(watch: WatchedUrl, removed: list, added: list) -> str:
+    """
+    Asks the model for the previous summary of a watched URL updated for the removed and added blocks.
+
+    Raises:
+        ModelUnavailableError: If no model may be called.
+        SummaryGenerationError: If the model call failed.
+    """
+    try:
+        return format_summary(watch.form, get_model_client().generate(build_update_prompt(watch, removed, added)))
+    except ModelUnavailableError:
+        raise
+    except Exception as e:
+        raise SummaryGenerationError(f"Error updating summary: {e}") from e
+
+
+def serialize_watch(watch: WatchedUrl) -> dict:
+    """
+    Builds the representation of a watched URL returned by the API.
+    """
+    return {
+        'watch_id': str(watch.id),
+        'url': watch.url,
+        'form': watch.form,
+        'length': watch.length,
+        'language': watch.language,
+        'granularity': watch.granularity,
+        'summary': watch.summary,
+        'summary_id': str(watch.summary_id) if watch.summary_id else None,
+        'blocks': len(watch.blocks),
+        'created_at': watch.created_at.isoformat(),
+        'checked_at': watch.checked_at.isoformat() if watch.checked_at else None,
+        'changed_at': watch.changed_at.isoformat() if watch.changed_at else None,
+    }
+
+
+def _update_summary(watch: WatchedUrl, text: str, previous: list, blocks: list, removed: list, added: list,
+                    priority: str, bounded: bool) -> tuple:
+    """
+    Returns `(summary, result, models)` for the new text of a watched URL: the cached summary of the
+    same text if there is one, else an update of the previous summary from the changed blocks when
+    they are few enough, else a summary of the whole text.
+    """
+    cached = get_summary_cache().get(make_cache_key(text, watch.form, watch.length, watch.language,
+                                                    watch.granularity))
+    if cached is not None:
+        return cached, CACHED, []
+
+    removed_text = [previous[index][1] for index in removed]
+    added_text = [blocks[index] for index in added]
+    incremental = (
+        watch.summary
+        and watch.incremental_updates < WATCH_MAX_INCREMENTAL_UPDATES
+        and len(removed) + len(added) <= max(1, WATCH_MAX_INCREMENTAL_CHANGE * len(previous))
+        and estimate_tokens("\n".join(removed_text + added_text)) <= CHUNK_TOKEN_BUDGET
+    )
+    with track_models() as models, get_admission_controller().slot(priority, bounded):
+        if incremental:
+            try:
+                return generate_update(watch, removed_text, added_text), INCREMENTAL, models
+            except (SummaryGenerationError, ModelUnavailableError):
+                logger.warning("Incremental update of watch %s failed; summarizing the whole text", watch.pk,
+                               exc_info=True)
+        # The page itself changed; a stored summary of a near-identical older text would be stale.
+        summary = summarize_document(form=watch.form, length=watch.length, language=watch.language, text=text,
+                                     granularity=watch.granularity, reuse=False)
+    return summary, FULL, models
+
+
+def refresh_watch(watch: WatchedUrl, priority: str = BATCH, bounded: bool = False) -> dict:
+    """
+    Fetches a watched URL again and brings its summary up to date. The page goes through the
+    conditional HTTP cache, so an unchanged page with validators costs a 304 response. Its text is
+    split into blocks and compared with the stored block hashes: when no block changed, the model
+    is not called at all; when some did, only the removed and added blocks are sent with the
+    previous summary for an incremental update. The first refresh, and refreshes where too much
+    changed, summarize the whole text.
+
+    Args:
+        watch (WatchedUrl): The watched URL; saved when the refresh succeeds.
+        priority (str): The admission priority of the model call.
+        bounded (bool): Whether waiting for a model slot may be rejected when the server is busy.
+
+    Returns:
+        dict: The `result` ('unchanged', 'cached', 'incremental', 'full' or 'error'), the number of
+        `added_blocks` and `removed_blocks`, and the `error` message of a page that could not be fetched.
+
+    Raises:
+        SummaryGenerationError: If the summary could not be updated.
+    """
+    with stage('watch_refresh'):
+        try:
+            with stage('extract_url'):
+                text = extract_main_text(fetch_url(watch.url))
+            error = None if text else 'No valid text found'
+        except requests.RequestException as e:
+            text, error = None, f"Error fetching content from URL: {e}"
+        watch.checked_at = timezone.now()
+        if error:
+            if not watch._state.adding:
+                watch.save(update_fields=['checked_at'])
+            WATCH_REFRESHES.inc(result=FAILED)
+            return {'result': FAILED, 'error': error}
+
+        blocks = split_blocks(text)
+        hashes = [block_hash(block) for block in blocks]
+        previous = watch.blocks
+        removed, added = diff_blocks([entry[0] for entry in previous], hashes)
+        if watch.summary and not removed and not added:
+            watch.save(update_fields=['checked_at'])
+            WATCH_REFRESHES.inc(result=UNCHANGED)
+            return {'result': UNCHANGED, 'added_blocks': 0, 'removed_blocks': 0}
+
+        started = time.perf_counter()
+        try:
+            summary, result, models = _update_summary(watch, text, previous, blocks, removed, added, priority,
+                                                      bounded)
+        except SummaryGenerationError:
+            # Keep the previous blocks, so the next refresh compares against the last summarized text.
+            if not watch._state.adding:
+                watch.save(update_fields=['checked_at'])
+            WATCH_REFRESHES.inc(result=FAILED)
+            raise
+
+        # An incremental update summarizes the changes on top of the previous summary, not the text itself:
+        # it is stored for retrieval but never served for the same or a near-identical text.
+        cache_key = make_cache_key(text, watch.form, watch.length, watch.language, watch.granularity)
+        if models and result == FULL and getattr(summary, 'cacheable', True):
+            get_summary_cache().set(cache_key, summary)
+        stored = store_summary(cache_key, text, summary, 'url', watch.form, watch.length, watch.language,
+                               watch.granularity, models, time.perf_counter() - started, index=result != INCREMENTAL)
+        watch.blocks = [[digest, block] for digest, block in zip(hashes, blocks)]
+        watch.summary = summary
+        watch.summary_id = stored.id if stored is not None else None
+        watch.incremental_updates = watch.incremental_updates + 1 if result == INCREMENTAL else 0
+        watch.changed_at = watch.checked_at
+        watch.save()
+    WATCH_REFRESHES.inc(result=result)
+    return {'result': result, 'added_blocks': len(added), 'removed_blocks': len(removed)}
+
+
+def refresh_due_watches(older_than: float = 0) -> dict:
+    """
+    Refreshes every watched URL not checked in the last `older_than` seconds, for scheduled runs.
+
+    Returns:
+        dict: The number of refreshes by result.
+    """
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    counts = {}
+    watches = WatchedUrl.objects.filter(checked_at__isnull=True) | WatchedUrl.objects.filter(checked_at__lte=cutoff)
+    for watch in watches.order_by('checked_at').iterator():
+        try:
+            result = refresh_watch(watch)['result']
+        except SummaryGenerationError:
+            result = FAILED
+        counts[result] = counts.get(result, 0) + 1
+    return counts